@@ -1,23 +1,26 @@
 # auth.py
 import os
 import random
-import smtplib
-import ssl
 from datetime import datetime, timedelta, date
 
-from email.message import EmailMessage
-
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, get_async_db
+from mailer import enqueue_email, notify_sender
 from models import User, Dataset, Chat, Message, ApiKey   # <- NOTE: added imports
-from security import hash_password, verify_password
+from security import (
+  ACCESS_TOKEN_TTL_MIN,
+  create_access_token,
+  hash_password_async,
+  verify_and_update_async,
+)
 
-# Google ID token verification
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+# Google ID token verification (cached certs, pooled session)
+from google_verify import get_verifier
 
 router = APIRouter(tags=["auth"])
 
@@ -76,37 +79,15 @@ class DeleteAccountPayload(BaseModel):
 
 
 # ============================================================
-# Helper: send verification email
+# Helper: queue verification email (sent by mailer.OutboxSender)
 # ============================================================
 
-def send_verification_email(to_email: str, code: str) -> bool:
+def queue_verification_email(db, to_email: str, code: str):
   """
-  Send a 4-digit verification code to the user via Gmail SMTP.
-
-  Uses env:
-    SMTP_HOST
-    SMTP_PORT
-    SMTP_USER
-    SMTP_PASSWORD
-    SMTP_FROM_EMAIL
-    SMTP_FROM_NAME
+  Add the 4-digit verification code email to the outbox. It is written in
+  the caller's transaction, so it goes out only once that commits.
   """
-  smtp_host = os.getenv("SMTP_HOST")
-  smtp_port = int(os.getenv("SMTP_PORT", "587"))
-  smtp_user = os.getenv("SMTP_USER")
-  smtp_password = os.getenv("SMTP_PASSWORD")
-  from_email = os.getenv("SMTP_FROM_EMAIL") or smtp_user
   from_name = os.getenv("SMTP_FROM_NAME", "Automated Domain Expert Chatbot")
-
-  if not all([smtp_host, smtp_port, smtp_user, smtp_password, from_email]):
-    print("[WARN] SMTP not fully configured; cannot send email.")
-    return False
-
-  msg = EmailMessage()
-  msg["Subject"] = "Your verification code – Automated Domain Expert Chatbot"
-  msg["From"] = f"{from_name} <{from_email}>"
-  msg["To"] = to_email
-
   body = (
     f"Hi,\n\n"
     f"Your verification code for Automated Domain Expert Chatbot is: {code}\n\n"
@@ -114,28 +95,21 @@ def send_verification_email(to_email: str, code: str) -> bool:
     f"If you did not request this, you can ignore this email.\n\n"
     f"— {from_name}"
   )
-  msg.set_content(body)
+  enqueue_email(
+    db,
+    to_email,
+    "Your verification code – Automated Domain Expert Chatbot",
+    body,
+  )
 
-  try:
-    # Port 465 → SSL; Port 587 → STARTTLS
-    if smtp_port == 465:
-      context = ssl.create_default_context()
-      with smtplib.SMTP_SSL(smtp_host, smtp_port, context=context) as server:
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-    else:
-      context = ssl.create_default_context()
-      with smtplib.SMTP(smtp_host, smtp_port) as server:
-        server.starttls(context=context)
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-
-    print(f"[INFO] Verification email sent to {to_email}")
-    return True
-
-  except Exception as e:
-    print("[ERROR] Failed to send verification email:", repr(e))
-    return False
+
+# Helper: short-lived signed session token returned by login routes
+def _session(user: User) -> dict:
+  return {
+    "access_token": create_access_token(user.email, user.first_name),
+    "token_type": "bearer",
+    "expires_in": ACCESS_TOKEN_TTL_MIN * 60,
+  }
 
 
 # Helper to generate 4-digit code
@@ -148,9 +122,9 @@ def generate_code() -> str:
 # ============================================================
 
 @router.post("/signup")
-def signup(payload: SignupPayload, db: Session = Depends(get_db)):
+async def signup(payload: SignupPayload, db: AsyncSession = Depends(get_async_db)):
   # Check if email already exists
-  existing = db.query(User).filter(User.email == payload.email).first()
+  existing = await db.scalar(select(User).filter(User.email == payload.email))
   if existing:
     # If exists but not verified, tell front-end it is pending
     if not existing.is_verified:
@@ -173,7 +147,7 @@ def signup(payload: SignupPayload, db: Session = Depends(get_db)):
     email=payload.email,
     first_name=payload.first_name,
     last_name=payload.last_name,
-    hashed_password=hash_password(payload.password),
+    hashed_password=await hash_password_async(payload.password),
     date_of_birth=payload.date_of_birth,
     is_verified=False,
     verification_code=code,
@@ -183,16 +157,9 @@ def signup(payload: SignupPayload, db: Session = Depends(get_db)):
   )
 
   db.add(user)
-  db.commit()
-  db.refresh(user)
-
-  # Send email
-  if not send_verification_email(user.email, code):
-    # If sending fails, we still keep the user but tell frontend
-    raise HTTPException(
-      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-      detail="Could not send verification email. Please try again later."
-    )
+  queue_verification_email(db, user.email, code)
+  await db.commit()
+  notify_sender()
 
   return {"message": "Signup successful. Verification code sent.", "email": user.email}
 
@@ -286,13 +253,9 @@ def resend_code(payload: ResendCodePayload, db: Session = Depends(get_db)):
   user.verification_code = code
   user.verification_expires_at = now + timedelta(minutes=10)
   user.last_verification_sent_at = now
+  queue_verification_email(db, user.email, code)
   db.commit()
-
-  if not send_verification_email(user.email, code):
-    raise HTTPException(
-      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-      detail="Could not resend verification email. Please try again later."
-    )
+  notify_sender()
 
   return {"message": "New verification code sent."}
 
@@ -312,8 +275,8 @@ def check_email(payload: CheckEmailPayload, db: Session = Depends(get_db)):
 # ============================================================
 
 @router.post("/login")
-def login(payload: LoginPayload, db: Session = Depends(get_db)):
-  user = db.query(User).filter(User.email == payload.email).first()
+async def login(payload: LoginPayload, db: AsyncSession = Depends(get_async_db)):
+  user = await db.scalar(select(User).filter(User.email == payload.email))
 
   if not user or not user.hashed_password:
     raise HTTPException(
@@ -327,16 +290,23 @@ def login(payload: LoginPayload, db: Session = Depends(get_db)):
       detail="Please verify your email before logging in."
     )
 
-  if not verify_password(payload.password, user.hashed_password):
+  ok, new_hash = await verify_and_update_async(payload.password, user.hashed_password)
+  if not ok:
     raise HTTPException(
       status_code=status.HTTP_401_UNAUTHORIZED,
       detail="Invalid email or password."
     )
 
+  # BCRYPT_ROUNDS changed since this hash was made → store the re-hash
+  if new_hash:
+    user.hashed_password = new_hash
+    await db.commit()
+
   return {
     "message": "Login successful.",
     "email": user.email,
     "first_name": user.first_name,
+    **_session(user),
   }
 
 
@@ -384,7 +354,7 @@ def forgot_password(payload: ForgotPasswordPayload, db: Session = Depends(get_db
   - Check if email exists & verified
   - Generate a 4-digit reset code
   - Store it in verification_code + verification_expires_at
-  - Email the code to the user
+  - Queue the code email in the outbox
   """
   user = db.query(User).filter(User.email == payload.email).first()
   if not user:
@@ -404,13 +374,9 @@ def forgot_password(payload: ForgotPasswordPayload, db: Session = Depends(get_db
   user.verification_code = code
   user.verification_expires_at = now + timedelta(minutes=10)
   user.last_verification_sent_at = now
+  queue_verification_email(db, user.email, code)
   db.commit()
-
-  if not send_verification_email(user.email, code):
-    raise HTTPException(
-      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-      detail="Could not send reset code email. Please try again later."
-    )
+  notify_sender()
 
   return {"message": "Reset code sent to your email."}
 
@@ -458,13 +424,13 @@ def verify_reset_code(payload: VerifyResetCodePayload, db: Session = Depends(get
 
 
 @router.post("/reset-password")
-def reset_password(payload: ResetPasswordPayload, db: Session = Depends(get_db)):
+async def reset_password(payload: ResetPasswordPayload, db: AsyncSession = Depends(get_async_db)):
   """
   Step 3:
   - After /verify-reset-code succeeded on frontend,
     actually change the password.
   """
-  user = db.query(User).filter(User.email == payload.email).first()
+  user = await db.scalar(select(User).filter(User.email == payload.email))
   if not user:
     raise HTTPException(
       status_code=status.HTTP_404_NOT_FOUND,
@@ -477,8 +443,8 @@ def reset_password(payload: ResetPasswordPayload, db: Session = Depends(get_db))
       detail="Please verify your email first."
     )
 
-  user.hashed_password = hash_password(payload.new_password)
-  db.commit()
+  user.hashed_password = await hash_password_async(payload.new_password)
+  await db.commit()
 
   return {"message": "Password updated successfully."}
 
@@ -497,11 +463,7 @@ def google_login(payload: GoogleLoginPayload, db: Session = Depends(get_db)):
     )
 
   try:
-    idinfo = id_token.verify_oauth2_token(
-      payload.token,
-      google_requests.Request(),
-      client_id
-    )
+    idinfo = get_verifier().verify(payload.token, client_id)
   except Exception:
     raise HTTPException(
       status_code=status.HTTP_401_UNAUTHORIZED,
@@ -547,4 +509,5 @@ def google_login(payload: GoogleLoginPayload, db: Session = Depends(get_db)):
     "message": "Google login successful.",
     "email": user.email,
     "first_name": user.first_name,
+    **_session(user),
   }
@@ -0,0 +1,10 @@
+# benchmarks/__init__.py
+# Standalone performance scripts. Run from the backend root, e.g.:
+#   python -m benchmarks.bench_auth --concurrency 64 --logins 256
+#   python -m benchmarks.bench_rag --sizes 1k,100k --pdf 10p,100p
+#   python -m benchmarks.bench_vector --sizes 1k,10k,100k,500k
+#   python -m benchmarks.bench_quant --chunks 100k --rescore 1,2,4,8
+#   python -m benchmarks.bench_embedder --chunks 2000 --batches 1,32,128
+#   python -m benchmarks.bench_llm --calls 400 --concurrency 8
+#   python -m benchmarks.loadgen --endpoint ext --api-key cbt_xxx --rps 5,10,20
+#   python -m benchmarks.compare old.json new.json
@@ -0,0 +1,79 @@
+# benchmarks/bench_auth.py
+"""
+Concurrent-login throughput: bcrypt verification on the default threadpool
+(old behaviour) vs the dedicated process pool in security.py.
+
+While logins run, a tiny "other endpoint" coroutine pings the event loop
+every 10 ms; its worst-case delay shows how much logins starve the rest
+of the app.
+
+  python -m benchmarks.bench_auth --concurrency 64 --logins 256 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+async def _probe(stop: asyncio.Event, delays: list):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        delays.append(time.perf_counter() - t0 - 0.01)
+
+
+async def _run(mode: str, hashed: str, logins: int, concurrency: int):
+    import security
+    from fastapi.concurrency import run_in_threadpool
+
+    sem = asyncio.Semaphore(concurrency)
+    lat = []
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            if mode == "threadpool":
+                ok = await run_in_threadpool(security.verify_password, "hunter22", hashed)
+            else:
+                ok, _ = await security.verify_and_update_async("hunter22", hashed)
+            assert ok
+            lat.append(time.perf_counter() - t0)
+
+    stop = asyncio.Event()
+    delays: list = []
+    probe = asyncio.create_task(_probe(stop, delays))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await probe
+
+    lat.sort()
+    return {
+        "mode": mode,
+        "logins_per_sec": round(logins / elapsed, 1),
+        "p50_ms": round(statistics.median(lat) * 1000, 1),
+        "p95_ms": round(lat[int(len(lat) * 0.95) - 1] * 1000, 1),
+        "loop_lag_max_ms": round(max(delays or [0]) * 1000, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logins", type=int, default=128)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--rounds", type=int, default=12)
+    args = ap.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    import security
+
+    hashed = security.hash_password("hunter22")
+    for mode in ("threadpool", "process-pool"):
+        print(asyncio.run(_run(mode, hashed, args.logins, args.concurrency)))
+    security.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
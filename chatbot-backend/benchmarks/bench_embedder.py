@@ -0,0 +1,85 @@
+# benchmarks/bench_embedder.py
+"""
+fp32 vs int8 (dynamically quantized) MiniLM on CPU:
+
+  throughput   chunks/sec per batch size, per runtime
+  parity       cosine between fp32 and int8 embeddings of the same chunks
+  retrieval    recall@k of int8 query embeddings against fp32-indexed
+               chunks (the mixed case after flipping EMBED_RUNTIME on an
+               existing store), relative to fp32 queries
+
+The model must already be in the local HuggingFace cache.
+
+  python -m benchmarks.bench_embedder --chunks 2000 --batches 1,32,128
+"""
+import argparse
+import copy
+import time
+
+import numpy as np
+
+from .common import offline_env, percentiles, save_results
+from .corpus import make_chunks, make_queries
+
+
+def _throughput(model, chunks, batch: int) -> dict:
+    model.encode(chunks[:8], convert_to_numpy=True)  # warm-up
+    lat = []
+    t0 = time.perf_counter()
+    for i in range(0, len(chunks), batch):
+        t1 = time.perf_counter()
+        model.encode(chunks[i:i + batch], convert_to_numpy=True, batch_size=batch)
+        lat.append(time.perf_counter() - t1)
+    total = time.perf_counter() - t0
+    return {"chunks_per_sec": round(len(chunks) / max(total, 1e-9), 1), "batch_latency": percentiles(lat)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunks", type=int, default=2000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--batches", default="1,32,128")
+    ap.add_argument("--k", type=int, default=6)
+    ap.add_argument("--threads", type=int, default=0, help="torch threads (0 = library default)")
+    ap.add_argument("--out", default=None, help="result JSON path")
+    args = ap.parse_args()
+
+    offline_env()
+    import torch
+    from rag.embedder import load_model, parity_check, quantize_model
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    fp32 = load_model("fp32")
+    int8 = quantize_model(copy.deepcopy(fp32))
+    models = {"fp32": fp32, "int8": int8}
+    chunks = make_chunks(args.chunks)
+    queries = make_queries(args.queries)
+
+    results = {"chunks": len(chunks), "torch_threads": torch.get_num_threads(), "throughput": {}}
+    for name, model in models.items():
+        for b in [int(x) for x in args.batches.split(",") if x.strip()]:
+            r = _throughput(model, chunks, b)
+            results["throughput"][f"{name}/b{b}"] = r
+            print(name, b, r)
+
+    results["parity"] = parity_check(fp32, int8, chunks)
+
+    docs = fp32.encode(chunks, convert_to_numpy=True, normalize_embeddings=True)
+    q32 = fp32.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+    q8 = int8.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+    k = args.k
+    hits = 0
+    for a, b in zip(q32, q8):
+        want = set(np.argpartition(-(docs @ a), k - 1)[:k].tolist())
+        got = set(np.argpartition(-(docs @ b), k - 1)[:k].tolist())
+        hits += len(want & got)
+    results["retrieval"] = {f"recall_at_{k}": round(hits / (k * len(queries)), 4)}
+    print("parity", results["parity"], "retrieval", results["retrieval"])
+
+    path = save_results("embedder", results, args.out)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# benchmarks/bench_llm.py
+"""
+rag.llm_client against benchmarks.fake_gemini, one scenario per protection:
+
+  tail      5% of calls are slow: p50/p95/p99 without and with hedging
+  flaky     a fraction of calls fail with 503: success rate with 1 attempt
+            vs LLM_MAX_ATTEMPTS retries
+  outage    upstream hard down: time spent per failed call, with and
+            without the circuit breaker, and whether the breaker closes
+            again once the upstream recovers
+
+The fake server is started in-process. By default calls go through a tiny
+urllib model so only the client is measured; --model sdk goes through
+google.generativeai's REST transport instead (GEMINI_API_ENDPOINT).
+
+  python -m benchmarks.bench_llm --calls 400 --concurrency 8
+  python -m benchmarks.bench_llm --scenarios tail --slow-ms 3000
+"""
+import argparse
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .common import percentiles, save_results
+from .fake_gemini import Faults, start
+
+
+@dataclass
+class _Response:
+    text: str
+
+
+class _HttpModel:
+    """generate_content over plain urllib, same wire format as the SDK's REST transport."""
+
+    def __init__(self, endpoint: str, model: str = "gemini-flash-latest"):
+        self.url = f"{endpoint}/v1beta/models/{model}:generateContent?key=fake"
+
+    def generate_content(self, prompt: str, request_options=None):
+        timeout = (request_options or {}).get("timeout")
+        body = json.dumps({"contents": [{"role": "user", "parts": [{"text": prompt}]}]}).encode()
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as r:
+                out = json.loads(r.read())
+        except urllib.error.HTTPError:
+            raise                                   # .code: 503 etc.
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, TimeoutError):
+                raise e.reason
+            raise ConnectionError(str(e.reason)) from e
+        return _Response(out["candidates"][0]["content"]["parts"][0]["text"])
+
+
+def _sdk_model(endpoint: str):
+    os.environ["GEMINI_API_ENDPOINT"] = endpoint
+    os.environ.setdefault("GEMINI_API_KEY", "fake")
+    os.environ["LLM_BACKEND"] = "gemini"
+    from rag.pipeline import _get_gemini
+
+    return _get_gemini()
+
+
+def _run(client, calls: int, concurrency: int, feature: str) -> dict:
+    from rag.llm_client import LLMError
+
+    lat_ok, lat_err, errors = [], [], {}
+
+    def one(i: int):
+        t0 = time.perf_counter()
+        try:
+            client.generate(f"question {i}", feature=feature)
+            lat_ok.append(time.perf_counter() - t0)
+        except LLMError as e:
+            lat_err.append(time.perf_counter() - t0)
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    return {
+        "calls": calls,
+        "ok": len(lat_ok),
+        "errors": errors,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "latency_ok": percentiles(lat_ok),
+        "latency_error": percentiles(lat_err),
+    }
+
+
+def _counter(name: str, **labels) -> float:
+    from metrics import _counters, _key
+
+    want = set(_key(labels))
+    return sum(v for k, v in _counters.get(name, {}).items() if want <= set(k))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default="tail,flaky,outage")
+    ap.add_argument("--calls", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--slow-ms", type=float, default=1500.0)
+    ap.add_argument("--slow-rate", type=float, default=0.05)
+    ap.add_argument("--error-rate", type=float, default=0.2)
+    ap.add_argument("--model", choices=["http", "sdk"], default="http")
+    ap.add_argument("--out", default=None, help="result JSON path")
+    args = ap.parse_args()
+
+    import rag.llm_client as lc
+
+    faults = Faults(latency_ms=args.latency_ms)
+    server = start(faults)
+    endpoint = "http://%s:%d" % server.server_address[:2]
+    model = _sdk_model(endpoint) if args.model == "sdk" else _HttpModel(endpoint)
+    lc.LLM_TIMEOUT_SEC = max(5.0, args.slow_ms / 1000.0 * 2)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    results = {"model": args.model, "fake": {"latency_ms": args.latency_ms}}
+
+    if "tail" in scenarios:
+        faults.slow_rate, faults.slow_ms, faults.error_rate, faults.down = args.slow_rate, args.slow_ms, 0.0, False
+        for hedge in (False, True):
+            lc.LLM_HEDGE = hedge
+            client = lc.LLMClient(lambda: model)
+            _run(client, lc.LLM_HEDGE_MIN_SAMPLES * 2, args.concurrency, "bench_warmup")  # fill the latency window
+            sent0 = _counter("llm_hedges_total", feature="bench_tail", outcome="sent")
+            won0 = _counter("llm_hedges_total", feature="bench_tail", outcome="won")
+            r = _run(client, args.calls, args.concurrency, "bench_tail")
+            r["hedges_sent"] = _counter("llm_hedges_total", feature="bench_tail", outcome="sent") - sent0
+            r["hedges_won"] = _counter("llm_hedges_total", feature="bench_tail", outcome="won") - won0
+            results[f"tail/hedge={int(hedge)}"] = r
+            print(f"tail/hedge={int(hedge)}", r)
+        lc.LLM_HEDGE = False
+
+    if "flaky" in scenarios:
+        faults.slow_rate, faults.error_rate, faults.down = 0.0, args.error_rate, False
+        for attempts in (1, lc.LLM_MAX_ATTEMPTS):
+            saved = lc.LLM_MAX_ATTEMPTS
+            lc.LLM_MAX_ATTEMPTS = attempts
+            client = lc.LLMClient(lambda: model)
+            client.breaker.threshold = 0            # measure retries alone
+            retries0 = _counter("llm_retries_total", feature="bench_flaky")
+            r = _run(client, args.calls, args.concurrency, "bench_flaky")
+            r["retries"] = _counter("llm_retries_total", feature="bench_flaky") - retries0
+            r["success_rate"] = round(r["ok"] / r["calls"], 4)
+            results[f"flaky/attempts={attempts}"] = r
+            print(f"flaky/attempts={attempts}", r)
+            lc.LLM_MAX_ATTEMPTS = saved
+
+    if "outage" in scenarios:
+        faults.slow_rate, faults.error_rate, faults.down = 0.0, 0.0, True
+        for breaker in (False, True):
+            client = lc.LLMClient(lambda: model)
+            client.breaker.reset_sec = 2.0
+            if not breaker:
+                client.breaker.threshold = 0
+            before = faults.requests
+            r = _run(client, args.calls, args.concurrency, "bench_outage")
+            r["upstream_requests"] = faults.requests - before
+            r["breaker_state"] = client.breaker.state
+            if breaker:
+                faults.down = False
+                time.sleep(client.breaker.reset_sec)
+                rec = _run(client, args.concurrency * 4, 1, "bench_recovery")  # probe first, then the rest
+                r["recovery"] = {"ok": rec["ok"], "breaker_state": client.breaker.state}
+                faults.down = True
+            results[f"outage/breaker={int(breaker)}"] = r
+            print(f"outage/breaker={int(breaker)}", r)
+
+    server.shutdown()
+    path = save_results("llm", results, args.out)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_quant.py
+"""
+Recall@k vs memory for the flat index storage modes (rag.flat_index):
+
+  f32            float32 matrix, exact
+  f16            float16 matrix
+  int8/rN        int8 codes + per-vector scale, top k*N rescored against float32
+  int8-f16/rN    same, rescored against a float16 matrix (smallest on disk)
+
+Embeddings come from the real MiniLM (rag.embedder) over the synthetic
+corpus and are cached in the workdir, so reruns skip the encode. Pass
+--synthetic to use clustered random vectors instead (no model needed).
+Ground truth is an exact float32 search.
+
+Examples (run from the backend root):
+  python -m benchmarks.bench_quant                        # 10k chunks
+  python -m benchmarks.bench_quant --chunks 100k --rescore 1,2,4,8 --k 6,20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .common import offline_env, percentiles, save_results
+from .corpus import CHUNK_SIZES, make_chunks, make_embeddings, make_queries
+
+
+def _embeddings(n: int, n_queries: int, workdir: str, synthetic: bool):
+    if synthetic:
+        return make_embeddings(n), make_embeddings(n_queries, seed=99)
+    cache = os.path.join(workdir, f"minilm_{n}_{n_queries}.npz")
+    if os.path.exists(cache):
+        z = np.load(cache)
+        return z["docs"], z["queries"]
+    from rag.embedder import embed_texts
+
+    docs = np.asarray(embed_texts(make_chunks(n), normalize=True, lane="bulk"), dtype=np.float32)
+    queries = np.asarray(embed_texts(make_queries(n_queries), normalize=True), dtype=np.float32)
+    np.savez(cache, docs=docs, queries=queries)
+    return docs, queries
+
+
+def _bytes(path: str, names) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in names if os.path.exists(os.path.join(path, f)))
+
+
+def _measure(idx, queries, truth, k: int, rescore) -> dict:
+    lat, hits = [], 0
+    for q, want in zip(queries, truth):
+        t0 = time.perf_counter()
+        rows, _scores = idx.top_rows(q, k, rescore=rescore)
+        lat.append(time.perf_counter() - t0)
+        hits += len(want & set(rows.tolist()))
+    return {"recall": round(hits / (k * len(queries)), 4), "latency": percentiles(lat)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunks", default="10k", help=f"corpus size: {','.join(CHUNK_SIZES)}")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", default="6", help="comma-separated k values")
+    ap.add_argument("--rescore", default="1,2,4,8", help="rescore factors for int8")
+    ap.add_argument("--synthetic", action="store_true", help="random clustered vectors instead of MiniLM")
+    ap.add_argument("--workdir", default=None, help="scratch dir (default: temp dir)")
+    ap.add_argument("--out", default=None, help="result JSON path")
+    args = ap.parse_args()
+
+    offline_env()
+    from rag.flat_index import FlatIndex
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="quantbench-")
+    os.makedirs(workdir, exist_ok=True)
+    n = CHUNK_SIZES[args.chunks.strip().lower()]
+    docs, queries = _embeddings(n, args.queries, workdir, args.synthetic)
+    ks = [int(x) for x in args.k.split(",") if x.strip()]
+    factors = [int(x) for x in args.rescore.split(",") if x.strip()]
+
+    truth = {}
+    for k in ks:
+        truth[k] = []
+        for q in queries:
+            s = docs @ q
+            truth[k].append(set(np.argpartition(-s, k - 1)[:k].tolist()))
+
+    ids = [str(i) for i in range(n)]
+    blank = [""] * n
+    metas = [{}] * n
+    modes = [("f32", "float32", "none"), ("f16", "float16", "none"),
+             ("int8", "float32", "int8"), ("int8-f16", "float16", "int8")]
+
+    results = {"chunks": n, "dim": int(docs.shape[1]), "embeddings": "synthetic" if args.synthetic else "minilm"}
+    for label, dtype, quant in modes:
+        path = os.path.join(workdir, f"{label}_{n}_{int(time.time())}")
+        FlatIndex(path, dtype=dtype, quant=quant).upsert(ids, docs, blank, metas)
+        idx = FlatIndex(path)
+        scan_files = ["codes.bin", "scales.bin"] if quant == "int8" else ["vectors.bin"]
+        mem = {
+            "scan_mb": round(_bytes(path, scan_files) / 1e6, 2),   # read by every query
+            "vector_disk_mb": round(_bytes(path, ["vectors.bin", "codes.bin", "scales.bin"]) / 1e6, 2),
+        }
+        for k in ks:
+            if quant == "int8":
+                for f in factors:
+                    r = _measure(idx, queries, truth[k], k, f)
+                    results[f"{label}/r{f}/k{k}"] = {**mem, **r}
+                    print(f"{label}/r{f}/k{k}", results[f"{label}/r{f}/k{k}"])
+            else:
+                r = _measure(idx, queries, truth[k], k, None)
+                results[f"{label}/k{k}"] = {**mem, **r}
+                print(f"{label}/k{k}", results[f"{label}/k{k}"])
+
+    path = save_results("quant", results, args.out)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/bench_rag.py
+"""
+Offline CPU benchmarks for the RAG hot paths:
+
+  split   rag.text_splitter.recursive_split
+  parse   rag.file_parser.parse_file on synthetic PDFs
+  embed   rag.embedder.embed_texts
+  upsert  rag.vector_store.upsert_chunks (scratch Chroma store)
+  search  rag.vector_store.similarity_search
+
+Examples (run from the backend root):
+  python -m benchmarks.bench_rag                       # 1k chunks, 10-page PDF
+  python -m benchmarks.bench_rag --sizes 1k,100k --pdf 10p,100p,1000p
+  python -m benchmarks.bench_rag --only split,parse --sizes 1m
+
+Embedding/upserting 1m chunks on CPU takes hours; use it for split only
+unless you mean it. The MiniLM model must already be in the local
+HuggingFace cache (HF_HUB_OFFLINE=1 is forced). Results go to
+benchmarks/results/*.json; compare runs with benchmarks.compare.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from .common import offline_env, peak_rss_mb, percentiles, save_results, stopwatch
+from .corpus import CHUNK_SIZES, PDF_PAGES, make_chunks, make_pdf, make_queries, make_text
+
+ALL_TARGETS = ("split", "parse", "embed", "upsert", "search")
+UPSERT_BATCH = 5000   # stays under Chroma's max batch size
+
+
+def bench_split(n_chunks: int) -> dict:
+    from rag.text_splitter import recursive_split
+
+    text = make_text(n_chunks * 600)
+    r = {"input_chars": len(text)}
+    with stopwatch(r):
+        chunks = recursive_split(text, chunk_size=700, overlap=100)
+    r["chunks"] = len(chunks)
+    r["mb_per_sec"] = round(len(text) / 1e6 / max(r["seconds"], 1e-9), 2)
+    return r
+
+
+def bench_parse(pages: int, workdir: str) -> dict:
+    from rag.file_parser import parse_file
+
+    path = make_pdf(os.path.join(workdir, f"synthetic_{pages}p.pdf"), pages)
+    r = {"pages": pages, "file_mb": round(os.path.getsize(path) / 1e6, 2)}
+    with stopwatch(r):
+        text = parse_file(path)
+    r["chars"] = len(text)
+    r["pages_per_sec"] = round(pages / max(r["seconds"], 1e-9), 1)
+    return r
+
+
+def bench_embed(chunks, batch: int = 256) -> dict:
+    from rag.embedder import embed_texts
+
+    embed_texts(chunks[:8])  # load model outside the timed region
+    lat = []
+    r = {"chunks": len(chunks), "batch": batch}
+    with stopwatch(r):
+        for i in range(0, len(chunks), batch):
+            t0 = time.perf_counter()
+            embed_texts(chunks[i:i + batch], lane="bulk")
+            lat.append(time.perf_counter() - t0)
+    r["chunks_per_sec"] = round(len(chunks) / max(r["seconds"], 1e-9), 1)
+    r["batch_latency"] = percentiles(lat)
+    return r
+
+
+def bench_upsert(collection: str, chunks) -> dict:
+    from rag.vector_store import upsert_chunks
+
+    lat = []
+    r = {"chunks": len(chunks)}
+    with stopwatch(r):
+        for i in range(0, len(chunks), UPSERT_BATCH):
+            part = chunks[i:i + UPSERT_BATCH]
+            t0 = time.perf_counter()
+            upsert_chunks(
+                collection,
+                f"bench{i}",
+                part,
+                [{"doc_id": f"bench{i}", "source": "bench", "idx": j} for j in range(len(part))],
+            )
+            lat.append(time.perf_counter() - t0)
+    r["chunks_per_sec"] = round(len(chunks) / max(r["seconds"], 1e-9), 1)
+    r["batch_latency"] = percentiles(lat)
+    return r
+
+
+def bench_search(collection: str, n_queries: int, k: int = 6) -> dict:
+    from rag.vector_store import similarity_search
+
+    queries = make_queries(n_queries)
+    similarity_search(collection, queries[0], k=k)  # warm-up
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        similarity_search(collection, q, k=k)
+        lat.append(time.perf_counter() - t0)
+    return {
+        "queries": n_queries,
+        "k": k,
+        "qps": round(n_queries / max(sum(lat), 1e-9), 1),
+        "latency": percentiles(lat),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1k", help=f"chunk corpora: {','.join(CHUNK_SIZES)}")
+    ap.add_argument("--pdf", default="10p", help=f"PDF sizes: {','.join(PDF_PAGES)}")
+    ap.add_argument("--only", default=",".join(ALL_TARGETS), help="comma-separated targets")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--workdir", default=None, help="scratch dir (default: temp dir)")
+    ap.add_argument("--out", default=None, help="result JSON path")
+    args = ap.parse_args()
+
+    offline_env()
+    targets = {t.strip() for t in args.only.split(",") if t.strip()}
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ragbench-")
+    os.makedirs(workdir, exist_ok=True)
+    # Must be set before rag.vector_store is imported
+    os.environ["VECTOR_STORE_DIR"] = os.path.join(workdir, "vector_store")
+
+    results = {}
+    for size in [s.strip().lower() for s in args.sizes.split(",") if s.strip()]:
+        n = CHUNK_SIZES[size]
+        res = results.setdefault(f"chunks_{size}", {})
+        if "split" in targets:
+            res["split"] = bench_split(n)
+        if targets & {"embed", "upsert", "search"}:
+            chunks = make_chunks(n)
+            if "embed" in targets:
+                res["embed"] = bench_embed(chunks)
+            collection = f"bench_{size}_{int(time.time())}"
+            if targets & {"upsert", "search"}:
+                res["upsert"] = bench_upsert(collection, chunks)
+            if "search" in targets:
+                res["search"] = bench_search(collection, args.queries)
+        res["peak_rss_mb_after"] = round(peak_rss_mb(), 1)
+        print(size, res)
+
+    if "parse" in targets:
+        for p in [s.strip().lower() for s in args.pdf.split(",") if s.strip()]:
+            r = bench_parse(PDF_PAGES[p], workdir)
+            r["peak_rss_mb_after"] = round(peak_rss_mb(), 1)
+            results[f"pdf_{p}"] = {"parse": r}
+            print(p, r)
+
+    path = save_results("rag", results, args.out)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
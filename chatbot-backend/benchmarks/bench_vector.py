@@ -0,0 +1,132 @@
+# benchmarks/bench_vector.py
+"""
+Chroma vs the flat memory-mapped backend (rag.flat_index).
+
+Each (backend, size) runs in a fresh process so RSS numbers are not shared.
+Vectors are synthetic clustered unit vectors (corpus.make_embeddings):
+embedding 500k chunks with MiniLM on CPU would take hours and measures the
+embedder, not the index. Recall@k is against an exact float32 search.
+
+Examples (run from the backend root):
+  python -m benchmarks.bench_vector                         # 1k,10k,100k
+  python -m benchmarks.bench_vector --sizes 1k,10k,100k,500k --backends flat,flat16,chroma
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+from .common import current_rss_mb, peak_rss_mb, percentiles, save_results, stopwatch
+from .corpus import CHUNK_SIZES, make_embeddings
+
+BACKENDS = ("flat", "flat16", "chroma")   # flat = float32 matrix
+BATCH = 5000
+
+
+def _disk_mb(path: str) -> float:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return round(total / 1e6, 1)
+
+
+def _exact_topk(vecs, queries, k):
+    import numpy as np
+
+    out = []
+    for q in queries:
+        s = vecs @ q
+        top = np.argpartition(-s, k - 1)[:k]
+        out.append(set(top.tolist()))
+    return out
+
+
+def _run(backend: str, n: int, n_queries: int, k: int, workdir: str) -> dict:
+    vecs = make_embeddings(n)
+    queries = make_embeddings(n_queries, seed=99)
+    truth = _exact_topk(vecs, queries, k)
+    docs = [f"chunk {i}" for i in range(n)]
+    ids = [f"bench::{i}" for i in range(n)]
+    metas = [{"idx": i} for i in range(n)]
+    path = os.path.join(workdir, f"{backend}_{n}")
+
+    rss0 = current_rss_mb()
+    r = {"backend": backend, "chunks": n}
+    if backend.startswith("flat"):
+        from rag.flat_index import FlatIndex
+
+        idx = FlatIndex(path, dtype="float16" if backend == "flat16" else "float32")
+        with stopwatch(r, "build_seconds"):
+            for s in range(0, n, BATCH):
+                idx.upsert(ids[s:s + BATCH], vecs[s:s + BATCH], docs[s:s + BATCH], metas[s:s + BATCH])
+        idx = FlatIndex(path)  # reopen: measure a cold, memory-mapped index
+        search = lambda q: [m["idx"] for _d, m, _s in idx.search(q, k)]
+    else:
+        import chromadb
+        from chromadb.config import Settings
+
+        client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        col = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+        with stopwatch(r, "build_seconds"):
+            for s in range(0, n, BATCH):
+                col.upsert(ids=ids[s:s + BATCH], embeddings=vecs[s:s + BATCH].tolist(),
+                           documents=docs[s:s + BATCH], metadatas=metas[s:s + BATCH])
+        search = lambda q: [m["idx"] for m in col.query(query_embeddings=[q.tolist()], n_results=k)["metadatas"][0]]
+
+    del vecs  # keep only what the index itself holds
+    search(queries[0])  # warm-up
+    lat, hits = [], 0
+    for q, want in zip(queries, truth):
+        t0 = time.perf_counter()
+        got = search(q)
+        lat.append(time.perf_counter() - t0)
+        hits += len(want & set(got))
+
+    r["chunks_per_sec"] = round(n / max(r["build_seconds"], 1e-9), 1)
+    r["latency"] = percentiles(lat)
+    r[f"recall_at_{k}"] = round(hits / (k * len(queries)), 4)
+    r["rss_mb_delta"] = round(current_rss_mb() - rss0, 1)
+    r["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    r["disk_mb"] = _disk_mb(path)
+    return r
+
+
+def _child(conn, *args):
+    try:
+        conn.send(_run(*args))
+    except Exception as e:
+        conn.send({"error": repr(e)})
+    finally:
+        conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1k,10k,100k", help=f"chunk counts: {','.join(CHUNK_SIZES)}")
+    ap.add_argument("--backends", default=",".join(BACKENDS))
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=6)
+    ap.add_argument("--workdir", default=None, help="scratch dir (default: temp dir)")
+    ap.add_argument("--out", default=None, help="result JSON path")
+    args = ap.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="vecbench-")
+    ctx = mp.get_context("spawn")
+    results = {}
+    for size in [s.strip().lower() for s in args.sizes.split(",") if s.strip()]:
+        for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+            parent, child = ctx.Pipe(duplex=False)
+            p = ctx.Process(target=_child, args=(child, backend, CHUNK_SIZES[size], args.queries, args.k, workdir))
+            p.start()
+            r = parent.recv()
+            p.join()
+            results.setdefault(f"chunks_{size}", {})[backend] = r
+            print(size, backend, r)
+
+    path = save_results("vector", results, args.out)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/common.py
+"""
+Shared helpers: timing, percentiles, peak RSS and JSON result files.
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def offline_env():
+    """Never touch the network: models must already be in the local HF cache."""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def current_rss_mb() -> float:
+    """Resident set size now (Linux /proc); falls back to the peak elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def percentiles(samples: List[float], ps=(50, 90, 95, 99)) -> Dict[str, float]:
+    if not samples:
+        return {}
+    s = sorted(samples)
+    out = {}
+    for p in ps:
+        idx = min(len(s) - 1, max(0, int(round(p / 100 * len(s))) - 1))
+        out[f"p{p}_ms"] = round(s[idx] * 1000, 3)
+    out["mean_ms"] = round(sum(s) / len(s) * 1000, 3)
+    return out
+
+
+@contextmanager
+def stopwatch(into: dict, key: str = "seconds"):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        into[key] = round(time.perf_counter() - t0, 4)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def save_results(name: str, results: dict, out_path: Optional[str] = None) -> str:
+    """Write results plus environment info as JSON; returns the path."""
+    payload = {
+        "benchmark": name,
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "results": results,
+    }
+    if out_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        out_path = os.path.join(RESULTS_DIR, f"{name}-{payload['commit'] or 'nogit'}-{stamp}.json")
+    with open(out_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return out_path
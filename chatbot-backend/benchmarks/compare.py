@@ -0,0 +1,41 @@
+# benchmarks/compare.py
+"""
+Compare two result files from the benchmarks:
+
+  python -m benchmarks.compare old.json new.json
+
+Prints every numeric leaf present in both, with the relative change.
+"""
+import json
+import sys
+
+
+def _leaves(d, prefix=""):
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            yield from _leaves(v, key)
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield key, v
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as f:
+        old = json.load(f)
+    with open(sys.argv[2]) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    a = dict(_leaves(old.get("results", {})))
+    b = dict(_leaves(new.get("results", {})))
+    width = max((len(k) for k in a if k in b), default=10)
+    for k in sorted(a):
+        if k not in b:
+            continue
+        change = (b[k] - a[k]) / a[k] * 100 if a[k] else 0.0
+        print(f"{k:<{width}}  {a[k]:>12}  {b[k]:>12}  {change:+7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
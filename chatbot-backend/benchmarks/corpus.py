@@ -0,0 +1,92 @@
+# benchmarks/corpus.py
+"""
+Deterministic synthetic corpora (same seed → same text on every machine).
+"""
+import os
+import random
+from typing import List
+
+# Size presets used by --sizes on the command line
+CHUNK_SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "500k": 500_000, "1m": 1_000_000}
+PDF_PAGES = {"10p": 10, "100p": 100, "1000p": 1000}
+
+_WORDS = (
+    "system data model policy request user network storage index query "
+    "document section table value error code version release support "
+    "account billing device sensor module engine report account service "
+    "configure install update restore backup monitor deploy measure"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    n = rng.randint(8, 22)
+    words = [rng.choice(_WORDS) for _ in range(n)]
+    # sprinkle identifiers so lexical search has something to find
+    if rng.random() < 0.15:
+        words.insert(rng.randrange(n), f"ERR-{rng.randint(1000, 9999)}")
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 7)))
+
+
+def make_text(approx_chars: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, total = [], 0
+    while total < approx_chars:
+        p = paragraph(rng)
+        parts.append(p)
+        total += len(p) + 2
+    return "\n\n".join(parts)
+
+
+def make_chunks(n: int, seed: int = 0, chunk_chars: int = 600) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        s = ""
+        while len(s) < chunk_chars:
+            s += _sentence(rng) + " "
+        out.append(s[:chunk_chars].strip())
+    return out
+
+
+def make_queries(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [_sentence(rng) for _ in range(n)]
+
+
+def make_pdf(path: str, pages: int, seed: int = 0) -> str:
+    """Write a text PDF with `pages` pages using PyMuPDF (already a parser dependency)."""
+    import fitz
+
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        text = "\n\n".join(paragraph(rng) for _ in range(4))
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_embeddings(n: int, dim: int = 384, clusters: int = 256, seed: int = 11):
+    """
+    Unit vectors scattered around `clusters` centroids, float32 (n, dim).
+    Stands in for MiniLM output where embedding millions of chunks on CPU
+    would dominate the run; clustering keeps top-k non-trivial.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for s in range(0, n, 65536):
+        e = min(n, s + 65536)
+        out[s:e] = centers[rng.integers(0, clusters, e - s)] + 0.6 * rng.normal(size=(e - s, dim))
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
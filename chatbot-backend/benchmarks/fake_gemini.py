@@ -0,0 +1,119 @@
+# benchmarks/fake_gemini.py
+"""
+Local HTTP stand-in for the Gemini REST API, with injectable faults, for
+exercising rag.llm_client (timeouts, retries, hedging, circuit breaker).
+
+Serves POST /v1beta/models/<model>:generateContent with the same JSON
+shape as Gemini. Faults per request:
+  latency_ms    base response time
+  slow_rate     fraction of requests that take slow_ms instead (tail latency)
+  error_rate    fraction answered with 503 UNAVAILABLE
+  down          every request fails with 503 (outage)
+  slow_first    the first N requests take slow_ms (deterministic, for tests)
+
+Standalone (point the app at it with GEMINI_API_ENDPOINT + any GEMINI_API_KEY):
+  python -m benchmarks.fake_gemini --port 8765 --latency-ms 300 --slow-rate 0.05
+  GEMINI_API_ENDPOINT=http://127.0.0.1:8765 GEMINI_API_KEY=x uvicorn main:app
+
+benchmarks.bench_llm starts one in-process and changes the faults per scenario.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 100.0
+    slow_rate: float = 0.0
+    slow_ms: float = 2000.0
+    error_rate: float = 0.0
+    down: bool = False
+    slow_first: int = 0
+    requests: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+
+def _handler(faults: Faults):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *_args):
+            pass
+
+        def _json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            n = faults.count()
+            if not self.path.split("?")[0].endswith(":generateContent"):
+                self._json(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+                return
+
+            slow = n <= faults.slow_first or random.random() < faults.slow_rate
+            time.sleep((faults.slow_ms if slow else faults.latency_ms) / 1000.0)
+            if faults.down or random.random() < faults.error_rate:
+                self._json(503, {"error": {"code": 503, "message": "fake outage", "status": "UNAVAILABLE"}})
+                return
+
+            try:
+                prompt = json.loads(raw)["contents"][0]["parts"][0]["text"]
+            except (ValueError, KeyError, IndexError):
+                prompt = ""
+            text = f"fake answer ({len(prompt)} prompt chars)"
+            self._json(200, {
+                "candidates": [{
+                    "content": {"parts": [{"text": text}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+            })
+
+    return Handler
+
+
+def start(faults: Faults, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; server.server_address has the bound port."""
+    server = ThreadingHTTPServer((host, port), _handler(faults))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-gemini", daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=100.0)
+    ap.add_argument("--slow-rate", type=float, default=0.0)
+    ap.add_argument("--slow-ms", type=float, default=2000.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--down", action="store_true")
+    args = ap.parse_args()
+
+    faults = Faults(args.latency_ms, args.slow_rate, args.slow_ms, args.error_rate, args.down)
+    server = ThreadingHTTPServer((args.host, args.port), _handler(faults))
+    print(f"fake Gemini on http://{args.host}:{args.port}  {faults}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/import_profile.py
+"""
+Where does startup time go? Runs `python -X importtime -c "import main"` in
+a fresh interpreter and prints the slowest top-level packages and modules.
+
+  python -m benchmarks.import_profile            # import main
+  python -m benchmarks.import_profile --warm     # also run the warm-up loaders
+  python -m benchmarks.import_profile --top 40
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+WARM_SNIPPET = (
+    "import main, warmup, time; t=time.perf_counter(); "
+    "warmup._run(warmup.warmup_targets()); "
+    "print('WARMUP_SECONDS', round(time.perf_counter()-t, 3))"
+)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top", type=int, default=25)
+    ap.add_argument("--warm", action="store_true", help="also time WARMUP_MODELS loaders")
+    args = ap.parse_args()
+
+    code = WARM_SNIPPET if args.warm else "import main"
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    wall = time.perf_counter() - t0
+
+    # lines: "import time: self [us] | cumulative | imported package"
+    modules, packages = [], defaultdict(int)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cum_us, name = parts
+        raw_name = name.rstrip()
+        depth = (len(raw_name) - len(raw_name.lstrip())) // 2
+        mod = raw_name.strip()
+        self_us, cum_us = int(self_us), int(cum_us)
+        modules.append((cum_us, self_us, depth, mod))
+        packages[mod.split(".")[0]] += self_us
+
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        sys.exit(proc.returncode)
+
+    print(f"wall time (interpreter + import{' + warm-up' if args.warm else ''}): {wall:.2f}s")
+    for line in proc.stdout.splitlines():
+        if line.startswith("WARMUP_SECONDS"):
+            print(f"warm-up loaders: {line.split()[1]}s")
+
+    print(f"\nTop {args.top} packages by self time:")
+    for pkg, us in sorted(packages.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"  {us / 1000:9.1f} ms  {pkg}")
+
+    print(f"\nTop {args.top} top-level imports by cumulative time:")
+    top_level = [m for m in modules if m[2] <= 1]
+    for cum_us, _self, _d, mod in sorted(top_level, reverse=True)[: args.top]:
+        print(f"  {cum_us / 1000:9.1f} ms  {mod}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/loadgen.py
+"""
+Open-loop load generator for /chat/ask and /ext/ask.
+
+Requests are fired on a fixed schedule at each target RPS, whether or not
+earlier ones finished, so queueing shows up as latency instead of being
+hidden by a closed loop. For every step it reports achieved throughput,
+p50/p95/p99 latency and error rate, and marks the first step where the
+service saturates (p99 above --slo-ms, errors above --max-error-rate, or
+achieved RPS below 90% of the target).
+
+Pair with the mock LLM so no Gemini quota is used:
+
+  LLM_BACKEND=mock MOCK_LLM_LATENCY_MS=400 uvicorn main:app --workers 4
+  python -m benchmarks.loadgen --url http://127.0.0.1:8000 \\
+      --endpoint ext --api-key cbt_xxx --rps 5,10,20,40 --duration 30
+
+  # or in-process, without a server (single event loop, mock LLM forced):
+  python -m benchmarks.loadgen --in-process --endpoint chat \\
+      --user-email a@b.c --chat-id 0123456789abcdef --rps 5,10
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+from .common import percentiles, save_results
+from .corpus import make_queries
+
+
+def _request_spec(args):
+    if args.endpoint == "ext":
+        headers = {"X-API-Key": args.api_key}
+        return "/ext/ask", headers, lambda q: {"question": q}
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    return "/chat/ask", headers, lambda q: {
+        "user_email": args.user_email,
+        "chat_id": args.chat_id,
+        "question": q,
+    }
+
+
+async def _run_step(client, path, headers, body_fn, queries, rps: float, duration: float, timeout: float):
+    n = max(1, int(rps * duration))
+    interval = 1.0 / rps
+    lat, codes = [], Counter()
+    start = time.perf_counter()
+
+    async def one(i: int):
+        await asyncio.sleep(max(0.0, start + i * interval - time.perf_counter()))
+        t0 = time.perf_counter()
+        try:
+            r = await client.post(path, json=body_fn(queries[i % len(queries)]), headers=headers, timeout=timeout)
+            codes[r.status_code] += 1
+            if r.status_code == 200:
+                lat.append(time.perf_counter() - t0)
+        except Exception as e:
+            codes[type(e).__name__] += 1
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - start
+    errors = n - codes.get(200, 0)
+    return {
+        "target_rps": rps,
+        "sent": n,
+        "achieved_rps": round(codes.get(200, 0) / wall, 2),
+        "error_rate": round(errors / n, 4),
+        "status": {str(k): v for k, v in codes.items()},
+        "latency": percentiles(lat, ps=(50, 95, 99)),
+    }
+
+
+def _saturated(step: dict, slo_ms: float, max_err: float) -> bool:
+    p99 = step["latency"].get("p99_ms", float("inf"))
+    return (
+        p99 > slo_ms
+        or step["error_rate"] > max_err
+        or step["achieved_rps"] < 0.9 * step["target_rps"]
+    )
+
+
+async def main_async(args):
+    import httpx
+
+    if args.in_process:
+        os.environ.setdefault("LLM_BACKEND", "mock")
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadgen")
+    else:
+        limits = httpx.Limits(max_connections=args.max_connections)
+        client = httpx.AsyncClient(base_url=args.url, limits=limits)
+
+    path, headers, body_fn = _request_spec(args)
+    queries = make_queries(500)
+    steps, saturation = [], None
+    async with client:
+        for rps in [float(x) for x in args.rps.split(",") if x.strip()]:
+            step = await _run_step(client, path, headers, body_fn, queries, rps, args.duration, args.timeout)
+            step["saturated"] = _saturated(step, args.slo_ms, args.max_error_rate)
+            steps.append(step)
+            print(step)
+            if step["saturated"] and saturation is None:
+                saturation = rps
+                if not args.keep_going:
+                    break
+    return {"endpoint": path, "steps": steps, "saturation_rps": saturation}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--in-process", action="store_true", help="drive main:app via ASGI, no server")
+    ap.add_argument("--endpoint", choices=("ext", "chat"), default="ext")
+    ap.add_argument("--api-key", default=None)
+    ap.add_argument("--user-email", default=None)
+    ap.add_argument("--chat-id", default=None)
+    ap.add_argument("--token", default=None, help="session token for /chat/ask")
+    ap.add_argument("--rps", default="2,5,10,20")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per step")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--slo-ms", type=float, default=5000.0)
+    ap.add_argument("--max-error-rate", type=float, default=0.01)
+    ap.add_argument("--max-connections", type=int, default=1000)
+    ap.add_argument("--keep-going", action="store_true", help="continue past saturation")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    if args.endpoint == "ext" and not args.api_key:
+        ap.error("--api-key is required for --endpoint ext")
+    if args.endpoint == "chat" and not (args.chat_id and (args.user_email or args.token)):
+        ap.error("--chat-id and --user-email/--token are required for --endpoint chat")
+
+    results = asyncio.run(main_async(args))
+    print(f"saturation at {results['saturation_rps']} rps")
+    print(f"saved {save_results('loadgen', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,12 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 import os
+import time
 import urllib.parse
 from dotenv import load_dotenv
 
+from metrics import observe
+
 # Load .env so DB_* variables are available
 load_dotenv(override=True)
 
@@ -24,21 +27,79 @@ DATABASE_URL = (
     f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
 
-# Create engine & session factory
-engine = create_engine(
-    DATABASE_URL,
+# Pool tuning (defaults match SQLAlchemy's QueuePool, except recycle which
+# stays under MySQL's default wait_timeout of 8h)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # seconds
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))     # seconds
+
+_POOL_KWARGS = dict(
     pool_pre_ping=True,  # helps avoid stale connections
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_timeout=DB_POOL_TIMEOUT,
 )
 
+# Create engine & session factory
+engine = create_engine(DATABASE_URL, **_POOL_KWARGS)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# ─────────────────────────────────────────────
+# Async engine (aiomysql / asyncmy; aiosqlite for local runs)
+# ─────────────────────────────────────────────
+# DB_ASYNC_DRIVER picks the MySQL driver; ASYNC_DATABASE_URL overrides the
+# whole URL, e.g. "sqlite+aiosqlite:///./local.db".
+DB_ASYNC_DRIVER = os.getenv("DB_ASYNC_DRIVER", "aiomysql")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (
+    f"mysql+{DB_ASYNC_DRIVER}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def get_async_engine():
+    """
+    Build the async engine on first use, so the driver is only required
+    by processes that actually serve async routes.
+    """
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+        kwargs = {} if ASYNC_DATABASE_URL.startswith("sqlite") else _POOL_KWARGS
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **kwargs)
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _async_engine
+
 Base = declarative_base()
 
 
 # Dependency for getting DB session
 def get_db():
+    t0 = time.perf_counter()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+        observe("db_session_seconds", time.perf_counter() - t0, kind="sync")
+
+
+# Async dependency for routes that must not block the event loop
+async def get_async_db():
+    get_async_engine()
+    t0 = time.perf_counter()
+    try:
+        async with _AsyncSessionLocal() as db:
+            yield db
+    finally:
+        observe("db_session_seconds", time.perf_counter() - t0, kind="async")
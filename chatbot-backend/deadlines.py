@@ -0,0 +1,132 @@
+# deadlines.py
+"""
+Per-request deadlines and client-disconnect cancellation for the RAG path.
+
+A Deadline is created per request (route dependency `request_deadline`),
+from the X-Request-Timeout-Ms header if the client sends one, otherwise
+from the route's default. It is passed down into rag.pipeline.ask ->
+similarity_search -> the Gemini call, which check it between stages and
+hand the remaining budget to the LLM client as its timeout.
+
+`run_cancellable` runs the blocking RAG call in the threadpool while
+watching the client connection. If the client goes away or the deadline
+passes, the request ends immediately and the Deadline is cancelled, so the
+worker thread stops at the next stage boundary instead of finishing work
+nobody will read. Threads can't be killed, so an in-flight encode, search
+or LLM call still runs to completion; the admission slot passed in stays
+taken until it does, so abandoned requests can't push real concurrency
+past RAG_MAX_CONCURRENCY.
+
+Env:
+  DEADLINE_DEFAULT_SEC     routes without their own default (default 60)
+  DEADLINE_EXT_ASK_SEC     /ext/ask (default 30)
+  DEADLINE_EXT_ASK_BATCH_SEC  /ext/ask-batch, whole batch (default 120)
+  DEADLINE_CHAT_ASK_SEC    /chat/ask (default 60)
+  DEADLINE_MAX_SEC         cap on client-requested budgets (default 120)
+"""
+import asyncio
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import inc
+
+DEADLINE_DEFAULT_SEC = float(os.getenv("DEADLINE_DEFAULT_SEC", "60"))
+DEADLINE_MAX_SEC = float(os.getenv("DEADLINE_MAX_SEC", "120"))
+ROUTE_DEADLINES = {
+    "/ext/ask": float(os.getenv("DEADLINE_EXT_ASK_SEC", "30")),
+    "/ext/ask-batch": float(os.getenv("DEADLINE_EXT_ASK_BATCH_SEC", "120")),
+    "/chat/ask": float(os.getenv("DEADLINE_CHAT_ASK_SEC", "60")),
+}
+DEADLINE_HEADER = "x-request-timeout-ms"
+DISCONNECT_POLL_SEC = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before `stage`."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"deadline exceeded before {stage}")
+        self.stage = stage
+
+
+class RequestCancelled(DeadlineExceeded):
+    """The client disconnected; stop before `stage`."""
+
+    def __init__(self, stage: str):
+        Exception.__init__(self, f"request cancelled before {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self, stage: str):
+        """Raise if the request was abandoned or is out of time; call between stages."""
+        if self._cancelled.is_set():
+            raise RequestCancelled(stage)
+        if time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded(stage)
+
+
+def request_deadline(request: Request) -> Deadline:
+    """Route dependency: header budget (capped) or the route's default."""
+    route = request.scope.get("route")
+    seconds = ROUTE_DEADLINES.get(getattr(route, "path", None), DEADLINE_DEFAULT_SEC)
+    raw = request.headers.get(DEADLINE_HEADER)
+    if raw:
+        try:
+            seconds = float(raw) / 1000.0
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {DEADLINE_HEADER} header")
+        if seconds <= 0:
+            raise HTTPException(status_code=400, detail=f"Invalid {DEADLINE_HEADER} header")
+        seconds = min(seconds, DEADLINE_MAX_SEC)
+    return Deadline(seconds)
+
+
+async def run_cancellable(request: Request, deadline: Deadline, fn, *args, slot=None, **kwargs):
+    """
+    Run fn(*args, deadline=deadline, **kwargs) in the threadpool.
+    Raises 504 when the deadline passes, 499 when the client disconnects.
+    `slot` (from `async with rag_slot() as slot`) is held until the thread finishes.
+    """
+    work = asyncio.ensure_future(run_in_threadpool(fn, *args, deadline=deadline, **kwargs))
+    if slot is not None:
+        slot.hold_until(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({work}, timeout=min(DISCONNECT_POLL_SEC, deadline.remaining()))
+            if work in done:
+                return work.result()
+            if deadline.remaining() <= 0:
+                raise DeadlineExceeded("response")
+            if await request.is_disconnected():
+                raise RequestCancelled("response")
+    except RequestCancelled as e:
+        inc("request_cancelled_total", reason="disconnect", stage=e.stage)
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except DeadlineExceeded as e:
+        inc("request_cancelled_total", reason="deadline", stage=e.stage)
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    finally:
+        if not work.done():
+            deadline.cancel()
+            # the thread finishes on its own; don't log its late result as an error
+            work.add_done_callback(lambda t: t.exception())
@@ -0,0 +1,126 @@
+# google_verify.py
+"""
+Google ID-token verification with cached signing certificates.
+
+id_token.verify_oauth2_token() re-downloads Google's certs through whatever
+transport it is given, on every call. Here we keep one pooled HTTP session,
+cache the certs for the Cache-Control max-age Google sends, refresh them in
+a background thread shortly before they expire, and force one refresh if a
+token is signed with a key id we haven't seen (key rotation).
+
+Uses env:
+  GOOGLE_CERTS_URL   cert endpoint (default Google's; point at a local
+                     stand-in serving {kid: PEM} JSON for testing)
+"""
+import base64
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from google.auth import jwt as google_jwt
+
+log = logging.getLogger("google_verify")
+
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = {"accounts.google.com", "https://accounts.google.com"}
+
+DEFAULT_MAX_AGE = 3600        # used when the response has no max-age
+REFRESH_AHEAD_FRACTION = 0.2  # refresh in the background in the last 20% of the TTL
+CLOCK_SKEW_SEC = 10
+MIN_FORCED_REFRESH_SEC = 60   # unknown-kid refetches at most once a minute
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleTokenVerifier:
+  def __init__(self, certs_url: str = GOOGLE_CERTS_URL):
+    self.certs_url = certs_url
+    self._session = requests.Session()
+    self._lock = threading.Lock()
+    self._certs: Dict[str, str] = {}
+    self._fetched_at = 0.0
+    self._max_age = 0.0
+    self._refreshing = False
+
+  # ── cert cache ────────────────────────────
+  def _fetch(self):
+    resp = self._session.get(self.certs_url, timeout=5)
+    resp.raise_for_status()
+    certs = resp.json()
+    m = _MAX_AGE_RE.search(resp.headers.get("Cache-Control", ""))
+    max_age = float(m.group(1)) if m else DEFAULT_MAX_AGE
+    with self._lock:
+      self._certs = certs
+      self._fetched_at = time.monotonic()
+      self._max_age = max_age
+
+  def _background_refresh(self):
+    try:
+      self._fetch()
+    except Exception as e:
+      log.warning("Background Google cert refresh failed: %r", e)
+    finally:
+      with self._lock:
+        self._refreshing = False
+
+  def get_certs(self, force: bool = False) -> Dict[str, str]:
+    with self._lock:
+      age = time.monotonic() - self._fetched_at
+      fresh = bool(self._certs) and age < self._max_age
+      refresh_soon = fresh and age > self._max_age * (1 - REFRESH_AHEAD_FRACTION)
+      if refresh_soon and not self._refreshing and not force:
+        self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+      if fresh and not force:
+        return self._certs
+
+    self._fetch()
+    with self._lock:
+      return self._certs
+
+  # ── verification ──────────────────────────
+  def verify(self, token: str, audience: str) -> dict:
+    """
+    Return the token's claims, or raise ValueError if it is not a valid
+    Google ID token for `audience`.
+    """
+    certs = self.get_certs()
+    kid = _key_id(token)
+    if kid and kid not in certs and time.monotonic() - self._fetched_at > MIN_FORCED_REFRESH_SEC:
+      certs = self.get_certs(force=True)
+
+    claims = google_jwt.decode(
+      token,
+      certs=certs,
+      audience=audience,
+      clock_skew_in_seconds=CLOCK_SKEW_SEC,
+    )
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+      raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+    return claims
+
+
+def _key_id(token: str) -> Optional[str]:
+  """Key id from the (unverified) JWT header, used only to pick a cert."""
+  try:
+    header = token.split(".", 1)[0]
+    return json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4))).get("kid")
+  except Exception:
+    return None
+
+
+_verifier: Optional[GoogleTokenVerifier] = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier() -> GoogleTokenVerifier:
+  global _verifier
+  with _verifier_lock:
+    if _verifier is None:
+      _verifier = GoogleTokenVerifier()
+    return _verifier
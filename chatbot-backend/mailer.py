@@ -0,0 +1,229 @@
+# mailer.py
+"""
+Email outbox + background SMTP sender.
+
+Routes call enqueue_email() inside their own transaction and return as soon
+as it commits. OutboxSender (one thread per process) picks up due rows,
+sends them over a single long-lived authenticated SMTP connection and
+retries failures with backoff.
+
+Uses env:
+  SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_FROM_EMAIL, SMTP_FROM_NAME
+  SMTP_STARTTLS          "1" (default) to STARTTLS on non-465 ports; "0" for a
+                         plain local stand-in such as `python -m aiosmtpd -n`
+  OUTBOX_POLL_SEC        how often to look for due rows (default 2)
+  OUTBOX_MAX_ATTEMPTS    give up after this many failures (default 5)
+  SMTP_IDLE_SEC          close the pooled connection after this idle time (default 60)
+"""
+import logging
+import os
+import smtplib
+import ssl
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Optional
+
+from database import SessionLocal
+from models import EmailOutbox
+
+log = logging.getLogger("mailer")
+
+OUTBOX_POLL_SEC = float(os.getenv("OUTBOX_POLL_SEC", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_BATCH = 50
+SMTP_IDLE_SEC = float(os.getenv("SMTP_IDLE_SEC", "60"))
+SEND_LEASE = timedelta(minutes=2)   # a crashed sender's rows become due again after this
+
+
+def _smtp_config() -> dict:
+  smtp_user = os.getenv("SMTP_USER")
+  return {
+    "host": os.getenv("SMTP_HOST"),
+    "port": int(os.getenv("SMTP_PORT", "587")),
+    "user": smtp_user,
+    "password": os.getenv("SMTP_PASSWORD"),
+    "from_email": os.getenv("SMTP_FROM_EMAIL") or smtp_user,
+    "from_name": os.getenv("SMTP_FROM_NAME", "Automated Domain Expert Chatbot"),
+    "starttls": os.getenv("SMTP_STARTTLS", "1") != "0",
+  }
+
+
+def enqueue_email(db, to_email: str, subject: str, body: str) -> EmailOutbox:
+  """
+  Add an outbox row to `db`. The caller commits (so the email is only sent
+  if the surrounding change is saved) and may then call notify_sender().
+  """
+  row = EmailOutbox(
+    to_email=to_email,
+    subject=subject,
+    body=body,
+    status="pending",
+    attempts=0,
+    next_attempt_at=datetime.utcnow(),
+  )
+  db.add(row)
+  return row
+
+
+# ============================================================
+# Sender
+# ============================================================
+
+class OutboxSender:
+  def __init__(self):
+    self._conn: Optional[smtplib.SMTP] = None
+    self._last_used = 0.0
+    self._wake = threading.Event()
+    self._stop = threading.Event()
+    self._thread: Optional[threading.Thread] = None
+
+  # ── lifecycle ─────────────────────────────
+  def start(self):
+    if self._thread is None or not self._thread.is_alive():
+      self._stop.clear()
+      self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+      self._thread.start()
+
+  def stop(self, timeout: float = 5.0):
+    self._stop.set()
+    self._wake.set()
+    if self._thread is not None:
+      self._thread.join(timeout)
+      self._thread = None
+    self._close_conn()
+
+  def notify(self):
+    """Wake the sender now instead of waiting for the next poll."""
+    self._wake.set()
+
+  # ── SMTP connection reuse ─────────────────
+  def _connect(self, cfg: dict) -> smtplib.SMTP:
+    if self._conn is not None:
+      if time.monotonic() - self._last_used < SMTP_IDLE_SEC:
+        try:
+          if self._conn.noop()[0] == 250:
+            return self._conn
+        except smtplib.SMTPException:
+          pass
+      self._close_conn()
+
+    # Port 465 → SSL; otherwise plain + optional STARTTLS
+    context = ssl.create_default_context()
+    if cfg["port"] == 465:
+      conn = smtplib.SMTP_SSL(cfg["host"], cfg["port"], context=context, timeout=15)
+    else:
+      conn = smtplib.SMTP(cfg["host"], cfg["port"], timeout=15)
+      if cfg["starttls"]:
+        conn.starttls(context=context)
+    if cfg["user"] and cfg["password"]:
+      conn.login(cfg["user"], cfg["password"])
+    self._conn = conn
+    return conn
+
+  def _close_conn(self):
+    if self._conn is not None:
+      try:
+        self._conn.quit()
+      except Exception:
+        pass
+      self._conn = None
+
+  def _send_one(self, cfg: dict, row: EmailOutbox):
+    msg = EmailMessage()
+    msg["Subject"] = row.subject
+    msg["From"] = f"{cfg['from_name']} <{cfg['from_email']}>"
+    msg["To"] = row.to_email
+    msg.set_content(row.body)
+    try:
+      self._connect(cfg).send_message(msg)
+    except smtplib.SMTPServerDisconnected:
+      # pooled connection went stale between NOOP and send: one fresh try
+      self._close_conn()
+      self._connect(cfg).send_message(msg)
+    self._last_used = time.monotonic()
+
+  # ── main loop ─────────────────────────────
+  def _run(self):
+    while not self._stop.is_set():
+      try:
+        sent = self.drain_once()
+      except Exception as e:
+        log.error("Outbox pass failed: %r", e)
+        sent = 0
+      if sent == 0:
+        if self._conn is not None and time.monotonic() - self._last_used > SMTP_IDLE_SEC:
+          self._close_conn()
+        self._wake.wait(OUTBOX_POLL_SEC)
+        self._wake.clear()
+
+  def drain_once(self) -> int:
+    """Send every due row once. Returns how many were attempted."""
+    cfg = _smtp_config()
+    if not cfg["host"] or not cfg["from_email"]:
+      return 0
+
+    db = SessionLocal()
+    try:
+      now = datetime.utcnow()
+      due = (
+        db.query(EmailOutbox)
+        .filter(EmailOutbox.status.in_(("pending", "sending")), EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at.asc(), EmailOutbox.id.asc())
+        .limit(OUTBOX_BATCH)
+        .all()
+      )
+      attempted = 0
+      for row in due:
+        # Claim the row; another worker process may be racing us for it
+        claimed = (
+          db.query(EmailOutbox)
+          .filter(
+            EmailOutbox.id == row.id,
+            EmailOutbox.status == row.status,
+            EmailOutbox.next_attempt_at == row.next_attempt_at,
+          )
+          .update(
+            {"status": "sending", "next_attempt_at": now + SEND_LEASE},
+            synchronize_session=False,
+          )
+        )
+        db.commit()
+        if not claimed:
+          continue
+
+        db.refresh(row)
+        attempted += 1
+        try:
+          self._send_one(cfg, row)
+          row.status = "sent"
+          row.sent_at = datetime.utcnow()
+          row.last_error = None
+          log.info("Email %s sent to %s", row.id, row.to_email)
+        except Exception as e:
+          self._close_conn()
+          row.attempts = (row.attempts or 0) + 1
+          row.last_error = repr(e)[:1000]
+          if row.attempts >= OUTBOX_MAX_ATTEMPTS:
+            row.status = "failed"
+            log.error("Email %s to %s failed permanently: %r", row.id, row.to_email, e)
+          else:
+            row.status = "pending"
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=2 ** row.attempts * 5)
+            log.warning("Email %s to %s failed (attempt %d): %r", row.id, row.to_email, row.attempts, e)
+        db.commit()
+      return attempted
+    finally:
+      db.close()
+
+
+_sender = OutboxSender()
+
+
+def get_sender() -> OutboxSender:
+  return _sender
+
+
+def notify_sender():
+  _sender.notify()
@@ -1,14 +1,20 @@
 # main.py
+import math
 import os
 
-from fastapi import FastAPI
+import time
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 
 # Load environment variables (e.g., GEMINI_API_KEY, GOOGLE_CLIENT_ID, SMTP_*)
 load_dotenv(override=True)
 
 # --- Routers ---
+# Importing these is cheap: torch, transformers, chromadb, faster-whisper and
+# the Gemini SDK are only imported by their lazy getters (see warmup.py).
 from auth import router as auth_router
 from routes.ingest import router as ingest_router
 from routes.chat import router as chat_router
@@ -27,6 +33,8 @@ from models import (
     Chat,
     Message,
     ApiKey,  # ApiKey included so table is created
+    ApiKeyScope,
+    EmailOutbox,
 )
 
 app = FastAPI(title="Chatbot Backend")
@@ -45,6 +53,50 @@ app.add_middleware(
 )
 
 
+# ─────────────────────────────────────────────
+# Per-route latency / status metrics (exposed on /metrics)
+# ─────────────────────────────────────────────
+from metrics import inc, observe, render_prometheus
+
+
+@app.middleware("http")
+async def _route_metrics(request: Request, call_next):
+    t0 = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Use the route template (/chats/{chat_id}/messages), not the raw path,
+        # so label cardinality stays bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        observe("http_request_seconds", time.perf_counter() - t0, route=path, method=request.method)
+        inc("http_requests_total", route=path, method=request.method, status=status_code)
+
+
+# Gemini down or failing (after retries / with the circuit open): 503, so
+# clients retry later and no "(Gemini error)" answer is stored in a chat
+from rag.llm_client import LLMError, LLMUnavailable
+
+
+@app.exception_handler(LLMError)
+async def _llm_error(request: Request, exc: LLMError):
+    if isinstance(exc, LLMUnavailable):
+        return JSONResponse(
+            {"detail": "The language model is temporarily unavailable, please retry shortly."},
+            status_code=503,
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        )
+    return JSONResponse({"detail": f"The language model could not answer: {exc}"}, status_code=502)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 # Health/root
 @app.get("/")
 def read_root():
@@ -56,6 +108,15 @@ def health():
     return {"ok": True}
 
 
+# Per-model readiness; 503 until the WARMUP_MODELS set is loaded
+@app.get("/ready")
+def ready():
+    from warmup import readiness
+
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
 # Quick check that the Gemini key is loaded
 @app.get("/debug/gemini")
 def debug_gemini():
@@ -84,9 +145,59 @@ async def _startup():
     # Create any missing tables (won't touch existing ones)
     Base.metadata.create_all(bind=engine)
 
+    # Sidecar connections unpickle what they receive: no socket without a secret
+    from rag import inference_client
+    if inference_client.enabled():
+        inference_client.require_authkey()
+
+    # Load heavy models in the background so /health answers immediately
+    from warmup import start_warmup
+    start_warmup()
+
+    # Background sender for the email outbox
+    from mailer import get_sender
+    get_sender().start()
+
+    # Periodic orphan-collection GC + compaction (VECTOR_GC_INTERVAL_SEC, off by default)
+    from vector_gc import get_gc
+    get_gc().start()
+
     # Helpful warning if key is missing
     if not os.getenv("GEMINI_API_KEY"):
         print(
             "[WARN] GEMINI_API_KEY is not set. "
             "Add it to a .env file in the backend root."
         )
+    from security import AUTH_REQUIRE_TOKEN
+    if not AUTH_REQUIRE_TOKEN:
+        print(
+            "[WARN] AUTH_REQUIRE_TOKEN is off: requests without a session token "
+            "are trusted on their user_email. Set AUTH_REQUIRE_TOKEN=1 once all "
+            "clients send Bearer tokens (see security.py)."
+        )
+    if not os.getenv("SESSION_SECRET"):
+        print(
+            "[WARN] SESSION_SECRET is not set; session tokens are signed with "
+            "a per-process random key and won't survive restarts or span workers."
+        )
+
+
+# Flush buffered chat messages, then release pooled async connections
+@app.on_event("shutdown")
+async def _shutdown():
+    from fastapi.concurrency import run_in_threadpool
+    from database import _async_engine
+    from message_log import get_writer
+    from security import shutdown_pool
+    from mailer import get_sender
+    from vector_gc import get_gc
+    from rag import bulk_ingest
+
+    await run_in_threadpool(get_writer().close)
+    await run_in_threadpool(get_sender().stop)
+    await run_in_threadpool(get_gc().stop)
+    shutdown_pool()
+    bulk_ingest.shutdown()
+
+    if _async_engine is not None:
+        await _async_engine.dispose()
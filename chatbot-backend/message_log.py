@@ -0,0 +1,175 @@
+# message_log.py
+"""
+Write-behind persistence for chat messages.
+
+Routes hand Message rows to a single background writer thread instead of
+committing them inline. The writer drains its queue into one multi-row
+INSERT per batch, flushing when MESSAGE_LOG_BATCH_SIZE rows are waiting or
+MESSAGE_LOG_FLUSH_MS has passed since the first one arrived.
+
+Env:
+  MESSAGE_LOG_MODE        "batched" (default) or "inline" (old per-request commits)
+  MESSAGE_LOG_DURABILITY  "buffered" (default): return as soon as the row is queued
+                          "commit": wait until the batch holding the row is committed
+                          (group commit — still one transaction for many requests)
+  MESSAGE_LOG_BATCH_SIZE  max rows per INSERT (default 200)
+  MESSAGE_LOG_FLUSH_MS    max time a row waits before a flush (default 50)
+
+Ordering: there is one writer and one FIFO queue, so rows are inserted in
+the order they were logged, and a chat's user message always lands before
+its assistant reply.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from database import SessionLocal
+from models import Message
+
+log = logging.getLogger("message_log")
+
+MESSAGE_LOG_MODE = os.getenv("MESSAGE_LOG_MODE", "batched").lower()
+MESSAGE_LOG_DURABILITY = os.getenv("MESSAGE_LOG_DURABILITY", "buffered").lower()
+MESSAGE_LOG_BATCH_SIZE = int(os.getenv("MESSAGE_LOG_BATCH_SIZE", "200"))
+MESSAGE_LOG_FLUSH_MS = int(os.getenv("MESSAGE_LOG_FLUSH_MS", "50"))
+
+MAX_RETRIES = 3
+
+_Item = Tuple[dict, Future]
+_STOP = object()
+
+
+class MessageLogWriter:
+    def __init__(self, batch_size: int = MESSAGE_LOG_BATCH_SIZE, flush_ms: int = MESSAGE_LOG_FLUSH_MS):
+        self.batch_size = max(1, batch_size)
+        self.flush_sec = max(0, flush_ms) / 1000.0
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # ── lifecycle ─────────────────────────────
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="message-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything queued so far and stop the writer."""
+        with self._lock:
+            t = self._thread
+            self._thread = None
+        if t is not None and t.is_alive():
+            self._q.put(_STOP)
+            t.join(timeout)
+
+    # ── producer side ─────────────────────────
+    def submit(self, chat_id: str, role: str, text: str, msg_id: str) -> Future:
+        self.start()
+        fut: Future = Future()
+        self._q.put(({"id": msg_id, "chat_id": chat_id, "role": role, "text": text}, fut))
+        return fut
+
+    # ── writer thread ─────────────────────────
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._q.get()
+            if first is _STOP:
+                break
+            batch: List[_Item] = [first]
+            deadline = time.monotonic() + self.flush_sec
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._q.get(timeout=max(0.0, remaining)) if remaining > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+        # drain anything that raced in before the stop marker was seen
+        rest: List[_Item] = []
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        for i in range(0, len(rest), self.batch_size):
+            self._flush(rest[i:i + self.batch_size])
+
+    def _insert(self, rows: List[dict]) -> Optional[Exception]:
+        db = SessionLocal()
+        try:
+            db.execute(insert(Message), rows)
+            db.commit()
+            return None
+        except Exception as e:
+            db.rollback()
+            return e
+        finally:
+            db.close()
+
+    def _flush(self, batch: List[_Item]):
+        rows = [row for row, _f in batch]
+        err: Optional[Exception] = None
+        for attempt in range(1, MAX_RETRIES + 1):
+            err = self._insert(rows)
+            if err is None:
+                break
+            log.warning("Message batch insert failed (attempt %d/%d): %r", attempt, MAX_RETRIES, err)
+            time.sleep(0.05 * attempt)
+
+        if err is None:
+            for _row, fut in batch:
+                fut.set_result(True)
+            return
+
+        # One bad row (e.g. its chat was deleted meanwhile) must not sink
+        # the rest of the batch: fall back to row-by-row inserts.
+        for row, fut in batch:
+            row_err = self._insert([row]) if len(batch) > 1 else err
+            if row_err is None:
+                fut.set_result(True)
+            else:
+                log.error("Dropping chat message %s: %r", row["id"], row_err)
+                fut.set_exception(row_err)
+
+
+_writer = MessageLogWriter()
+
+
+def get_writer() -> MessageLogWriter:
+    return _writer
+
+
+async def log_messages(db, messages: List[Message]):
+    """
+    Persist chat messages from an async route according to MESSAGE_LOG_MODE.
+
+    `db` is the request's AsyncSession; it is only used in "inline" mode.
+    In "buffered" durability, failures are logged by the writer and never
+    reach the request.
+    """
+    if MESSAGE_LOG_MODE == "inline":
+        db.add_all(messages)
+        await db.commit()
+        return
+
+    futs = [_writer.submit(m.chat_id, m.role, m.text, m.id) for m in messages]
+    if MESSAGE_LOG_DURABILITY == "commit":
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in futs))
@@ -0,0 +1,154 @@
+# metrics.py
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+No external client library: counters and fixed-bucket histograms keyed by
+(name, sorted labels), guarded by one lock. Recording is a dict lookup plus
+a bisect, so it is cheap enough for every RAG stage and model call.
+
+Usage:
+  from metrics import timed, inc, observe
+
+  with timed("rag_stage_seconds", stage="embed", dataset=collection):
+      ...
+  inc("llm_calls_total", outcome="ok")
+
+GET /metrics (see main.py) renders everything via render_prometheus().
+Metrics are per process; with several uvicorn workers each one reports its
+own series.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Seconds; spans sub-ms Chroma lookups to multi-second Gemini calls
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_HELP = {
+    "rag_stage_seconds": "Latency of RAG pipeline stages (parse, split, embed, upsert, query, llm).",
+    "rag_chunks_total": "Chunks produced by ingestion.",
+    "model_call_seconds": "Latency of local model calls (embedder, BLIP, Whisper).",
+    "model_items_total": "Items processed by local models.",
+    "db_session_seconds": "Lifetime of a request DB session.",
+    "http_request_seconds": "HTTP request latency by route template.",
+    "http_requests_total": "HTTP requests by route template and status.",
+    "rate_limited_total": "Requests rejected with 429 by scope (api_key, user, queue_full, queue_timeout).",
+    "rag_inflight": "RAG requests currently holding an admission slot.",
+    "rag_queue_depth": "RAG requests waiting for an admission slot.",
+    "embedder_runtime_info": "Embedding runtime in use after the parity check (label runtime).",
+    "retrieval_path_total": "Retrieval queries by path (lexical fast path, hybrid, vector only).",
+    "vector_store_maintenance_seconds": "Duration of vector store compaction passes.",
+    "vector_gc_collections_dropped_total": "Orphaned Chroma collections dropped by vector_gc.",
+    "ask_batch_questions_total": "Questions answered by /ext/ask-batch by outcome (ok, error).",
+    "llm_calls_total": "LLM calls by feature and outcome (ok, error, rejected, deadline).",
+    "llm_call_seconds": "LLM call latency including retries and hedges, by feature and outcome.",
+    "llm_retries_total": "LLM attempts retried after a transient error, by feature and error type.",
+    "llm_hedges_total": "Hedged duplicate LLM requests by feature (sent, won, skipped: over budget or pool full).",
+    "llm_circuit_state": "LLM circuit breaker state (0 closed, 1 half-open, 2 open).",
+    "llm_circuit_transitions_total": "LLM circuit breaker state changes by target state.",
+    "llm_circuit_rejected_total": "LLM calls failed fast by the open circuit, by feature.",
+    "bulk_ingest_files_total": "Files handled by /ingest/bulk by status (indexed, failed, skipped).",
+    "bulk_ingest_seconds": "Duration of /ingest/bulk runs, extraction to last upsert.",
+    "embedding_cache_lookups_total": "Chunks looked up in the shared embedding cache before embedding (hit, miss).",
+    "request_cancelled_total": "RAG requests ended early by reason (disconnect, deadline) and stage.",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_gauges: Dict[str, Dict[LabelKey, float]] = {}
+_hists: Dict[str, Dict[LabelKey, List]] = {}   # [bucket_counts, sum, count]
+
+
+def _key(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    k = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[k] = series.get(k, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    k = _key(labels)
+    with _lock:
+        _gauges.setdefault(name, {})[k] = value
+
+
+def observe(name: str, value: float, **labels):
+    k = _key(labels)
+    i = bisect.bisect_left(DEFAULT_BUCKETS, value)
+    with _lock:
+        series = _hists.setdefault(name, {})
+        h = series.get(k)
+        if h is None:
+            h = series[k] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0]
+        h[0][i] += 1
+        h[1] += value
+        h[2] += 1
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """Observe the duration of the block in seconds (also on error)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+
+# ─────────────────────────────
+# Exposition
+# ─────────────────────────────
+def _fmt_labels(k: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = k + extra
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{n}="{esc(v)}"' for n, v in items) + "}"
+
+
+def render_prometheus() -> str:
+    with _lock:
+        counters = {n: dict(s) for n, s in _counters.items()}
+        gauges = {n: dict(s) for n, s in _gauges.items()}
+        hists = {n: {k: [list(h[0]), h[1], h[2]] for k, h in s.items()} for n, s in _hists.items()}
+
+    out: List[str] = []
+    for name, series in sorted(counters.items()):
+        if name in _HELP:
+            out.append(f"# HELP {name} {_HELP[name]}")
+        out.append(f"# TYPE {name} counter")
+        for k, v in series.items():
+            out.append(f"{name}{_fmt_labels(k)} {v}")
+
+    for name, series in sorted(gauges.items()):
+        if name in _HELP:
+            out.append(f"# HELP {name} {_HELP[name]}")
+        out.append(f"# TYPE {name} gauge")
+        for k, v in series.items():
+            out.append(f"{name}{_fmt_labels(k)} {v}")
+
+    for name, series in sorted(hists.items()):
+        if name in _HELP:
+            out.append(f"# HELP {name} {_HELP[name]}")
+        out.append(f"# TYPE {name} histogram")
+        for k, (buckets, total, count) in series.items():
+            cum = 0
+            for bound, n in zip(DEFAULT_BUCKETS, buckets):
+                cum += n
+                out.append(f"{name}_bucket{_fmt_labels(k, (('le', repr(bound)),))} {cum}")
+            out.append(f"{name}_bucket{_fmt_labels(k, (('le', '+Inf'),))} {count}")
+            out.append(f"{name}_sum{_fmt_labels(k)} {total}")
+            out.append(f"{name}_count{_fmt_labels(k)} {count}")
+
+    return "\n".join(out) + "\n"
@@ -10,6 +10,7 @@ from sqlalchemy import (
     DateTime,
     Text,
     ForeignKey,
+    Index,
     func,
 )
 from sqlalchemy.orm import relationship
@@ -50,6 +51,11 @@ class Dataset(Base):
     collection = Column(String(64), nullable=False)  # e.g., ds_<id>
     created_at = Column(DateTime, server_default=func.now())
 
+    # Keyset pagination of /datasets walks (user_email, created_at)
+    __table_args__ = (
+        Index("ix_datasets_user_created", "user_email", "created_at"),
+    )
+
     chats = relationship(
         "Chat",
         back_populates="dataset",
@@ -71,6 +77,11 @@ class Chat(Base):
     title = Column(String(255), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
+    # Keyset pagination of /chats walks (dataset_id, user_email, created_at)
+    __table_args__ = (
+        Index("ix_chats_dataset_user_created", "dataset_id", "user_email", "created_at"),
+    )
+
     dataset = relationship("Dataset", back_populates="chats")
     messages = relationship(
         "Message",
@@ -93,6 +104,11 @@ class Message(Base):
     text = Column(Text, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
+    # Keyset pagination of /chats/{id}/messages walks (chat_id, created_at)
+    __table_args__ = (
+        Index("ix_messages_chat_created", "chat_id", "created_at"),
+    )
+
     chat = relationship("Chat", back_populates="messages")
 
 
@@ -114,3 +130,41 @@ class ApiKey(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     last_used = Column(DateTime, nullable=True)
+
+
+# ─────────────────────────────────────────────
+# ApiKeyScope: restricts a key to some documents of its dataset
+# (no rows = the whole dataset). Matched against chunk metadata "source"
+# (upload file name or scraped URL).
+# ─────────────────────────────────────────────
+class ApiKeyScope(Base):
+    __tablename__ = "api_key_scopes"
+
+    id = Column(Integer, primary_key=True)
+    api_key_id = Column(Integer, ForeignKey("api_keys.id"), index=True, nullable=False)
+    source = Column(String(1024), nullable=False)
+
+
+# ─────────────────────────────────────────────
+# Email outbox (rows are sent by mailer.OutboxSender)
+# ─────────────────────────────────────────────
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+
+    status = Column(String(16), default="pending", nullable=False)  # pending | sending | sent | failed
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    # When the row may next be picked up; doubles as the lease for "sending"
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next", "status", "next_attempt_at"),
+    )
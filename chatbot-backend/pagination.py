@@ -0,0 +1,94 @@
+# pagination.py
+"""
+Keyset (cursor) pagination helpers for the listing routes.
+
+A cursor encodes the (created_at, id) of the last row on a page, so the next
+page is a single indexed range scan instead of an OFFSET that re-reads
+everything before it. Pair each listing with a composite index on
+(<owner column>, created_at) — see models.py.
+
+Rows with a NULL created_at (created before the column had a default) sort
+before every timestamp, on every database; their cursors carry an empty
+stamp and continue within the NULL rows, then past them.
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: str) -> str:
+    stamp = created_at.isoformat() if created_at else ""
+    raw = f"{stamp}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        stamp, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return (datetime.fromisoformat(stamp) if stamp else None), row_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, created_col, id_col, cursor: Optional[str], descending: bool):
+    """
+    Order `query` by (created_col, id_col) and, if a cursor is given,
+    continue strictly after it.
+    """
+    if cursor:
+        c_at, c_id = decode_cursor(cursor)
+        is_null = created_col.is_(None)
+        if c_at is None:
+            same = and_(is_null, id_col < c_id if descending else id_col > c_id)
+            # descending: NULL rows come last, nothing follows them
+            query = query.filter(same if descending else or_(same, created_col.isnot(None)))
+        elif descending:
+            query = query.filter(
+                or_(created_col < c_at, and_(created_col == c_at, id_col < c_id), is_null)
+            )
+        else:
+            query = query.filter(
+                or_(created_col > c_at, and_(created_col == c_at, id_col > c_id))
+            )
+
+    if descending:
+        return query.order_by(created_col.desc().nulls_last(), id_col.desc())
+    return query.order_by(created_col.asc().nulls_first(), id_col.asc())
+
+
+def fetch_page(query, limit: Optional[int]):
+    """
+    Run a keyset-ordered query. Returns (rows, has_more).
+    limit=None keeps the old "return everything" behaviour.
+    """
+    if limit is None:
+        return query.all(), False
+    rows = query.limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+async def fetch_page_async(db, stmt, limit: Optional[int], scalars: bool = True):
+    """
+    Same as fetch_page, for a select() run on an AsyncSession.
+    scalars=False returns full rows (for multi-entity selects).
+    """
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    res = await db.execute(stmt)
+    rows = res.scalars().all() if scalars else res.all()
+    if limit is None:
+        return rows, False
+    return rows[:limit], len(rows) > limit
+
+
+def next_cursor(rows, has_more: bool) -> Optional[str]:
+    if not has_more or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.created_at, last.id)
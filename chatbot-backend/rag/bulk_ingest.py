@@ -0,0 +1,312 @@
+# rag/bulk_ingest.py
+"""
+Bulk ingestion for /ingest/bulk: many files, or zip/tar archives, into one
+collection.
+
+  extract   archives are read member by member (tar in streaming mode) and
+            each member is written to its own file as soon as it is read;
+            nothing is unpacked up front
+  parse     parse_file + recursive_split run in a process pool
+            (BULK_PARSE_WORKERS), so PDFs parse on several cores while the
+            archive is still being extracted
+  embed     chunks of several files are pooled into BULK_EMBED_BATCH-sized
+            batches, one upsert_many (embed + write) per batch, overlapping
+            with the parsing still going on
+
+bulk_ingest() yields one progress event per file and stage (see its
+docstring), which the route streams back as NDJSON.
+
+Env:
+  BULK_PARSE_WORKERS   parser processes (default min(4, CPUs))
+  BULK_EMBED_BATCH     chunks per embedding/upsert batch (default 256)
+  BULK_MAX_FILES       files per request, archive members included (default 500)
+  BULK_MAX_BYTES       total extracted bytes per request (default 1 GiB)
+"""
+import multiprocessing
+import os
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Spawned parse workers import this module: keep the top-level imports light
+# (the vector store and the embedder are imported inside bulk_ingest).
+from metrics import inc, observe
+from .file_parser import SUPPORTED_EXTS, parse_file
+from .text_splitter import recursive_split
+
+BULK_PARSE_WORKERS = int(os.getenv("BULK_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+BULK_EMBED_BATCH = int(os.getenv("BULK_EMBED_BATCH", "256"))
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "500"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(1 << 30)))
+
+ARCHIVE_EXTS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+COPY_BUFFER = 1 << 20
+
+# (display name, path on disk or None, reason it was skipped)
+Item = Tuple[str, Optional[str], Optional[str]]
+
+
+def archive_kind(name: str) -> Optional[str]:
+    n = name.lower()
+    if n.endswith(".zip"):
+        return "zip"
+    if n.endswith(ARCHIVE_EXTS):
+        return "tar"
+    return None
+
+
+def is_accepted(name: str) -> bool:
+    return archive_kind(name) is not None or os.path.splitext(name)[-1].lower() in SUPPORTED_EXTS
+
+
+# ─────────────────────────────
+# Extraction
+# ─────────────────────────────
+class _Budget:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+
+    def take_file(self) -> Optional[str]:
+        if self.files >= BULK_MAX_FILES:
+            return f"more than {BULK_MAX_FILES} files"
+        self.files += 1
+        return None
+
+
+def _member_name(raw: str) -> Optional[str]:
+    """Archive member path as shown to users; None for junk entries."""
+    parts = [p for p in raw.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    if not parts or parts[0] == "__MACOSX" or parts[-1].startswith("."):
+        return None
+    return "/".join(parts)
+
+
+def _copy_member(src, dst: str, budget: _Budget):
+    """Stream one member to disk, enforcing the byte budget on actual bytes (not headers)."""
+    with open(dst, "wb") as out:
+        while True:
+            buf = src.read(COPY_BUFFER)
+            if not buf:
+                return
+            budget.bytes += len(buf)
+            if budget.bytes > BULK_MAX_BYTES:
+                raise ValueError(f"archive expands to more than {BULK_MAX_BYTES} bytes")
+            out.write(buf)
+
+
+def _archive_members(path: str, kind: str) -> Iterator[Tuple[str, object]]:
+    """(member name, readable file object) for each regular file, in archive order."""
+    if kind == "zip":
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as src:
+                        yield info.filename, src
+    else:
+        with tarfile.open(path, mode="r|*") as tf:   # streaming: one pass, no seeking
+            for member in tf:
+                if member.isfile():
+                    src = tf.extractfile(member)
+                    if src is not None:
+                        yield member.name, src
+
+
+def extract_uploads(uploads: List[Tuple[str, str]], workdir: str) -> Iterator[Item]:
+    """
+    Expand saved uploads [(original name, path)] into ingestible files.
+    Plain files pass through; archive members are written to `workdir`
+    under generated names (member paths never touch the filesystem).
+    Once the file budget is spent, every remaining upload and member is
+    still reported, as skipped.
+    """
+    budget = _Budget()
+    for name, path in uploads:
+        kind = archive_kind(name)
+        if kind is None:
+            reason = budget.take_file()
+            yield (name, None, reason) if reason else (name, path, None)
+            continue
+        try:
+            for raw, src in _archive_members(path, kind):
+                member = _member_name(raw)
+                if member is None:
+                    continue
+                display = f"{name}/{member}"
+                ext = os.path.splitext(member)[-1].lower()
+                if ext not in SUPPORTED_EXTS:
+                    yield display, None, "unsupported file type"
+                    continue
+                reason = budget.take_file()
+                if reason:
+                    yield display, None, reason
+                    continue
+                dst = os.path.join(workdir, f"{uuid.uuid4().hex}{ext}")
+                _copy_member(src, dst, budget)
+                yield display, dst, None
+        except (zipfile.BadZipFile, tarfile.TarError, OSError, ValueError) as e:
+            yield name, None, f"archive error: {e}"
+
+
+# ─────────────────────────────
+# Parsing (process pool)
+# ─────────────────────────────
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _parse_pool() -> ProcessPoolExecutor:
+    # spawn, not fork: the parent has torch and Chroma threads running
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, BULK_PARSE_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool(broken: Optional[ProcessPoolExecutor] = None):
+    """Drop the pool (only if it is still `broken`, when given), so the next use starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or (broken is not None and _pool is not broken):
+            return
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _parse_and_split(path: str) -> Tuple[List[str], float]:
+    """Runs in a worker process: same parse + split as pipeline.ingest_document."""
+    t0 = time.perf_counter()
+    chunks = recursive_split(parse_file(path), chunk_size=700, overlap=100)
+    return chunks, time.perf_counter() - t0
+
+
+def shutdown():
+    _reset_pool()
+
+
+# ─────────────────────────────
+# Ingestion
+# ─────────────────────────────
+def bulk_ingest(collection_name: str, items: Iterator[Item]) -> Iterator[dict]:
+    """
+    Parse and index `items` (from extract_uploads) into one collection,
+    yielding progress events:
+
+      {"file": f, "status": "skipped", "error": why}
+      {"file": f, "status": "queued"}                    extracted, parse submitted
+      {"file": f, "status": "parsed", "chunks": n}
+      {"file": f, "status": "indexed", "chunks": n, "doc_id": id}
+      {"file": f, "status": "failed", "error": why}
+      {"status": "done", "files": ok, "failed": n, "skipped": n, "chunks": total, "seconds": s}
+
+    Each file gets its own doc_id; chunk metadata carries the original
+    file name (archive members as "archive.zip/dir/file.pdf") as "source".
+    """
+    from .vector_store import upsert_many
+
+    t_start = time.perf_counter()
+    pool = _parse_pool()
+    pending: Dict[object, Tuple[str, str]] = {}   # future -> (file, doc_id)
+    left: Dict[str, int] = {}                     # doc_id -> chunks not indexed yet
+    sizes: Dict[str, int] = {}
+    names: Dict[str, str] = {}
+    failed: set = set()
+    buf_ids, buf_chunks, buf_metas = [], [], []
+    stats = {"files": 0, "failed": 0, "skipped": 0, "chunks": 0}
+
+    def fail(name: str, error: str) -> dict:
+        stats["failed"] += 1
+        inc("bulk_ingest_files_total", status="failed")
+        return {"file": name, "status": "failed", "error": error}
+
+    def flush() -> Iterator[dict]:
+        if not buf_ids:
+            return
+        docs = [m["doc_id"] for m in buf_metas]
+        try:
+            upsert_many(collection_name, buf_ids, buf_chunks, buf_metas)
+        except Exception as e:
+            for doc_id in dict.fromkeys(docs):
+                if doc_id not in failed:
+                    failed.add(doc_id)
+                    yield fail(names[doc_id], f"indexing failed: {e}")
+        else:
+            for doc_id in docs:
+                left[doc_id] -= 1
+            for doc_id in dict.fromkeys(docs):
+                if left[doc_id] == 0 and doc_id not in failed:
+                    stats["files"] += 1
+                    stats["chunks"] += sizes[doc_id]
+                    inc("bulk_ingest_files_total", status="indexed")
+                    yield {"file": names[doc_id], "status": "indexed",
+                           "chunks": sizes[doc_id], "doc_id": doc_id}
+        buf_ids.clear()
+        buf_chunks.clear()
+        buf_metas.clear()
+
+    def collect(done) -> Iterator[dict]:
+        nonlocal pool
+        for fut in done:
+            name, doc_id = pending.pop(fut)
+            try:
+                chunks, secs = fut.result()
+            except BrokenProcessPool:
+                _reset_pool(pool)      # a worker died (e.g. out of memory); start a fresh pool
+                pool = _parse_pool()
+                yield fail(name, "parser process crashed")
+                continue
+            except Exception as e:
+                yield fail(name, f"parse failed: {e}")
+                continue
+            observe("rag_stage_seconds", secs, stage="parse", dataset=collection_name)
+            if not chunks:
+                yield fail(name, "no readable text found")
+                continue
+            yield {"file": name, "status": "parsed", "chunks": len(chunks)}
+            names[doc_id], sizes[doc_id], left[doc_id] = name, len(chunks), len(chunks)
+            for i, chunk in enumerate(chunks):
+                buf_ids.append(f"{doc_id}::{i}")
+                buf_chunks.append(chunk)
+                buf_metas.append({"doc_id": doc_id, "source": name, "idx": i})
+                if len(buf_ids) >= BULK_EMBED_BATCH:
+                    yield from flush()
+
+    try:
+        for name, path, reason in items:
+            if path is None:
+                stats["skipped"] += 1
+                inc("bulk_ingest_files_total", status="skipped")
+                yield {"file": name, "status": "skipped", "error": reason}
+                continue
+            try:
+                fut = pool.submit(_parse_and_split, path)
+            except BrokenProcessPool:
+                _reset_pool(pool)
+                pool = _parse_pool()
+                fut = pool.submit(_parse_and_split, path)
+            pending[fut] = (name, uuid.uuid4().hex[:10])
+            yield {"file": name, "status": "queued"}
+            # pick up finished parses without waiting, so embedding overlaps extraction
+            yield from collect([f for f in list(pending) if f.done()])
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            yield from collect(done)
+        yield from flush()
+    finally:
+        for fut in pending:   # client went away: drop queued parses
+            fut.cancel()
+
+    seconds = time.perf_counter() - t_start
+    observe("bulk_ingest_seconds", seconds)
+    yield {"status": "done", **stats, "seconds": round(seconds, 3)}
+
@@ -1,18 +1,197 @@
 # rag/embedder.py
-from sentence_transformers import SentenceTransformer
+"""
+The one MiniLM entry point for the whole app (the vector store uses it too).
+
+Encodes go through two priority lanes:
+  "interactive"  single query embeddings from similarity_search
+  "bulk"         ingestion batches from upsert_chunks
+
+Bulk work is cut into EMBED_BULK_BATCH-sized pieces and yields to any
+waiting interactive encode between pieces, so a large upload can't hold
+chat latency hostage. Each lane can use its own torch intra-op thread count
+(EMBED_THREADS_INTERACTIVE / EMBED_THREADS_BULK); encodes run one at a time,
+so setting it per encode is safe.
+
+With INFERENCE_SOCKET set, the pieces go to the sidecar with their lane,
+and it applies the same priority across all workers.
+
+Runtime (EMBED_RUNTIME):
+  fp32  (default) the stock sentence-transformers model, exact
+  int8  PyTorch dynamic quantization of the Linear layers, for CPU
+        throughput (benchmarks/bench_embedder.py measures both). On load
+        it is checked against fp32 on a few
+        sentences and falls back to fp32 if the min cosine is below
+        EMBED_PARITY_MIN_COS, so stored fp32 vectors stay comparable
+        and no re-index is needed when switching.
+"""
+import os
 import threading
+import time
+from contextlib import contextmanager
+
+from metrics import inc, observe, set_gauge, timed
+from warmup import loading
+from . import inference_client
+
+LANES = ("interactive", "bulk")
+EMBED_BULK_BATCH = int(os.getenv("EMBED_BULK_BATCH", "32"))
+EMBED_RUNTIME = os.getenv("EMBED_RUNTIME", "fp32").strip().lower()   # fp32 | int8
+EMBED_PARITY_MIN_COS = float(os.getenv("EMBED_PARITY_MIN_COS", "0.98"))
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+PARITY_SENTENCES = (
+    "How do I reset the device to factory settings?",
+    "Error E-4012 appears when the pump starts.",
+    "The warranty covers parts and labour for two years.",
+    "Quarterly revenue grew by 12 percent compared to last year.",
+    "Replace filter part number FX-220 every six months.",
+    "Das Handbuch beschreibt die Installation Schritt für Schritt.",
+)
+_CPUS = os.cpu_count() or 1
+EMBED_THREADS = {
+    "interactive": int(os.getenv("EMBED_THREADS_INTERACTIVE", str(_CPUS))),
+    "bulk": int(os.getenv("EMBED_THREADS_BULK", str(max(1, _CPUS // 2)))),
+}
 
 _model_lock = threading.Lock()
 _model = None
+_runtime = None   # runtime actually in use after the parity check
+
+def load_model(runtime: str = "fp32"):
+    """A fresh MiniLM for `runtime` (fp32 | int8), outside the shared cache."""
+    from sentence_transformers import SentenceTransformer  # heavy: torch
+
+    # Small, fast CPU model
+    model = SentenceTransformer(MODEL_NAME, device="cpu")
+    if runtime == "int8":
+        model = quantize_model(model)
+    elif runtime != "fp32":
+        raise ValueError(f"unknown EMBED_RUNTIME: {runtime}")
+    return model
+
+def quantize_model(model):
+    """Dynamic int8 quantization of every nn.Linear (weights int8, activations fp32)."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def parity_check(reference, candidate, texts=PARITY_SENTENCES) -> dict:
+    """Cosine similarity between two models' normalized embeddings of `texts`."""
+    a = reference.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+    b = candidate.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+    cos = (a * b).sum(axis=1)
+    return {"min_cos": float(cos.min()), "mean_cos": float(cos.mean())}
 
 def get_embedder():
-    global _model
+    global _model, _runtime
     with _model_lock:
         if _model is None:
-            # Small, fast CPU model
-            _model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+            with loading("embedder"):
+                _model, _runtime = _load_checked(EMBED_RUNTIME)
+            set_gauge("embedder_runtime_info", 1, runtime=_runtime)
         return _model
 
-def embed_texts(texts):
+def _load_checked(runtime: str):
+    if runtime not in ("fp32", "int8"):
+        raise ValueError(f"unknown EMBED_RUNTIME: {runtime}")
+    if runtime == "fp32":
+        return load_model("fp32"), "fp32"
+    import copy
+
+    ref = load_model("fp32")
+    quant = quantize_model(copy.deepcopy(ref))
+    parity = parity_check(ref, quant)
+    if parity["min_cos"] < EMBED_PARITY_MIN_COS:
+        print(
+            f"[WARN] {runtime} embedder failed the parity check "
+            f"(min cosine {parity['min_cos']:.4f} < {EMBED_PARITY_MIN_COS}); using fp32"
+        )
+        return ref, "fp32"
+    return quant, runtime
+
+def embedder_runtime():
+    """"fp32" or "int8" once the model is loaded, else None."""
+    return _runtime
+
+def resolved_runtime() -> str:
+    """The runtime embed_texts encodes with; loads the model (here or in the sidecar) if needed."""
+    if inference_client.enabled():
+        return inference_client.embed_runtime()
+    get_embedder()
+    return _runtime
+
+
+# ─────────────────────────────
+# Priority lanes
+# ─────────────────────────────
+class LaneScheduler:
+    """One encode at a time; a waiting interactive encode always goes next."""
+
+    def __init__(self):
+        self._cv = threading.Condition()
+        self._busy = False
+        self._waiting = {lane: 0 for lane in LANES}
+        self._threads = None
+
+    def _publish(self):
+        for lane, n in self._waiting.items():
+            set_gauge("embed_queue_depth", n, lane=lane)
+
+    @contextmanager
+    def slot(self, lane: str):
+        t0 = time.perf_counter()
+        with self._cv:
+            self._waiting[lane] += 1
+            self._publish()
+            while self._busy or (lane == "bulk" and self._waiting["interactive"] > 0):
+                self._cv.wait()
+            self._waiting[lane] -= 1
+            self._busy = True
+            self._publish()
+        observe("embed_wait_seconds", time.perf_counter() - t0, lane=lane)
+        try:
+            self._set_threads(EMBED_THREADS[lane])
+            yield
+        finally:
+            with self._cv:
+                self._busy = False
+                self._cv.notify_all()
+
+    def _set_threads(self, n: int):
+        if n > 0 and n != self._threads:
+            import torch
+
+            torch.set_num_threads(n)
+            self._threads = n
+
+
+_scheduler = LaneScheduler()
+
+
+def _embed_local(texts, normalize: bool = False, lane: str = "interactive"):
     model = get_embedder()
-    return model.encode(texts, convert_to_numpy=True).tolist()
+    with _scheduler.slot(lane):
+        return model.encode(
+            list(texts), convert_to_numpy=True, normalize_embeddings=normalize
+        ).tolist()
+
+
+def _embed_piece(texts, normalize: bool, lane: str):
+    if inference_client.enabled():
+        return inference_client.embed(texts, normalize=normalize, lane=lane)
+    return _embed_local(texts, normalize=normalize, lane=lane)
+
+
+def embed_texts(texts, normalize: bool = False, lane: str = "interactive"):
+    texts = list(texts)
+    if lane not in LANES:
+        raise ValueError(f"unknown embedding lane: {lane}")
+    with timed("model_call_seconds", model="embedder", lane=lane):
+        if lane == "bulk" and len(texts) > EMBED_BULK_BATCH:
+            out = []
+            for i in range(0, len(texts), EMBED_BULK_BATCH):
+                out.extend(_embed_piece(texts[i:i + EMBED_BULK_BATCH], normalize, lane))
+        else:
+            out = _embed_piece(texts, normalize, lane)
+    inc("model_items_total", len(texts), model="embedder", lane=lane)
+    return out
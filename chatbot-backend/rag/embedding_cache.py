@@ -0,0 +1,217 @@
+# rag/embedding_cache.py
+"""
+Content-addressed embedding cache shared by all collections, so a handbook
+uploaded into ten datasets is embedded once.
+
+A chunk's address is sha256(embedding model + runtime + chunk text), so
+fp32 and int8 vectors (EMBED_RUNTIME) never stand in for each other. Before
+upsert_many embeds a batch, it looks the addresses up here and only embeds
+the chunks never seen before. Once the batch is written to the
+collection's index, its references are recorded (record_refs), and the new
+vectors with them. Every (collection, chunk id) that uses an address is
+one reference; re-upserting a chunk id with other text moves its
+reference, and delete_collection releases all of a collection's
+references. A vector is deleted when its last reference goes.
+
+This is a cache of embedding work, not shared storage. The original goals
+of storing duplicate chunks once on disk and in memory are dropped: every
+collection still keeps its own copy of each vector in its flat/Chroma
+index (search, filters and BM25 stay per dataset), and this file adds one
+more float32 copy per distinct chunk. With the cache on, disk use goes up;
+what it saves is model time when the same documents are uploaded again.
+Hence opt-in.
+
+SQLite file VECTOR_STORE_DIR/embedding_cache.sqlite3 (WAL, shared by workers):
+  chunks(hash PK, dim, vector float32 blob, refs)
+  refs(collection, chunk_id, hash)  PK (collection, chunk_id)
+
+Env:
+  EMBED_CACHE   1 = use the cache in upsert_many; 0 (default) = embed everything
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import inc, timed
+
+EMBED_CACHE = os.getenv("EMBED_CACHE", "0") == "1"
+SQL_BATCH = 500   # stays under SQLite's bound-variable limit
+
+
+def content_hash(text: str, model: str, runtime: str) -> str:
+    return hashlib.sha256(f"{model}\0{runtime}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        c = self._conn()
+        c.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " hash TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL,"
+            " refs INTEGER NOT NULL DEFAULT 0)"
+        )
+        c.execute(
+            "CREATE TABLE IF NOT EXISTS refs ("
+            " collection TEXT NOT NULL, chunk_id TEXT NOT NULL, hash TEXT NOT NULL,"
+            " PRIMARY KEY (collection, chunk_id))"
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS refs_hash ON refs (hash)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def vectors(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """{hash: float32 vector} for the hashes already stored."""
+        out = {}
+        c = self._conn()
+        for s in range(0, len(hashes), SQL_BATCH):
+            part = hashes[s:s + SQL_BATCH]
+            q = f"SELECT hash, vector FROM chunks WHERE hash IN ({','.join('?' * len(part))})"
+            for h, blob in c.execute(q, part):
+                out[h] = np.frombuffer(blob, dtype=np.float32)
+        return out
+
+    def record_refs(self, collection: str, chunk_ids: List[str], hashes: List[str],
+                    vectors: Dict[str, np.ndarray]):
+        """
+        Point (collection, chunk id) at their hashes and store the vectors, in
+        one transaction. Vectors already stored are left alone; passing them
+        anyway restores one that a concurrent release deleted after lookup.
+        """
+        latest = dict(zip(chunk_ids, hashes))           # last copy of an id in the batch wins
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            c.executemany(
+                "INSERT OR IGNORE INTO chunks (hash, dim, vector, refs) VALUES (?, ?, ?, 0)",
+                [(h, int(v.shape[0]), np.asarray(v, dtype=np.float32).tobytes())
+                 for h, v in vectors.items()],
+            )
+            old = self._current(c, collection, list(latest))
+            delta: Dict[str, int] = {}
+            for cid, h in latest.items():
+                prev = old.get(cid)
+                if prev == h:
+                    continue
+                if prev is not None:
+                    delta[prev] = delta.get(prev, 0) - 1
+                delta[h] = delta.get(h, 0) + 1
+            c.executemany(
+                "INSERT OR REPLACE INTO refs (collection, chunk_id, hash) VALUES (?, ?, ?)",
+                [(collection, cid, h) for cid, h in latest.items() if old.get(cid) != h],
+            )
+            self._apply(c, delta)
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+
+    def release_collection(self, collection: str) -> int:
+        """Drop every reference held by `collection`; returns the vectors freed."""
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            delta: Dict[str, int] = {}
+            for h, n in c.execute(
+                "SELECT hash, COUNT(*) FROM refs WHERE collection = ? GROUP BY hash", (collection,)
+            ).fetchall():
+                delta[h] = -n
+            c.execute("DELETE FROM refs WHERE collection = ?", (collection,))
+            freed = self._apply(c, delta)
+            c.execute("COMMIT")
+            return freed
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _current(c, collection: str, chunk_ids: List[str]) -> Dict[str, str]:
+        out = {}
+        for s in range(0, len(chunk_ids), SQL_BATCH):
+            part = chunk_ids[s:s + SQL_BATCH]
+            q = (f"SELECT chunk_id, hash FROM refs WHERE collection = ?"
+                 f" AND chunk_id IN ({','.join('?' * len(part))})")
+            out.update(c.execute(q, [collection, *part]).fetchall())
+        return out
+
+    @staticmethod
+    def _apply(c, delta: Dict[str, int]) -> int:
+        """Apply refcount changes; delete vectors nobody references any more."""
+        c.executemany("UPDATE chunks SET refs = refs + ? WHERE hash = ?",
+                      [(d, h) for h, d in delta.items() if d])
+        dropped = [h for h, d in delta.items() if d < 0]
+        freed = 0
+        for s in range(0, len(dropped), SQL_BATCH):
+            part = dropped[s:s + SQL_BATCH]
+            cur = c.execute(
+                f"DELETE FROM chunks WHERE refs <= 0 AND hash IN ({','.join('?' * len(part))})", part
+            )
+            freed += cur.rowcount
+        return freed
+
+    def stats(self) -> dict:
+        c = self._conn()
+        unique, refs = c.execute("SELECT COUNT(*), COALESCE(SUM(refs), 0) FROM chunks").fetchone()
+        collections = c.execute("SELECT COUNT(DISTINCT collection) FROM refs").fetchone()[0]
+        return {
+            "unique_chunks": unique,
+            "references": refs,
+            "collections": collections,
+            "refs_per_chunk": round(refs / unique, 3) if unique else 0.0,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def vacuum(self):
+        c = self._conn()
+        c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        c.execute("VACUUM")
+
+
+def embed_cached(cache: EmbeddingCache, chunks: List[str], embed: Callable[[List[str]], list],
+                 model: str, runtime: str, dataset: str) -> Tuple[List[List[float]], List[str], Dict[str, np.ndarray]]:
+    """
+    Embeddings for `chunks` in order, computing only those the cache has
+    never seen (each distinct text once). Also returns the hashes and
+    vectors to pass to record_refs once the embeddings have been written;
+    nothing is recorded here, so a failed write leaves no references.
+    """
+    hashes = [content_hash(t, model, runtime) for t in chunks]
+    unique = list(dict.fromkeys(hashes))
+    with timed("rag_stage_seconds", stage="embed_cache_lookup", dataset=dataset):
+        known = cache.vectors(unique)
+
+    missing = [h for h in unique if h not in known]
+    if missing:
+        first = {}
+        for h, t in zip(hashes, chunks):
+            first.setdefault(h, t)
+        vecs = embed([first[h] for h in missing])
+        known.update((h, np.asarray(v, dtype=np.float32)) for h, v in zip(missing, vecs))
+    inc("embedding_cache_lookups_total", len(chunks) - len(missing), result="hit")
+    inc("embedding_cache_lookups_total", len(missing), result="miss")
+    return [known[h].tolist() for h in hashes], hashes, known
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache(root: str) -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(os.path.join(root, "embedding_cache.sqlite3"))
+        return _cache
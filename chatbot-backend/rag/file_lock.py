@@ -0,0 +1,55 @@
+# rag/file_lock.py
+"""
+Advisory inter-process locks for the on-disk indexes (flat vectors, BM25
+segments), which every uvicorn worker opens and writes on its own.
+
+The lock is a sibling file `<index dir>.lock` rather than a file inside the
+directory, so destroying and recreating an index never leaves two processes
+holding locks on different inodes. For the same reason lock files are never
+deleted, not even with their index: a process blocked on the old file would
+get its lock while a newcomer locks a fresh one. flock() locks belong to the open file
+description: a process must not take the same lock twice (FlatIndex keeps a
+re-entrancy count for that).
+
+Windows has no fcntl; there the lock is a no-op and only single-process
+deployments are safe.
+"""
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows dev boxes
+    fcntl = None
+
+
+def lock_path(index_path: str) -> str:
+    return index_path.rstrip("/\\") + ".lock"
+
+
+def acquire(index_path: str, shared: bool = False) -> int:
+    """Block until the lock of `index_path` is held; returns the fd to pass to release()."""
+    path = lock_path(index_path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+    return fd
+
+
+def release(fd: int):
+    os.close(fd)   # closing the descriptor drops the flock
+
+
+@contextmanager
+def locked(index_path: str, shared: bool = False):
+    fd = acquire(index_path, shared)
+    try:
+        yield
+    finally:
+        release(fd)
+
@@ -2,11 +2,10 @@
 import os
 import io
 import re
-import fitz  # PyMuPDF
-import pdfplumber
-import docx
-import pandas as pd
-from pptx import Presentation
+
+# Parser libraries (PyMuPDF, pdfplumber, python-docx, python-pptx, pandas)
+# are imported inside the parse_* functions so app startup doesn't pay for
+# them; Python caches the module after the first call.
 
 SUPPORTED_EXTS = {".pdf", ".docx", ".pptx", ".csv", ".xlsx", ".txt"}
 
@@ -23,6 +22,8 @@ def clean_text(t: str) -> str:
 def parse_pdf(path: str) -> str:
     # Try pdfplumber for text + tables
     try:
+        import pdfplumber
+
         all_text = []
         with pdfplumber.open(path) as pdf:
             for page in pdf.pages:
@@ -31,11 +32,15 @@ def parse_pdf(path: str) -> str:
         return clean_text("\n\n".join(all_text))
     except Exception:
         # fallback to PyMuPDF
+        import fitz
+
         doc = fitz.open(path)
         text = "\n\n".join(page.get_text() for page in doc)
         return clean_text(text)
 
 def parse_docx(path: str) -> str:
+    import docx
+
     d = docx.Document(path)
     parts = []
     for p in d.paragraphs:
@@ -47,6 +52,8 @@ def parse_docx(path: str) -> str:
     return clean_text("\n".join(parts))
 
 def parse_pptx(path: str) -> str:
+    from pptx import Presentation
+
     prs = Presentation(path)
     slides = []
     for i, slide in enumerate(prs.slides, start=1):
@@ -59,10 +66,14 @@ def parse_pptx(path: str) -> str:
     return clean_text("\n\n".join(slides))
 
 def parse_csv(path: str) -> str:
+    import pandas as pd
+
     df = pd.read_csv(path, nrows=2000)  # cap for sanity
     return clean_text(df.to_csv(index=False))
 
 def parse_xlsx(path: str) -> str:
+    import pandas as pd
+
     dfs = pd.read_excel(path, sheet_name=None)
     parts = []
     for sheet_name, df in dfs.items():
@@ -0,0 +1,467 @@
+# rag/flat_index.py
+"""
+Flat (brute-force) vector index kept as a memory-mapped matrix.
+
+For the dataset sizes we actually have (a few hundred to a few hundred
+thousand chunks), one vectorized dot product over a contiguous matrix is
+exact, needs no graph build, and keeps memory down: the OS page cache holds
+the matrix, and nothing is resident until it is searched.
+benchmarks/bench_vector.py compares it with Chroma.
+
+On-disk layout, one directory per collection:
+  meta.json      {"dim", "dtype", "count"}; written last, so rows past
+                 `count` from an interrupted upsert are ignored
+  vectors.bin    count x dim raw rows (float32 or float16), row-major
+  chunks.jsonl   {"row", "id", "document", "metadata"} per write; the last
+                 record for a row wins, compact() drops superseded ones
+  codes.bin      (quant="int8" only) count x dim int8 codes
+  scales.bin     (quant="int8" only) count float32 per-vector scales
+
+With FLAT_QUANT=int8 a search scans the int8 codes (a quarter of the
+float32 matrix, so that is all that needs to stay in memory), then rescores
+the best k * FLAT_RESCORE_FACTOR candidates against vectors.bin at full
+precision. Only those candidate rows of vectors.bin are read. Quantization
+is fixed per index when it is created.
+
+Several processes (uvicorn workers) may open the same index: writes hold
+an exclusive lock on the sibling file `<dir>.lock` and first catch up with
+what other workers appended; reads reload when meta.json has changed.
+
+Vectors must be L2-normalized (rag.embedder with normalize=True), so the
+dot product is the cosine similarity.
+"""
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import file_lock
+
+# float16 halves disk and page cache, but numpy has no fast float16 matmul:
+# each search converts the matrix to float32 block by block (~10x slower)
+FLAT_DTYPE = os.getenv("FLAT_DTYPE", "float32")   # float32 | float16
+FLAT_QUANT = os.getenv("FLAT_QUANT", "none")       # none | int8
+FLAT_RESCORE_FACTOR = int(os.getenv("FLAT_RESCORE_FACTOR", "4"))
+PARTITION_FIELDS = ("source", "doc_id")   # metadata fields with a row list per value
+SEARCH_BLOCK_ROWS = 2048   # float32 scratch per block stays in cache (65536 rows was ~4x slower)
+
+_DTYPES = ("float16", "float32")
+_QUANTS = ("none", "int8")
+
+
+def quantize_int8(emb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector scalar quantization: emb ~= codes * scale[:, None]."""
+    emb = np.asarray(emb, dtype=np.float32)
+    scale = np.abs(emb).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(emb / scale[:, None]), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+class FlatIndex:
+    def __init__(self, path: str, dtype: Optional[str] = None, quant: Optional[str] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._lock_fd: Optional[int] = None
+        self._lock_depth = 0
+        self._default_dtype = dtype or FLAT_DTYPE
+        self._default_quant = quant or FLAT_QUANT
+        self._reset({})
+        self._sig = ()            # never equal to a real signature: refresh() loads
+        self.refresh()
+
+    # ── files ─────────────────────────────────
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "quant": self.quant, "count": self.count}, f)
+        os.replace(tmp, self._file("meta.json"))
+        self._sig = self._signature()
+
+    def _signature(self):
+        """Changes whenever any process rewrites meta.json (each write is a new file)."""
+        try:
+            st = os.stat(self._file("meta.json"))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _chunks_inode(self) -> Optional[int]:
+        try:
+            return os.stat(self._file("chunks.jsonl")).st_ino
+        except FileNotFoundError:
+            return None
+
+    # ── cross-process state ───────────────────
+    # Every uvicorn worker holds its own FlatIndex on the same directory.
+    # Writers take an exclusive file lock and re-read what other workers
+    # wrote before touching the files; readers notice a changed meta.json
+    # and catch up under a shared lock.
+    @contextmanager
+    def write_lock(self):
+        """Exclusive lock across processes (re-entrant within this object), state synced."""
+        with self._lock:
+            if self._lock_depth == 0:
+                self._lock_fd = file_lock.acquire(self.path)
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1:
+                    self._sync()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    file_lock.release(self._lock_fd)
+                    self._lock_fd = None
+
+    def refresh(self):
+        """Pick up writes other processes made since this object last looked."""
+        with self._lock:
+            if self._lock_depth or self._signature() == self._sig:
+                return
+            with file_lock.locked(self.path, shared=True):
+                self._sync()
+
+    def _sync(self):
+        """Bring memory up to date with disk; caller holds the file lock."""
+        sig = self._signature()
+        if sig == self._sig:
+            return
+        meta = self._read_meta()
+        count = int(meta.get("count", 0))
+        if (not meta or count < self.count or self._chunks_inode() != self._chunks_ino
+                or (self.dim is not None and meta.get("dim") != self.dim)):
+            self._reset(meta)                 # destroyed, compacted or recreated: reload
+        else:
+            self._apply_meta(meta)
+            self._grow(count)
+            self._read_chunks()               # only the records appended since last time
+        self._sig = sig
+
+    def _apply_meta(self, meta: dict):
+        self.dim = meta.get("dim")
+        # the defaults are for a new index only: an existing one keeps the
+        # layout it was written with (indexes from before int8 have no "quant")
+        self.dtype = meta.get("dtype", "float32") if meta else self._default_dtype
+        if self.dtype not in _DTYPES:
+            raise ValueError(f"unsupported flat index dtype: {self.dtype}")
+        self.quant = meta.get("quant", "none") if meta else self._default_quant
+        if self.quant not in _QUANTS:
+            raise ValueError(f"unsupported flat index quantization: {self.quant}")
+
+    def _reset(self, meta: dict):
+        self._apply_meta(meta)
+        self.count = 0
+        self.ids: List[Optional[str]] = []
+        self.documents: List[str] = []
+        self.metadatas: List[dict] = []
+        self._row: Dict[str, int] = {}
+        self._parts: Dict[str, Dict[object, set]] = {f: {} for f in PARTITION_FIELDS}
+        self._records = 0
+        self._chunks_pos = 0
+        self._chunks_ino: Optional[int] = None
+        self._mat = self._codes = self._scales = None
+        if meta:
+            self._grow(int(meta.get("count", 0)))
+            self._read_chunks()
+
+    def _grow(self, count: int):
+        grow = count - self.count
+        if grow > 0:
+            self.ids.extend([None] * grow)
+            self.documents.extend([""] * grow)
+            self.metadatas.extend({} for _ in range(grow))
+            self.count = count
+
+    def _read_chunks(self):
+        """Apply chunks.jsonl records from where the last read stopped."""
+        try:
+            f = open(self._file("chunks.jsonl"), "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            self._chunks_ino = os.fstat(f.fileno()).st_ino
+            f.seek(self._chunks_pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break             # torn last line from an interrupted write
+                self._chunks_pos += len(line)
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                r = rec["row"]
+                if r >= self.count:
+                    continue          # written by an upsert that never committed meta.json
+                self._set_row(r, rec["id"], rec["document"], rec.get("metadata") or {})
+                self._records += 1
+
+    def _set_row(self, r: int, id_: str, document: str, metadata: dict):
+        old = self.ids[r]
+        if old is not None:
+            if self._row.get(old) == r:
+                del self._row[old]
+            self._partition_remove(r)
+        self.ids[r] = id_
+        self.documents[r] = document
+        self.metadatas[r] = metadata
+        self._row[id_] = r
+        self._partition_add(r)
+
+    def _partition_add(self, r: int):
+        meta = self.metadatas[r]
+        for f in PARTITION_FIELDS:
+            if f in meta:
+                self._parts[f].setdefault(meta[f], set()).add(r)
+
+    def _partition_remove(self, r: int):
+        meta = self.metadatas[r]
+        for f in PARTITION_FIELDS:
+            rows = self._parts[f].get(meta.get(f))
+            if rows is not None:
+                rows.discard(r)
+
+    def rows_matching(self, filters: Dict[str, List]) -> np.ndarray:
+        """Sorted rows whose metadata matches every {field: [allowed values]}."""
+        with self._lock:
+            rows = None
+            for f, values in filters.items():
+                if f in self._parts:
+                    hit = set().union(*(self._parts[f].get(v, set()) for v in values))
+                else:
+                    allowed = set(values)
+                    hit = {r for r in range(self.count) if self.metadatas[r].get(f) in allowed}
+                rows = hit if rows is None else rows & hit
+            return np.array(sorted(rows or ()), dtype=np.int64)
+
+    def _matrix(self) -> np.ndarray:
+        if self._mat is None or self._mat.shape[0] != self.count:
+            if self.count == 0:
+                self._mat = np.zeros((0, self.dim or 0), dtype=self.dtype)
+            else:
+                self._mat = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r",
+                                      shape=(self.count, self.dim))
+        return self._mat
+
+    def _quantized(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._codes is None or self._codes.shape[0] != self.count:
+            if self.count == 0:
+                self._codes = np.zeros((0, self.dim or 0), dtype=np.int8)
+                self._scales = np.zeros(0, dtype=np.float32)
+            else:
+                self._codes = np.memmap(self._file("codes.bin"), dtype=np.int8, mode="r",
+                                        shape=(self.count, self.dim))
+                self._scales = np.memmap(self._file("scales.bin"), dtype=np.float32, mode="r",
+                                         shape=(self.count,))
+        return self._codes, self._scales
+
+    def __len__(self) -> int:
+        self.refresh()
+        return self.count
+
+    # ── writes ────────────────────────────────
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[dict]):
+        emb = np.asarray(embeddings, dtype=np.float32)
+        if emb.ndim != 2 or emb.shape[0] != len(ids):
+            raise ValueError("embeddings must be a (len(ids), dim) matrix")
+
+        os.makedirs(self.path, exist_ok=True)
+        with self.write_lock():
+            if self.dim is None:
+                self.dim = int(emb.shape[1])
+            elif emb.shape[1] != self.dim:
+                raise ValueError(f"embedding dim {emb.shape[1]} != index dim {self.dim}")
+
+            # last occurrence wins for ids repeated within one batch
+            latest = {id_: i for i, id_ in enumerate(ids)}
+            updates, appends = [], []
+            for id_, i in latest.items():
+                (updates if id_ in self._row else appends).append((id_, i))
+
+            row_updates = [(self._row[id_], i) for id_, i in updates]
+            append_src = [i for _, i in appends]
+            self._put("vectors.bin", emb.astype(self.dtype), row_updates, append_src)
+            if self.quant == "int8":
+                codes, scales = quantize_int8(emb)
+                self._put("codes.bin", codes, row_updates, append_src)
+                self._put("scales.bin", scales, row_updates, append_src)
+
+            recs = []
+            new_count = self.count
+            for id_, i in updates + appends:
+                r = self._row.get(id_)
+                if r is None:
+                    r = new_count
+                    new_count += 1
+                recs.append((r, id_, i))
+            with open(self._file("chunks.jsonl"), "ab") as f:
+                if f.tell() > self._chunks_pos:
+                    f.write(b"\n")   # terminate a torn line so our first record parses
+                for r, id_, i in recs:
+                    f.write((json.dumps({"row": r, "id": id_, "document": documents[i],
+                                         "metadata": metadatas[i] or {}}, ensure_ascii=False)
+                             + "\n").encode("utf-8"))
+                self._chunks_pos = f.tell()
+                self._chunks_ino = os.fstat(f.fileno()).st_ino
+
+            self._grow(new_count)
+            for r, id_, i in recs:
+                self._set_row(r, id_, documents[i], metadatas[i] or {})
+            self._records += len(recs)
+            self._write_meta()
+            self._mat = None
+            self._codes = self._scales = None
+
+    def _put(self, name: str, arr: np.ndarray, updates: List[Tuple[int, int]], appends: List[int]):
+        """Write arr[i] to existing rows (updates: [(row, i)]) and append arr[appends]."""
+        path = self._file(name)
+        row_shape = arr.shape[1:]
+        if updates:
+            mm = np.memmap(path, dtype=arr.dtype, mode="r+", shape=(self.count,) + row_shape)
+            for r, i in updates:
+                mm[r] = arr[i]
+            mm.flush()
+            del mm
+        if appends:
+            with open(path, "ab") as f:
+                # drop rows past `count` left by an interrupted upsert
+                f.truncate(self.count * arr[0].nbytes)
+                f.write(np.ascontiguousarray(arr[appends]).tobytes())
+
+    # ── reads ─────────────────────────────────
+    def scores(self, query, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        q = np.asarray(query, dtype=np.float32).ravel()
+        mat = self._matrix()
+        if rows is not None:
+            mat = np.asarray(mat[rows])
+        if mat.dtype == np.float32:
+            return mat @ q
+        out = np.empty(mat.shape[0], dtype=np.float32)
+        for s in range(0, mat.shape[0], SEARCH_BLOCK_ROWS):
+            out[s:s + SEARCH_BLOCK_ROWS] = mat[s:s + SEARCH_BLOCK_ROWS].astype(np.float32) @ q
+        return out
+
+    def approx_scores(self, query, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores from the int8 codes: (codes . q) * scale."""
+        q = np.asarray(query, dtype=np.float32).ravel()
+        codes, scales = self._quantized()
+        if rows is not None:
+            codes, scales = np.asarray(codes[rows]), np.asarray(scales[rows])
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for s in range(0, codes.shape[0], SEARCH_BLOCK_ROWS):
+            out[s:s + SEARCH_BLOCK_ROWS] = codes[s:s + SEARCH_BLOCK_ROWS].astype(np.float32) @ q
+        return out * scales
+
+    def top_rows(self, query, k: int = 6, rescore: Optional[int] = None,
+                 rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (rows, cosine scores) of the k best rows, best first. `rows` limits
+        the search to a partition (see rows_matching).
+        """
+        n = self.count if rows is None else len(rows)
+        k = min(k, n)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if self.quant == "int8":
+            approx = self.approx_scores(query, rows)
+            c = min(n, k * max(1, rescore or FLAT_RESCORE_FACTOR))
+            cand = np.sort(np.argpartition(-approx, c - 1)[:c])  # sorted rows read sequentially
+            if rows is not None:
+                cand = rows[cand]
+            q = np.asarray(query, dtype=np.float32).ravel()
+            exact = np.asarray(self._matrix()[cand], dtype=np.float32) @ q
+            order = np.argsort(-exact)[:k]
+            return cand[order], exact[order]
+        scores = self.scores(query, rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def search(self, query, k: int = 6, filters: Optional[Dict[str, List]] = None) -> List[Tuple[str, dict, float]]:
+        """Top-k (document, metadata, cosine score), best first."""
+        self.refresh()
+        with self._lock:
+            rows, scores = self.top_rows(query, k, rows=self.rows_matching(filters) if filters else None)
+            return [(self.documents[r], self.metadatas[r], float(sc)) for r, sc in zip(rows, scores)]
+
+    def search_many(self, queries, k: int = 6,
+                    filters: Optional[Dict[str, List]] = None) -> List[List[Tuple[str, str, dict]]]:
+        """Per query, top-k (id, document, metadata), best first; one partition lookup for all."""
+        self.refresh()
+        with self._lock:
+            part = self.rows_matching(filters) if filters else None
+            out = []
+            for q in queries:
+                rows, _scores = self.top_rows(q, k, rows=part)
+                out.append([(self.ids[r], self.documents[r], self.metadatas[r]) for r in rows])
+            return out
+
+    def get(self, ids) -> Dict[str, Tuple[str, dict]]:
+        """{id: (document, metadata)} for the ids present."""
+        self.refresh()
+        with self._lock:
+            return {i: (self.documents[self._row[i]], self.metadatas[self._row[i]])
+                    for i in ids if i in self._row}
+
+    def values(self, field: str) -> List:
+        """Distinct values of a partition field (e.g. every "source") over live rows."""
+        self.refresh()
+        with self._lock:
+            return [v for v, rows in self._parts[field].items() if rows]
+
+    def export(self, batch: int = 5000) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[dict]]]:
+        """(ids, float32 embeddings, documents, metadatas) in batches, for migration."""
+        self.refresh()
+        with self._lock:
+            mat = self._matrix()
+            for s in range(0, self.count, batch):
+                e = min(self.count, s + batch)
+                yield (self.ids[s:e], np.asarray(mat[s:e], dtype=np.float32),
+                       self.documents[s:e], self.metadatas[s:e])
+
+    # ── maintenance ───────────────────────────
+    def compact(self) -> int:
+        """Rewrite chunks.jsonl with one record per row; returns bytes freed."""
+        if not self.exists(self.path):
+            return 0
+        with self.write_lock():
+            path = self._file("chunks.jsonl")
+            if self._records <= self.count or not os.path.exists(path):
+                return 0
+            before = os.path.getsize(path)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                for r in range(self.count):
+                    f.write((json.dumps({"row": r, "id": self.ids[r], "document": self.documents[r],
+                                         "metadata": self.metadatas[r]}, ensure_ascii=False)
+                             + "\n").encode("utf-8"))
+            os.replace(tmp, path)
+            self._records = self.count
+            self._chunks_pos = os.path.getsize(path)
+            self._chunks_ino = self._chunks_inode()
+            self._write_meta()   # new meta.json: other workers reload the rewritten file
+            return max(0, before - self._chunks_pos)
+
+    def destroy(self):
+        with self.write_lock():
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._reset({})
+            self._sig = None
@@ -0,0 +1,103 @@
+# rag/inference_client.py
+"""
+Client for the shared inference sidecar (rag/inference_server.py).
+
+When INFERENCE_SOCKET is set, the embedder, BLIP captioner and Whisper
+transcriber calls in this package are sent to one local process instead of
+loading the models in every uvicorn worker.
+
+Env:
+  INFERENCE_SOCKET    Unix socket path of the sidecar (unset = run models in-process)
+  INFERENCE_AUTHKEY   shared secret for the connection handshake (must match the
+                      server); required whenever INFERENCE_SOCKET is set, since
+                      both ends unpickle what they receive
+  INFERENCE_TIMEOUT   seconds to wait for a reply (default 120)
+"""
+import os
+import threading
+from multiprocessing.connection import Client
+from typing import List
+
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "").strip()
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "").encode()
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "120"))
+
+# multiprocessing Connections are not thread-safe: one per thread
+_local = threading.local()
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+def enabled() -> bool:
+    return bool(INFERENCE_SOCKET)
+
+
+def require_authkey():
+    """Startup check: a sidecar socket without a secret is refused, not defaulted."""
+    if not INFERENCE_AUTHKEY:
+        raise RuntimeError(
+            "INFERENCE_AUTHKEY must be set when the inference sidecar is used "
+            "(e.g. INFERENCE_AUTHKEY=$(openssl rand -hex 32) on both sides)"
+        )
+
+
+def _conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        require_authkey()
+        conn = Client(INFERENCE_SOCKET, family="AF_UNIX", authkey=INFERENCE_AUTHKEY)
+        _local.conn = conn
+    return conn
+
+
+def _drop_conn():
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def call(op: str, **payload):
+    """Send one request; reconnects once if the sidecar was restarted."""
+    for attempt in (1, 2):
+        try:
+            conn = _conn()
+            conn.send((op, payload))
+            if not conn.poll(INFERENCE_TIMEOUT):
+                _drop_conn()
+                raise InferenceError(f"inference sidecar timed out on {op}")
+            ok, result = conn.recv()
+            break
+        except (EOFError, OSError, ConnectionError):
+            _drop_conn()
+            if attempt == 2:
+                raise InferenceError(f"inference sidecar unavailable at {INFERENCE_SOCKET}")
+    if not ok:
+        raise InferenceError(result)
+    return result
+
+
+def embed(texts: List[str], normalize: bool = False, lane: str = "interactive") -> List[List[float]]:
+    return call("embed", texts=list(texts), normalize=normalize, lane=lane)
+
+
+def embed_runtime() -> str:
+    """The sidecar embedder's runtime after its parity check ("fp32" | "int8")."""
+    return call("embed_runtime")
+
+
+def caption(image_bytes: bytes) -> str:
+    return call("caption", image=image_bytes)
+
+
+def transcribe(audio_bytes: bytes) -> str:
+    return call("transcribe", audio=audio_bytes)
+
+
+def ping() -> dict:
+    return call("ping")
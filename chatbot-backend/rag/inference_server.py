@@ -0,0 +1,201 @@
+# rag/inference_server.py
+"""
+Shared model-inference sidecar for multi-worker deployments.
+
+One process hosts MiniLM, BLIP and Whisper; every uvicorn worker talks to
+it over a Unix socket (rag/inference_client.py), so RAM stays flat as API
+workers are added. Embedding requests from all workers are coalesced into
+shared batches: the batcher waits up to INFER_BATCH_WAIT_MS for more texts
+after the first request arrives, up to INFER_MAX_BATCH texts per encode.
+Interactive (query) jobs are always taken before bulk (ingestion) jobs.
+
+Run it next to the API (same INFERENCE_AUTHKEY on both sides; both refuse
+to start without one):
+
+  export INFERENCE_AUTHKEY=$(openssl rand -hex 32)
+  INFERENCE_SOCKET=/tmp/chatbot-infer.sock python -m rag.inference_server
+  INFERENCE_SOCKET=/tmp/chatbot-infer.sock uvicorn main:app --workers 8
+"""
+import argparse
+import io
+import itertools
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Listener
+from typing import List
+
+import numpy as np
+
+from .inference_client import INFERENCE_AUTHKEY, INFERENCE_SOCKET, require_authkey
+
+INFER_MAX_BATCH = int(os.getenv("INFER_MAX_BATCH", "128"))
+INFER_BATCH_WAIT_MS = float(os.getenv("INFER_BATCH_WAIT_MS", "5"))
+
+
+_LANE_PRIORITY = {"interactive": 0, "bulk": 1}
+
+
+class _EmbedJob:
+    __slots__ = ("texts", "normalize", "lane", "done", "result", "error")
+
+    def __init__(self, texts: List[str], normalize: bool, lane: str):
+        self.texts = texts
+        self.normalize = normalize
+        self.lane = lane
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class EmbedBatcher:
+    """Coalesces embed requests from all connections into shared encodes."""
+
+    def __init__(self, max_batch: int = INFER_MAX_BATCH, wait_ms: float = INFER_BATCH_WAIT_MS):
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000.0
+        # (lane priority, arrival seq, job): interactive first, FIFO within a lane
+        self.q: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        threading.Thread(target=self._run, name="embed-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str], normalize: bool, lane: str = "interactive"):
+        job = _EmbedJob(texts, normalize, lane)
+        self.q.put((_LANE_PRIORITY.get(lane, 1), next(self._seq), job))
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _run(self):
+        from .embedder import _embed_local
+
+        while True:
+            jobs = [self.q.get()[2]]
+            n = len(jobs[0].texts)
+            deadline = time.monotonic() + self.wait
+            while n < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    _prio, _seq, job = self.q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                n += len(job.texts)
+
+            try:
+                flat = [t for j in jobs for t in j.texts]
+                # a batch holding any interactive job runs with interactive threads
+                lane = "interactive" if any(j.lane == "interactive" for j in jobs) else "bulk"
+                vecs = np.asarray(_embed_local(flat, normalize=False, lane=lane), dtype=np.float32)
+                pos = 0
+                for j in jobs:
+                    part = vecs[pos:pos + len(j.texts)]
+                    pos += len(j.texts)
+                    if j.normalize:
+                        norms = np.linalg.norm(part, axis=1, keepdims=True)
+                        part = part / np.maximum(norms, 1e-12)
+                    j.result = part.tolist()
+            except Exception as e:
+                for j in jobs:
+                    j.error = e
+            for j in jobs:
+                j.done.set()
+
+
+class InferenceServer:
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.batcher = EmbedBatcher()
+        # BLIP and Whisper are not batched; one call at a time per model
+        self._blip_lock = threading.Lock()
+        self._whisper_lock = threading.Lock()
+        self.started = time.time()
+
+    def handle(self, op: str, payload: dict):
+        if op == "embed":
+            return self.batcher.submit(
+                payload["texts"], bool(payload.get("normalize")), payload.get("lane", "interactive")
+            )
+        if op == "embed_runtime":
+            from .embedder import embedder_runtime, get_embedder
+            get_embedder()
+            return embedder_runtime()
+        if op == "caption":
+            from .pipeline import _caption_local
+            with self._blip_lock:
+                return _caption_local(io.BytesIO(payload["image"]))
+        if op == "transcribe":
+            from .speech import _transcribe_local
+            with self._whisper_lock:
+                return _transcribe_local(io.BytesIO(payload["audio"]))
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1)}
+        raise ValueError(f"unknown op: {op}")
+
+    def _serve_conn(self, conn):
+        try:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except EOFError:
+                    return
+                try:
+                    conn.send((True, self.handle(op, payload)))
+                except Exception as e:
+                    conn.send((False, f"{type(e).__name__}: {e}"))
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        # owner-only from the moment it is bound, not chmod'ed afterwards
+        old_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", authkey=INFERENCE_AUTHKEY)
+        finally:
+            os.umask(old_umask)
+        print(f"[INFO] inference sidecar listening on {self.socket_path}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:  # failed auth handshake etc.
+                    print(f"[WARN] rejected inference connection: {e!r}")
+                    continue
+                threading.Thread(target=self._serve_conn, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Shared embedder / BLIP / Whisper sidecar")
+    ap.add_argument("--socket", default=INFERENCE_SOCKET or "/tmp/chatbot-infer.sock")
+    ap.add_argument("--preload", default="embedder", help="comma list of embedder,blip,whisper")
+    args = ap.parse_args()
+    require_authkey()
+
+    # The sidecar itself must always run models locally
+    from . import inference_client
+    inference_client.INFERENCE_SOCKET = ""
+
+    preload = {p.strip() for p in args.preload.split(",") if p.strip()}
+    if "embedder" in preload:
+        from .embedder import get_embedder
+        get_embedder()
+    if "blip" in preload:
+        from .pipeline import _get_blip
+        _get_blip()
+    if "whisper" in preload:
+        from .speech import _get_whisper
+        _get_whisper()
+
+    InferenceServer(args.socket).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+# rag/lexical_index.py
+"""
+Per-collection BM25 inverted index, for the queries MiniLM is bad at:
+part numbers, error codes, names.
+
+Built incrementally: every upsert_chunks call appends one immutable
+segment file, so ingestion never rewrites what is already on disk.
+compact() merges segments and drops chunks that were re-upserted.
+
+On-disk layout, VECTOR_STORE_DIR/lexical/<collection>/seg-000001.npz ...
+each segment holding, as plain numpy arrays:
+  ids        chunk ids ("\\n"-joined, utf-8)
+  doc_len    uint32 tokens per chunk
+  terms      sorted vocabulary ("\\n"-joined, utf-8)
+  offsets    int64, postings of terms[i] are [offsets[i], offsets[i+1])
+  post_doc   uint32 chunk index within the segment
+  post_tf    uint16 term frequency
+
+A chunk id seen again in a later segment supersedes the earlier copy.
+
+Every uvicorn worker has its own LexicalIndex on the same directory.
+Writes (add, compact, destroy) hold an exclusive lock on `<dir>.lock` and
+number the new segment after the last one on disk; a segment is linked
+into place, so an existing file is never replaced. Searches check the
+segment listing first and load what other workers added, or reload
+everything after another worker compacted.
+"""
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import file_lock
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Identifiers such as FX-220, E4012, v2.3.1 or snake_case names stay whole;
+# their alphanumeric parts are indexed as well so "fx 220" still matches.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or "
+    "the this that to was what when where which who why with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    out = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok in _STOPWORDS:
+            continue
+        out.append(tok)
+        if not tok.isalnum():
+            out.extend(p for p in _PART_RE.findall(tok) if p not in _STOPWORDS)
+    return out
+
+
+def identifier_terms(text: str) -> List[str]:
+    """Tokens that look like identifiers: letters and digits mixed, or digits with separators."""
+    out = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        has_digit = any(c.isdigit() for c in tok)
+        has_alpha = any(c.isalpha() for c in tok)
+        if len(tok) >= 3 and has_digit and (has_alpha or not tok.isalnum()):
+            out.append(tok)
+    return out
+
+
+def _blob(strings: List[str]) -> np.ndarray:
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def _unblob(arr: np.ndarray) -> List[str]:
+    if arr.size == 0:
+        return []
+    return arr.tobytes().decode("utf-8").split("\n")
+
+
+class LexicalIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._reset()
+        self.refresh()
+
+    def _reset(self):
+        self.ids: List[str] = []             # ordinal -> chunk id
+        self._doc_len: List[np.ndarray] = []
+        self._doc_len_cat: Optional[np.ndarray] = None
+        self._ord: Dict[str, int] = {}       # chunk id -> live ordinal
+        self._dead: set = set()
+        self._postings: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._loaded: List[str] = []         # segment files applied, in order
+
+    # ── files ─────────────────────────────────
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isdir(path) and any(n.startswith("seg-") for n in os.listdir(path))
+
+    def _segment_files(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(n for n in os.listdir(self.path) if n.startswith("seg-") and n.endswith(".npz"))
+
+    def refresh(self):
+        """Pick up segments written (or merged away) by other processes."""
+        with self._lock:
+            if self._segment_files() == self._loaded:
+                return
+            with file_lock.locked(self.path, shared=True):
+                self._sync()
+
+    def _sync(self):
+        """Load segments not applied yet; caller holds the file lock."""
+        files = self._segment_files()
+        if files[:len(self._loaded)] != self._loaded:
+            self._reset()                    # compacted or destroyed elsewhere
+        for name in files[len(self._loaded):]:
+            with np.load(os.path.join(self.path, name)) as z:
+                self._add_segment(
+                    _unblob(z["ids"]), z["doc_len"], _unblob(z["terms"]),
+                    z["offsets"], z["post_doc"], z["post_tf"],
+                )
+            self._loaded.append(name)
+
+    def _add_segment(self, ids, doc_len, terms, offsets, post_doc, post_tf):
+        base = len(self.ids)
+        for i, id_ in enumerate(ids):
+            old = self._ord.get(id_)
+            if old is not None:
+                self._dead.add(old)
+            self._ord[id_] = base + i
+        self.ids.extend(ids)
+        self._doc_len.append(np.asarray(doc_len, dtype=np.uint32))
+        self._doc_len_cat = None
+        post_doc = np.asarray(post_doc, dtype=np.int64) + base
+        for t, term in enumerate(terms):
+            s, e = int(offsets[t]), int(offsets[t + 1])
+            self._postings.setdefault(term, []).append((post_doc[s:e], np.asarray(post_tf[s:e])))
+
+    def _write_segment(self, ids, doc_len, terms, offsets, post_doc, post_tf) -> str:
+        """Write a segment numbered after the last one on disk; caller holds the file lock."""
+        os.makedirs(self.path, exist_ok=True)
+        files = self._segment_files()
+        seq = int(files[-1][4:10]) + 1 if files else 1
+        tmp = os.path.join(self.path, f".tmp-{uuid.uuid4().hex}.npz")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f, ids=_blob(ids), doc_len=np.asarray(doc_len, dtype=np.uint32),
+                terms=_blob(terms), offsets=np.asarray(offsets, dtype=np.int64),
+                post_doc=np.asarray(post_doc, dtype=np.uint32), post_tf=np.asarray(post_tf, dtype=np.uint16),
+            )
+        try:
+            while True:
+                final = os.path.join(self.path, f"seg-{seq:06d}.npz")
+                try:
+                    os.link(tmp, final)      # unlike os.replace, fails if the name is taken
+                    return final
+                except FileExistsError:
+                    seq += 1
+        finally:
+            os.remove(tmp)
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._ord)
+
+    # ── writes ────────────────────────────────
+    def add(self, ids: List[str], texts: List[str]):
+        """Index one batch of chunks as a new segment (re-used ids replace old copies)."""
+        if not ids:
+            return
+        latest = {id_: i for i, id_ in enumerate(ids)}   # last copy within the batch wins
+        seg_ids = list(latest)
+        doc_len, by_term = [], {}
+        for local, id_ in enumerate(seg_ids):
+            counts = Counter(tokenize(texts[latest[id_]]))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                by_term.setdefault(term, []).append((local, min(tf, 65535)))
+
+        terms = sorted(by_term)
+        offsets = [0]
+        post_doc, post_tf = [], []
+        for term in terms:
+            for local, tf in by_term[term]:
+                post_doc.append(local)
+                post_tf.append(tf)
+            offsets.append(len(post_doc))
+
+        with self._lock, file_lock.locked(self.path):
+            self._sync()                     # ordinals follow segment order on disk
+            written = self._write_segment(seg_ids, doc_len, terms, offsets, post_doc, post_tf)
+            self._add_segment(seg_ids, np.asarray(doc_len, dtype=np.uint32), terms,
+                              np.asarray(offsets), np.asarray(post_doc, dtype=np.uint32),
+                              np.asarray(post_tf, dtype=np.uint16))
+            self._loaded.append(os.path.basename(written))
+
+    # ── reads ─────────────────────────────────
+    def _term_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        parts = self._postings.get(term)
+        if not parts:
+            return None
+        if len(parts) > 1:
+            parts[:] = [(np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]))]
+        return parts[0]
+
+    def doc_freq(self, term: str) -> int:
+        self.refresh()
+        with self._lock:
+            p = self._term_postings(term)
+            return 0 if p is None else len(p[0])
+
+    def search(self, query: str, k: int = 6) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, BM25 score), best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        self.refresh()
+        with self._lock:
+            n_live = len(self._ord)
+            if not terms or n_live == 0 or k <= 0:
+                return []
+            if self._doc_len_cat is None:
+                self._doc_len_cat = np.concatenate(self._doc_len).astype(np.float32)
+            doc_len = self._doc_len_cat
+            avgdl = max(float(doc_len.mean()), 1.0)
+            scores = np.zeros(len(self.ids), dtype=np.float32)
+            for term in terms:
+                p = self._term_postings(term)
+                if p is None:
+                    continue
+                docs, tf = p
+                idf = np.log(1.0 + (n_live - len(docs) + 0.5) / (len(docs) + 0.5))
+                tf = tf.astype(np.float32)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[docs] / avgdl)
+                np.add.at(scores, docs, idf * tf * (BM25_K1 + 1) / (tf + norm))
+            if self._dead:
+                scores[list(self._dead)] = 0.0
+            hit = np.flatnonzero(scores)
+            if hit.size == 0:
+                return []
+            k = min(k, hit.size)
+            top = hit[np.argpartition(-scores[hit], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(self.ids[o], float(scores[o])) for o in top]
+
+    # ── maintenance ───────────────────────────
+    def compact(self) -> int:
+        """Merge all segments into one without superseded chunks; returns bytes freed."""
+        if not os.path.isdir(self.path):
+            return 0
+        with self._lock, file_lock.locked(self.path):
+            self._sync()
+            files = list(self._loaded)
+            if len(files) <= 1 and not self._dead:
+                return 0
+            before = sum(os.path.getsize(os.path.join(self.path, f)) for f in files)
+
+            live = np.array(sorted(self._ord.values()), dtype=np.int64)
+            remap = np.full(len(self.ids), -1, dtype=np.int64)
+            remap[live] = np.arange(len(live))
+            doc_len = np.concatenate(self._doc_len)[live] if len(live) else np.zeros(0, np.uint32)
+            terms, offsets, post_doc, post_tf = [], [0], [], []
+            for term in sorted(self._postings):
+                docs, tf = self._term_postings(term)
+                new = remap[docs]
+                keep = new >= 0
+                if not keep.any():
+                    continue
+                order = np.argsort(new[keep])
+                terms.append(term)
+                post_doc.append(new[keep][order])
+                post_tf.append(tf[keep][order])
+                offsets.append(offsets[-1] + int(keep.sum()))
+            ids = [self.ids[o] for o in live]
+            post_doc = np.concatenate(post_doc) if post_doc else np.zeros(0, np.int64)
+            post_tf = np.concatenate(post_tf) if post_tf else np.zeros(0, np.uint16)
+
+            written = self._write_segment(ids, doc_len, terms, offsets, post_doc, post_tf)
+            for f in files:
+                os.remove(os.path.join(self.path, f))
+
+            # reload state from the single merged segment
+            self._reset()
+            self._add_segment(ids, doc_len, terms, np.asarray(offsets), post_doc, post_tf)
+            self._loaded = [os.path.basename(written)]
+            return max(0, before - os.path.getsize(written))
+
+    def destroy(self):
+        with self._lock, file_lock.locked(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._reset()
@@ -0,0 +1,366 @@
+# rag/llm_client.py
+"""
+Protection around the LLM call (Gemini, or rag.mock_llm under load tests).
+
+Every call from rag.pipeline goes through LLMClient.generate, which adds:
+
+  timeouts     each attempt gets min(LLM_TIMEOUT_SEC, request deadline left),
+               passed to the SDK as request_options={"timeout": ...}
+  retries      transient errors (timeouts, connection errors, 429, 5xx) are
+               retried up to LLM_MAX_ATTEMPTS times with full-jitter
+               exponential backoff, never past the request deadline
+  hedging      (LLM_HEDGE=1) if an attempt is still running after the p95 of
+               recent call latencies, a duplicate is sent and whichever
+               answers first wins. The original call starts at once on its
+               own thread; only duplicates use the bounded hedge pool, and
+               none are sent past LLM_HEDGE_BUDGET or while the pool is full
+  breaker      after LLM_BREAKER_FAILURES transient failures in a row, calls
+               fail fast with LLMUnavailable for LLM_BREAKER_RESET_SEC; then
+               one probe call decides whether to close it again
+
+Errors surface as LLMError / LLMUnavailable instead of answer text, so the
+routes can return 503 rather than storing "(Gemini error) ..." in a chat.
+Metrics are labelled by `feature` (ask, ask_batch, vision).
+
+Env:
+  LLM_TIMEOUT_SEC          per-attempt timeout (default 30)
+  LLM_MAX_ATTEMPTS         attempts per call, first one included (default 3)
+  LLM_RETRY_BASE_MS        backoff base (default 200)
+  LLM_RETRY_MAX_MS         backoff cap (default 4000)
+  LLM_HEDGE                1 = send hedged duplicates (default 0)
+  LLM_HEDGE_MIN_SAMPLES    latencies needed before hedging starts (default 20)
+  LLM_HEDGE_MIN_DELAY_MS   never hedge earlier than this (default 250)
+  LLM_HEDGE_BUDGET         hedges allowed per call, long-run (default 0.1)
+  LLM_BREAKER_FAILURES     consecutive failures that open the breaker (default 5)
+  LLM_BREAKER_RESET_SEC    how long it stays open before a probe (default 30)
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from deadlines import DeadlineExceeded
+from metrics import inc, observe, set_gauge
+
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "30"))
+LLM_MAX_ATTEMPTS = max(1, int(os.getenv("LLM_MAX_ATTEMPTS", "3")))
+LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", "200"))
+LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", "4000"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "250"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SEC = float(os.getenv("LLM_BREAKER_RESET_SEC", "30"))
+
+LATENCY_WINDOW = 200      # recent successful calls kept for the hedge delay
+HEDGE_POOL_SIZE = 16
+HEDGE_BURST = 5           # hedges that may be banked for a burst of slow calls
+
+# google.api_core exception classes, matched by name so the SDK stays a lazy import
+_TRANSIENT_NAMES = frozenset({
+    "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests", "ResourceExhausted",
+    "InternalServerError", "BadGateway", "GatewayTimeout", "Aborted", "RetryError",
+})
+
+
+class LLMError(RuntimeError):
+    """The LLM call failed for good (after retries, or not retryable)."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMUnavailable(LLMError):
+    """Upstream is down or overloaded; retry later (maps to 503)."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, DeadlineExceeded):   # our request deadline, not the SDK's
+        return False
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and (code == 429 or code >= 500):
+        return True
+    return type(exc).__name__ in _TRANSIENT_NAMES
+
+
+# ─────────────────────────────
+# Circuit breaker
+# ─────────────────────────────
+_STATE_VALUE = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int, reset_sec: float, name: str = "gemini"):
+        self.threshold = failures
+        self.reset_sec = reset_sec
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._publish()
+
+    def _publish(self):
+        set_gauge("llm_circuit_state", _STATE_VALUE[self.state], upstream=self.name)
+
+    def _move(self, state: str):
+        if state != self.state:
+            self.state = state
+            inc("llm_circuit_transitions_total", upstream=self.name, to=state)
+            self._publish()
+
+    def allow(self) -> float:
+        """0 if a call may go out now, else seconds until the breaker will try again."""
+        if self.threshold <= 0:
+            return 0.0
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            now = time.monotonic()
+            if self.state == "open":
+                left = self.opened_at + self.reset_sec - now
+                if left > 0:
+                    return left
+                self._move("half_open")
+            if self._probing:                  # half-open: one probe at a time
+                return max(1.0, self.reset_sec / 10)
+            self._probing = True
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._move("closed")
+
+    def record_failure(self):
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self._move("open")
+
+    def release(self):
+        """A call that neither succeeded nor failed transiently gives its probe back."""
+        with self._lock:
+            self._probing = False
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            s = sorted(self._samples)
+        return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class HedgeBudget:
+    """Token bucket: every call earns LLM_HEDGE_BUDGET of a hedge, a hedge spends one."""
+
+    def __init__(self, ratio: float, burst: float = HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1.0 - 1e-9:   # ten earns of 0.1 add up to 0.999...
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+def _start_thread(fn, *args) -> Future:
+    """Run fn on a new thread right away (no queue), as a Future."""
+    fut: Future = Future()
+
+    def run():
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(fn(*args))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=run, name="llm-call", daemon=True).start()
+    return fut
+
+
+# ─────────────────────────────
+# Client
+# ─────────────────────────────
+class LLMClient:
+    """
+    generate(prompt) around a google.generativeai-style model:
+    model_factory() -> object with generate_content(prompt, request_options=...).
+    """
+
+    def __init__(self, model_factory: Callable, name: str = "gemini"):
+        self.model_factory = model_factory
+        self.name = name
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SEC, name)
+        self.latency = LatencyTracker()
+        self.hedge_budget = HedgeBudget(LLM_HEDGE_BUDGET)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._hedges_running = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(HEDGE_POOL_SIZE, thread_name_prefix="llm-hedge")
+            return self._pool
+
+    def _call(self, prompt: str, timeout: float):
+        t0 = time.perf_counter()
+        res = self.model_factory().generate_content(prompt, request_options={"timeout": timeout})
+        self.latency.add(time.perf_counter() - t0)
+        return res
+
+    def _try_hedge(self, prompt: str, timeout: float, feature: str) -> Optional[Future]:
+        """Send a duplicate through the hedge pool, unless over budget or the pool is busy."""
+        with self._pool_lock:
+            ok = self._hedges_running < HEDGE_POOL_SIZE and self.hedge_budget.spend()
+            if ok:
+                self._hedges_running += 1
+        if not ok:
+            inc("llm_hedges_total", feature=feature, outcome="skipped")
+            return None
+
+        def done(_fut):
+            with self._pool_lock:
+                self._hedges_running -= 1
+
+        inc("llm_hedges_total", feature=feature, outcome="sent")
+        hedge = self._executor().submit(self._call, prompt, timeout)
+        hedge.add_done_callback(done)
+        return hedge
+
+    def _attempt(self, prompt: str, timeout: float, feature: str):
+        """One logical attempt: the call, plus a hedged duplicate if it is slow."""
+        delay = None
+        if LLM_HEDGE:
+            self.hedge_budget.earn()
+            delay = self.latency.quantile(0.95, LLM_HEDGE_MIN_SAMPLES)
+        if delay is None or delay >= timeout:
+            return self._call(prompt, timeout)
+
+        # The caller thread only waits: the original call gets a thread of its
+        # own, started now, so its clock never includes queueing behind hedges.
+        delay = max(delay, LLM_HEDGE_MIN_DELAY_MS / 1000.0)
+        primary = _start_thread(self._call, prompt, timeout)
+        done, _ = wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge = self._try_hedge(prompt, max(0.001, timeout - delay), feature)
+        if hedge is None:
+            return primary.result()
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    if fut is hedge:
+                        inc("llm_hedges_total", feature=feature, outcome="won")
+                    for other in pending:
+                        other.cancel()       # drops it if it has not started
+                    return fut.result()
+                error = error or fut.exception()
+        raise error
+
+    def generate(self, prompt: str, deadline=None, feature: str = "ask"):
+        """
+        Model response for `prompt`. Raises DeadlineExceeded (request out of
+        time), LLMUnavailable (breaker open, or transient errors exhausted the
+        retries) or LLMError (non-retryable upstream error).
+        """
+        t_start = time.perf_counter()
+        outcome = "error"
+        try:
+            for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+                wait_s = self.breaker.allow()
+                if wait_s > 0:
+                    outcome = "rejected"
+                    inc("llm_circuit_rejected_total", feature=feature)
+                    raise LLMUnavailable(f"{self.name} circuit open", retry_after=wait_s)
+
+                timeout = LLM_TIMEOUT_SEC
+                if deadline is not None:
+                    try:
+                        deadline.check("llm")
+                    except DeadlineExceeded:
+                        self.breaker.release()
+                        raise
+                    timeout = min(timeout, deadline.remaining())
+
+                try:
+                    res = self._attempt(prompt, timeout, feature)
+                except Exception as e:
+                    if not is_transient(e):
+                        self.breaker.release()
+                        if deadline is not None:
+                            deadline.check("llm_response")
+                        raise LLMError(f"{self.name} error: {e}") from e
+                    self.breaker.record_failure()
+                    reason = type(e).__name__
+                    if deadline is not None:
+                        deadline.check("llm_response")   # report a timeout as such
+                    if attempt == LLM_MAX_ATTEMPTS:
+                        raise LLMUnavailable(f"{self.name} unavailable: {e}", retry_after=1.0) from e
+
+                    cap = min(LLM_RETRY_MAX_MS, LLM_RETRY_BASE_MS * 2 ** (attempt - 1)) / 1000.0
+                    backoff = random.uniform(0, cap)
+                    if deadline is not None and backoff >= deadline.remaining():
+                        raise LLMUnavailable(f"{self.name} unavailable: {e}", retry_after=1.0) from e
+                    inc("llm_retries_total", feature=feature, reason=reason)
+                    time.sleep(backoff)
+                    continue
+
+                self.breaker.record_success()
+                outcome = "ok"
+                return res
+        except DeadlineExceeded:
+            outcome = "deadline"
+            raise
+        finally:
+            inc("llm_calls_total", feature=feature, outcome=outcome)
+            observe("llm_call_seconds", time.perf_counter() - t_start, feature=feature, outcome=outcome)
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client(model_factory: Callable) -> LLMClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(model_factory)
+        return _client
@@ -0,0 +1,67 @@
+# rag/mock_llm.py
+"""
+Local stand-in for the Gemini model, for load tests that must not burn quota.
+
+Enabled with LLM_BACKEND=mock (see pipeline._get_gemini). It mimics the
+small part of google.generativeai.GenerativeModel we use:
+generate_content(prompt) -> object with .text, and
+generate_content(prompt, stream=True) -> iterator of chunks with .text.
+request_options={"timeout": s} is honoured: a slower answer raises TimeoutError.
+
+Env:
+  MOCK_LLM_LATENCY_MS       time to first token (default 300)
+  MOCK_LLM_TOKENS_PER_SEC   generation speed after that (default 50; 0 = instant)
+  MOCK_LLM_ANSWER_TOKENS    answer length in "tokens" (words) (default 60)
+  MOCK_LLM_ERROR_RATE       fraction of calls that raise (default 0)
+"""
+import os
+import random
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Iterator
+
+_FILLER = (
+    "Based on the provided context the answer is that the relevant "
+    "section describes the configuration steps and their expected results"
+).split()
+
+
+@dataclass
+class _Chunk:
+    text: str
+
+
+class MockGenerativeModel:
+    def __init__(self, model_name: str = "mock"):
+        self.model_name = model_name
+        self.latency = float(os.getenv("MOCK_LLM_LATENCY_MS", "300")) / 1000.0
+        self.tps = float(os.getenv("MOCK_LLM_TOKENS_PER_SEC", "50"))
+        self.n_tokens = int(os.getenv("MOCK_LLM_ANSWER_TOKENS", "60"))
+        self.error_rate = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+
+    def _tokens(self, prompt: str):
+        # Deterministic per prompt so repeated questions get the same answer
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+        return [rng.choice(_FILLER) for _ in range(self.n_tokens)]
+
+    def _stream(self, prompt: str) -> Iterator[_Chunk]:
+        time.sleep(self.latency)
+        per_token = 1.0 / self.tps if self.tps > 0 else 0.0
+        for i, tok in enumerate(self._tokens(prompt)):
+            if per_token:
+                time.sleep(per_token)
+            yield _Chunk(text=(" " if i else "") + tok)
+
+    def generate_content(self, prompt: str, stream: bool = False, request_options=None, **_kwargs):
+        if self.error_rate and random.random() < self.error_rate:
+            raise ConnectionError("mock LLM injected error")  # transient, like an upstream blip
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and not stream:
+            total = self.latency + (self.n_tokens / self.tps if self.tps > 0 else 0.0)
+            if total > timeout:
+                time.sleep(timeout)
+                raise TimeoutError(f"mock LLM timed out after {timeout:.2f}s")
+        if stream:
+            return self._stream(prompt)
+        return _Chunk(text="".join(c.text for c in self._stream(prompt)))
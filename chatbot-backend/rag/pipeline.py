@@ -9,13 +9,17 @@ load_dotenv(override=True)
 
 from .file_parser import parse_file
 from .text_splitter import recursive_split
-from .vector_store import upsert_chunks, similarity_search
+from .vector_store import upsert_chunks, similarity_search, similarity_search_many
+from . import inference_client
+from .llm_client import LLMError, get_llm_client
 
-import google.generativeai as genai
-from PIL import Image
-from transformers import BlipProcessor, BlipForConditionalGeneration
+# google.generativeai, PIL and transformers (BLIP) are imported lazily in
+# their getters below; importing them here costs seconds at app startup.
 
 from models import Dataset  # SQLAlchemy model
+from deadlines import DeadlineExceeded
+from metrics import inc, timed
+from warmup import loading
 
 # Type alias for scraped docs: (source_url, text)
 TextDoc = Tuple[str, str]
@@ -23,8 +27,8 @@ TextDoc = Tuple[str, str]
 # ─────────────────────────────
 # Globals (lazy-loaded once)
 # ─────────────────────────────
-_blip_processor: Optional[BlipProcessor] = None
-_blip_model: Optional[BlipForConditionalGeneration] = None
+_blip_processor = None  # transformers.BlipProcessor
+_blip_model = None      # transformers.BlipForConditionalGeneration
 _gemini_model = None
 
 
@@ -38,26 +42,44 @@ def _get_blip():
     """
     global _blip_processor, _blip_model
     if _blip_processor is None or _blip_model is None:
-        _blip_processor = BlipProcessor.from_pretrained(
-            "Salesforce/blip-image-captioning-base"
-        )
-        _blip_model = BlipForConditionalGeneration.from_pretrained(
-            "Salesforce/blip-image-captioning-base"
-        )
+        with loading("blip"):
+            from transformers import BlipProcessor, BlipForConditionalGeneration
+
+            _blip_processor = BlipProcessor.from_pretrained(
+                "Salesforce/blip-image-captioning-base"
+            )
+            _blip_model = BlipForConditionalGeneration.from_pretrained(
+                "Salesforce/blip-image-captioning-base"
+            )
     return _blip_processor, _blip_model
 
 
-def caption_image(image_path: str) -> str:
-    """
-    Return a short caption for the given image file using BLIP.
-    """
+def _caption_local(image) -> str:
+    """image: file path or binary file-like object."""
+    from PIL import Image
+
     processor, model = _get_blip()
-    image = Image.open(image_path).convert("RGB")
-    inputs = processor(image, return_tensors="pt")
+    pil = Image.open(image).convert("RGB")
+    inputs = processor(pil, return_tensors="pt")
     out = model.generate(**inputs, max_new_tokens=40)
     return processor.decode(out[0], skip_special_tokens=True)
 
 
+def caption_image(image_path: str) -> str:
+    """
+    Return a short caption for the given image file using BLIP
+    (in-process, or via the inference sidecar when INFERENCE_SOCKET is set).
+    """
+    with timed("model_call_seconds", model="blip"):
+        if inference_client.enabled():
+            with open(image_path, "rb") as f:
+                cap = inference_client.caption(f.read())
+        else:
+            cap = _caption_local(image_path)
+    inc("model_items_total", model="blip")
+    return cap
+
+
 # ─────────────────────────────
 # Gemini helpers
 # ─────────────────────────────
@@ -69,20 +91,36 @@ def _get_gemini():
     - Uses GEMINI_MODEL if set (e.g. 'gemini-2.5-flash' or 'gemini-flash-latest'),
       otherwise defaults to 'gemini-flash-latest'.
     - If someone sets 'models/gemini-2.5-flash', we strip the 'models/' prefix.
+    - LLM_BACKEND=mock swaps in rag.mock_llm for load testing (no API key needed).
+    - GEMINI_API_ENDPOINT (e.g. http://127.0.0.1:8765) points the SDK's REST
+      transport at another server, such as benchmarks/fake_gemini.py.
     """
     global _gemini_model
+    if _gemini_model is None and os.getenv("LLM_BACKEND", "gemini").lower() == "mock":
+        from .mock_llm import MockGenerativeModel
+
+        with loading("gemini"):
+            _gemini_model = MockGenerativeModel()
     if _gemini_model is None:
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
             raise RuntimeError("GEMINI_API_KEY environment variable is not set.")
 
-        genai.configure(api_key=api_key)
+        with loading("gemini"):
+            import google.generativeai as genai
 
-        model_name = os.getenv("GEMINI_MODEL", "gemini-flash-latest").strip()
-        if model_name.startswith("models/"):
-            model_name = model_name.split("/", 1)[1]
+            endpoint = os.getenv("GEMINI_API_ENDPOINT", "").strip()
+            if endpoint:
+                genai.configure(api_key=api_key, transport="rest",
+                                client_options={"api_endpoint": endpoint})
+            else:
+                genai.configure(api_key=api_key)
 
-        _gemini_model = genai.GenerativeModel(model_name)
+            model_name = os.getenv("GEMINI_MODEL", "gemini-flash-latest").strip()
+            if model_name.startswith("models/"):
+                model_name = model_name.split("/", 1)[1]
+
+            _gemini_model = genai.GenerativeModel(model_name)
 
     return _gemini_model
 
@@ -94,16 +132,20 @@ _gem = _get_gemini
 # ─────────────────────────────
 # Ingestion for FILES  (upload)
 # ─────────────────────────────
-def ingest_document(collection_name: str, file_path: str, doc_id: str) -> int:
+def ingest_document(collection_name: str, file_path: str, doc_id: str, source: Optional[str] = None) -> int:
     """
     Parse -> chunk -> store in vector store (Chroma) via vector_store.py.
-    Returns number of chunks stored.
+    `source` is the name API key scopes and filters match on, normally the
+    uploaded file name (the saved copy is renamed). Returns number of chunks stored.
     """
-    text = parse_file(file_path)
-    chunks = recursive_split(text, chunk_size=700, overlap=100)
+    with timed("rag_stage_seconds", stage="parse", dataset=collection_name):
+        text = parse_file(file_path)
+    with timed("rag_stage_seconds", stage="split", dataset=collection_name):
+        chunks = recursive_split(text, chunk_size=700, overlap=100)
+    inc("rag_chunks_total", len(chunks), dataset=collection_name)
 
     metadatas = [
-        {"doc_id": doc_id, "source": os.path.basename(file_path), "idx": i}
+        {"doc_id": doc_id, "source": source or os.path.basename(file_path), "idx": i}
         for i in range(len(chunks))
     ]
 
@@ -138,7 +180,8 @@ def ingest_text_docs_to_dataset(
 
     total_chunks = 0
     for idx, (source, text) in enumerate(docs):
-        chunks = recursive_split(text, chunk_size=700, overlap=100)
+        with timed("rag_stage_seconds", stage="split", dataset=collection_name):
+            chunks = recursive_split(text, chunk_size=700, overlap=100)
         if not chunks:
             continue
 
@@ -157,6 +200,7 @@ def ingest_text_docs_to_dataset(
         upsert_chunks(collection_name, doc_key, chunks, metadatas)
         total_chunks += len(chunks)
 
+    inc("rag_chunks_total", total_chunks, dataset=collection_name)
     return total_chunks
 
 
@@ -177,14 +221,20 @@ Answer:
 """
 
 
-def _run_gemini(prompt: str) -> str:
+def _run_gemini(prompt: str, deadline=None, feature: str = "ask") -> str:
     """
-    Internal helper to call Gemini safely and return response text.
+    Internal helper to call Gemini through the resilient client
+    (rag.llm_client: timeouts, retries, hedging, circuit breaker) and return
+    response text. Raises LLMError when Gemini can't answer; with a deadline,
+    the remaining budget caps the per-attempt timeout.
     """
-    model = _get_gemini()
-    res = model.generate_content(prompt)
+    with timed("rag_stage_seconds", stage="llm"):
+        res = get_llm_client(_get_gemini).generate(prompt, deadline=deadline, feature=feature)
 
-    txt = getattr(res, "text", None)
+    try:
+        txt = getattr(res, "text", None)
+    except ValueError as e:   # the SDK raises this for a blocked / candidate-less response
+        raise LLMError(f"Gemini returned no text: {e}") from e
     if txt:
         return txt.strip()
 
@@ -194,44 +244,77 @@ def _run_gemini(prompt: str) -> str:
             if isinstance(part, dict) and "text" in part:
                 parts.append(part["text"])
     out = "\n".join(parts).strip()
-    return out or "(no response)"
+    if not out:
+        raise LLMError("Gemini returned an empty response")
+    return out
+
+
+def _answer(question: str, results: List[Tuple[str, dict]], extra_context=None,
+            deadline=None, feature: str = "ask") -> str:
+    ctx_blocks = [doc for (doc, _m) in results]
+    if extra_context:
+        ctx_blocks.extend(extra_context)
+
+    ctx = "\n\n---\n\n".join(ctx_blocks[:10]) if ctx_blocks else "(no context)"
+
+    prompt = PROMPT.format(q=question, ctx=ctx)
+    return _run_gemini(prompt, deadline, feature)
 
 
 def ask(
     collection_name: str,
     question: str,
     extra_context: Optional[List[str]] = None,
+    deadline=None,
+    filters: Optional[dict] = None,
 ) -> str:
     """
     Retrieve top-k chunks from Chroma and ask Gemini to answer
-    using ONLY that context. Returns a string (never raises).
+    using ONLY that context. Returns a string; raises LLMError when no
+    answer can be produced (Gemini unavailable, a blocked or empty
+    response, a retrieval failure), and DeadlineExceeded (or
+    RequestCancelled) when given a deadline.
+    `filters` ({"source": [...], "doc_id": [...]}) limits retrieval to
+    those documents (see vector_store.similarity_search).
     """
     try:
         results: List[Tuple[str, dict]] = similarity_search(
-            collection_name, question, k=6
+            collection_name, question, k=6, deadline=deadline, filters=filters
         )
-        ctx_blocks = [doc for (doc, _m) in results]
-        if extra_context:
-            ctx_blocks.extend(extra_context)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        raise LLMError(f"retrieval failed: {e}") from e
+    return _answer(question, results, extra_context, deadline)
 
-        ctx = "\n\n---\n\n".join(ctx_blocks[:10]) if ctx_blocks else "(no context)"
 
-        prompt = PROMPT.format(q=question, ctx=ctx)
-        return _run_gemini(prompt)
-    except Exception as e:
-        return f"(Gemini error) {e}"
+# ─────────────────────────────
+# Batch QA (/ext/ask-batch)
+# ─────────────────────────────
+def retrieve_many(
+    collection_name: str,
+    questions: List[str],
+    deadline=None,
+    filters: Optional[dict] = None,
+) -> List[List[Tuple[str, dict]]]:
+    """Retrieval for many questions at once (one embedding batch, one vector query)."""
+    with timed("rag_stage_seconds", stage="retrieve_batch", dataset=collection_name):
+        return similarity_search_many(collection_name, questions, k=6, deadline=deadline, filters=filters)
+
+
+def answer_retrieved(question: str, results: List[Tuple[str, dict]], deadline=None) -> str:
+    """The Gemini half of ask(), for context already fetched by retrieve_many."""
+    return _answer(question, results, deadline=deadline, feature="ask_batch")
 
 
 def generate_answer(question: str, context: str) -> str:
     """
     Direct LLM helper used by /vision routes.
     Takes a question and a pre-built context string.
+    Raises LLMError when Gemini is unavailable.
     """
-    try:
-        prompt = PROMPT.format(q=question, ctx=context or "(no context)")
-        return _run_gemini(prompt)
-    except Exception as e:
-        return f"(Gemini error) {e}"
+    prompt = PROMPT.format(q=question, ctx=context or "(no context)")
+    return _run_gemini(prompt, feature="vision")
 
 
 def answer_with_context(question: str, context: str) -> str:
@@ -255,5 +338,7 @@ def ask_with_image(collection_name: str, image_path: str, question: str) -> str:
         cap = caption_image(image_path)
         extra = [f"Image caption: {cap}"]
         return ask(collection_name, question, extra_context=extra)
+    except LLMError:
+        raise
     except Exception as e:
         return f"(Vision error) {e}"
@@ -0,0 +1,40 @@
+# rag/speech.py
+import threading
+
+from metrics import inc, timed
+from warmup import loading
+from . import inference_client
+
+_whisper = None
+_whisper_lock = threading.Lock()
+
+
+def _get_whisper():
+    """Load the small/base Whisper model for CPU on first use."""
+    global _whisper
+    with _whisper_lock:
+        if _whisper is None:
+            with loading("whisper"):
+                from faster_whisper import WhisperModel
+
+                _whisper = WhisperModel("base", device="cpu", compute_type="int8")
+        return _whisper
+
+
+def _transcribe_local(audio) -> str:
+    """audio: file path or binary file-like object."""
+    segments, info = _get_whisper().transcribe(audio, beam_size=1)
+    # segments is a lazy generator; decoding happens while joining
+    return " ".join(seg.text for seg in segments).strip()
+
+
+def transcribe(path: str) -> str:
+    """Transcribe an audio file, in-process or via the inference sidecar."""
+    with timed("model_call_seconds", model="whisper"):
+        if inference_client.enabled():
+            with open(path, "rb") as f:
+                text = inference_client.transcribe(f.read())
+        else:
+            text = _transcribe_local(path)
+    inc("model_items_total", model="whisper")
+    return text
@@ -1,35 +1,570 @@
 # rag/vector_store.py
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+"""
+Vector storage behind upsert_chunks / similarity_search, with two backends:
 
-# Small, fast CPU embedder (no ONNX)
-st_embedder = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    normalize_embeddings=True,
-)
+  chroma  Chroma PersistentClient (HNSW + SQLite)
+  flat    rag.flat_index: memory-mapped matrix, brute-force dot product;
+          faster and lighter for small and medium collections. Storage
+          per new index: FLAT_DTYPE (float32|float16) and FLAT_QUANT
+          (none|int8, int8 codes scanned then rescored at full precision)
 
-client = chromadb.PersistentClient(
-    path="vector_store",
-    settings=Settings(anonymized_telemetry=False)
-)
+Each collection lives in exactly one backend; a collection with a flat
+index directory is flat, one in Chroma is Chroma (both checked on disk, so
+all uvicorn workers agree). New collections follow VECTOR_BACKEND:
+  chroma  always Chroma
+  flat    always flat
+  auto    (default) start flat and move to Chroma once the collection
+          would exceed FLAT_MAX_CHUNKS; existing Chroma collections stay put
+
+Hybrid retrieval (HYBRID_SEARCH=1, default): upsert_chunks also feeds a
+per-collection BM25 index (rag.lexical_index), and similarity_search fuses
+vector and BM25 rankings with reciprocal rank fusion. A query that is
+mostly an identifier the index knows (part number, error code) is answered
+from BM25 alone, without embedding it (LEXICAL_FAST_PATH=1, default).
+
+similarity_search_many runs a list of queries together: one embedding
+batch and one multi-query vector search for all of them (batch ask API).
+
+Filters: similarity_search(..., filters={"source": [...], "doc_id": [...]})
+restricts retrieval to chunks whose metadata matches (values OR-ed, fields
+AND-ed). Chroma gets them as a `where` clause; flat indexes search only the
+matching partition; BM25 hits are checked against chunk metadata.
+
+Embedding cache (EMBED_CACHE=1, opt-in): upsert_many embeds only chunks
+whose text no collection has embedded before with the same model and
+runtime (rag.embedding_cache, reference-counted; delete_collection
+releases a collection's references). It saves embedding time only: each
+collection still stores its own vectors, and the cache adds a copy.
+
+Move a single dataset by hand, or build the BM25 index for a collection
+created before hybrid search, with
+  python -m rag.vector_store migrate ds_xxxxxxxxxxxx flat|chroma
+  python -m rag.vector_store reindex-lexical ds_xxxxxxxxxxxx
+  python -m rag.vector_store cache-stats
+"""
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import inc, timed
+from warmup import loading
+from .embedding_cache import EMBED_CACHE, embed_cached, get_embedding_cache
+from .embedder import MODEL_NAME, embed_texts, resolved_runtime
+
+# VECTOR_STORE_DIR lets benchmarks/tools point at a scratch store
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_store")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto").strip().lower()
+FLAT_MAX_CHUNKS = int(os.getenv("FLAT_MAX_CHUNKS", "200000"))
+MIGRATE_BATCH = 5000   # stays under Chroma's max batch size
+ORPHAN_MIN_AGE_SEC = 600   # compact() never removes a segment folder touched more recently
+
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") != "0"
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "1") != "0"
+LEXICAL_FAST_MAX_WORDS = 3   # other content words allowed next to the identifier
+RRF_K = 60                   # standard reciprocal-rank-fusion constant
+FILTER_FIELDS = ("source", "doc_id")
+
+# chromadb is imported on first use, not at module import, so the app can
+# start serving /health right away. Embeddings come from rag.embedder, so
+# there is a single MiniLM per process (or none, with the inference sidecar).
+_client_lock = threading.Lock()
+_client = None
+_embedding_function = None
+
+def get_embedding_function():
+    """Chroma-compatible wrapper over rag.embedder (normalized, cosine space)."""
+    global _embedding_function
+    if _embedding_function is None:
+        from chromadb import Documents, EmbeddingFunction, Embeddings
+
+        class MiniLMEmbeddingFunction(EmbeddingFunction[Documents]):
+            def __call__(self, input: Documents) -> Embeddings:
+                return embed_texts(list(input), normalize=True)
+
+        _embedding_function = MiniLMEmbeddingFunction()
+    return _embedding_function
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            with loading("vector_store"):
+                import chromadb
+                from chromadb.config import Settings
+
+                _client = chromadb.PersistentClient(
+                    path=VECTOR_STORE_DIR,
+                    settings=Settings(anonymized_telemetry=False)
+                )
+        return _client
 
 def get_collection(name: str):
     # Attach our embedder so Chroma never tries the ONNX one
-    return client.get_or_create_collection(
+    return get_client().get_or_create_collection(
         name=name,
         metadata={"hnsw:space": "cosine"},
-        embedding_function=st_embedder,
+        embedding_function=get_embedding_function(),
     )
 
+def _chroma_names():
+    # A store Chroma never opened has no collections: don't import chromadb
+    # (and create its database) just to find that out on a flat upsert
+    if _client is None and not os.path.exists(os.path.join(VECTOR_STORE_DIR, "chroma.sqlite3")):
+        return []
+    # chromadb < 0.6 returns Collection objects, 0.6+ returns names
+    return [getattr(c, "name", c) for c in get_client().list_collections()]
+
+
+# ─────────────────────────────
+# Flat backend + selection
+# ─────────────────────────────
+_flat_lock = threading.Lock()
+_flat_indexes = {}
+_chroma_known = set()   # collections this process has seen in Chroma
+
+def _side_path(kind: str, name: str) -> str:
+    if not re.fullmatch(r"[A-Za-z0-9_.-]+", name):
+        raise ValueError(f"invalid collection name: {name!r}")
+    return os.path.join(VECTOR_STORE_DIR, kind, name)
+
+def _flat_path(name: str) -> str:
+    return _side_path("flat", name)
+
+def _flat_exists(name: str) -> bool:
+    from .flat_index import FlatIndex
+
+    return FlatIndex.exists(_flat_path(name))
+
+def get_flat_index(name: str):
+    from .flat_index import FlatIndex
+
+    with _flat_lock:
+        idx = _flat_indexes.get(name)
+        if idx is None:
+            idx = _flat_indexes[name] = FlatIndex(_flat_path(name))
+        return idx
+
+def backend_for(name: str) -> str:
+    # Checked against disk on every call: another worker may have created the
+    # collection, or migrated it, since this process last looked. Only
+    # "chroma" is remembered (listing Chroma collections is not free); a
+    # collection leaves Chroma only through migrate, which creates the flat
+    # directory that is checked first.
+    if _flat_exists(name):
+        return "flat"
+    with _flat_lock:
+        if name in _chroma_known:
+            return "chroma"
+    if VECTOR_BACKEND == "chroma" or name in _chroma_names():
+        with _flat_lock:
+            _chroma_known.add(name)
+        return "chroma"
+    return "flat"   # new collection under VECTOR_BACKEND=flat|auto
+
+_lexical_indexes = {}
+
+def get_lexical_index(name: str):
+    from .lexical_index import LexicalIndex
+
+    with _flat_lock:
+        idx = _lexical_indexes.get(name)
+        if idx is None:
+            idx = _lexical_indexes[name] = LexicalIndex(_side_path("lexical", name))
+        return idx
+
+def _forget(name: str):
+    with _flat_lock:
+        _chroma_known.discard(name)
+        _flat_indexes.pop(name, None)
+
+
+def _embed(texts, stage: str, dataset: str, lane: str):
+    # Embed here rather than inside Chroma so embed and index time are measured apart
+    with timed("rag_stage_seconds", stage=stage, dataset=dataset):
+        return embed_texts(list(texts), normalize=True, lane=lane)
+
 def upsert_chunks(collection_name: str, doc_id: str, chunks, metadatas=None):
-    col = get_collection(collection_name)
     ids = [f"{doc_id}::{i}" for i in range(len(chunks))]
-    col.upsert(documents=chunks, ids=ids, metadatas=metadatas or [{} for _ in chunks])
+    upsert_many(collection_name, ids, chunks, metadatas)
+
+def upsert_many(collection_name: str, ids, chunks, metadatas=None):
+    """upsert_chunks for chunks of any number of documents: one embedding batch, one write."""
+    metadatas = metadatas or [{} for _ in chunks]
+    if EMBED_CACHE:
+        # Only chunks no collection has embedded before reach the model
+        cache = get_embedding_cache(VECTOR_STORE_DIR)
+        embeddings, hashes, vectors = embed_cached(
+            cache, list(chunks), lambda texts: _embed(texts, "embed", collection_name, lane="bulk"),
+            MODEL_NAME, resolved_runtime(), collection_name,
+        )
+    else:
+        embeddings = _embed(chunks, "embed", collection_name, lane="bulk")
+
+    _upsert_vectors(collection_name, list(ids), embeddings, list(chunks), metadatas)
+    if EMBED_CACHE:
+        # only once the vectors are written: a failed upsert must not hold references
+        with timed("rag_stage_seconds", stage="embed_cache_refs", dataset=collection_name):
+            cache.record_refs(collection_name, list(ids), hashes, vectors)
+    if HYBRID_SEARCH:
+        with timed("rag_stage_seconds", stage="lexical_index", dataset=collection_name):
+            get_lexical_index(collection_name).add(list(ids), list(chunks))
+
+def _upsert_vectors(collection_name: str, ids, embeddings, chunks, metadatas):
+    if backend_for(collection_name) == "flat":
+        idx = get_flat_index(collection_name)
+        # Under the index's cross-process lock, so a worker migrating it to
+        # Chroma finishes first; then the directory is gone and the collection
+        # is in Chroma, and writing here would recreate a flat index that
+        # shadows it. Chroma is only listed while the collection has no flat
+        # directory, i.e. on its first upsert.
+        with idx.write_lock():
+            if _flat_exists(collection_name) or collection_name not in _chroma_names():
+                if VECTOR_BACKEND != "auto" or len(idx) + len(ids) <= FLAT_MAX_CHUNKS:
+                    with timed("rag_stage_seconds", stage="upsert", dataset=collection_name):
+                        idx.upsert(ids, embeddings, chunks, metadatas)
+                    return
+                migrate_collection(collection_name, "chroma")
 
-def similarity_search(collection_name: str, query: str, k: int = 6):
     col = get_collection(collection_name)
-    out = col.query(query_texts=[query], n_results=k)
-    docs = out.get("documents", [[]])[0]
-    metas = out.get("metadatas", [[]])[0]
-    return list(zip(docs, metas))
+    with timed("rag_stage_seconds", stage="upsert", dataset=collection_name):
+        col.upsert(
+            documents=chunks,
+            embeddings=embeddings,
+            ids=ids,
+            metadatas=metadatas,
+        )
+
+def normalize_filters(filters):
+    """Drop empty fields; None when nothing is left. Raises ValueError on unknown fields."""
+    if not filters:
+        return None
+    out = {}
+    for field, values in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"unsupported filter field: {field}")
+        if values:
+            out[field] = [values] if isinstance(values, str) else list(values)
+    return out or None
+
+def _chroma_where(filters):
+    clauses = [{field: {"$in": values}} for field, values in filters.items()]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _matches(meta, filters) -> bool:
+    return all((meta or {}).get(field) in values for field, values in filters.items())
+
+def _vector_hits(collection_name: str, q_embs, k: int, filters=None):
+    """
+    Per query embedding, [(chunk id, document, metadata)] best first, from
+    whichever backend holds the collection. Chroma takes all queries in one call.
+    """
+    if backend_for(collection_name) == "flat":
+        with timed("rag_stage_seconds", stage="flat_query", dataset=collection_name):
+            return get_flat_index(collection_name).search_many(q_embs, k, filters)
+
+    col = get_collection(collection_name)
+    kwargs = {"where": _chroma_where(filters)} if filters else {}
+    with timed("rag_stage_seconds", stage="chroma_query", dataset=collection_name):
+        out = col.query(query_embeddings=list(q_embs), n_results=k, **kwargs)
+    return [list(zip(ids, docs, metas))
+            for ids, docs, metas in zip(out["ids"], out["documents"], out["metadatas"])]
+
+def _fetch_chunks(collection_name: str, ids):
+    """{chunk id: (document, metadata)} for lexical hits the vector side didn't return."""
+    if not ids:
+        return {}
+    if backend_for(collection_name) == "flat":
+        return get_flat_index(collection_name).get(ids)
+    got = get_collection(collection_name).get(ids=list(ids), include=["documents", "metadatas"])
+    return {i: (d, m or {}) for i, d, m in zip(got["ids"], got["documents"], got["metadatas"])}
+
+def list_sources(collection_name: str):
+    """Sorted distinct "source" values (file names, URLs) of a collection's chunks."""
+    if backend_for(collection_name) == "flat":
+        sources = set(get_flat_index(collection_name).values("source"))
+    elif collection_name in _chroma_names():   # get_collection would create it
+        col = get_collection(collection_name)
+        sources = set()
+        for offset in range(0, col.count(), MIGRATE_BATCH):
+            got = col.get(limit=MIGRATE_BATCH, offset=offset, include=["metadatas"])
+            sources.update((m or {}).get("source") for m in got["metadatas"])
+    else:
+        return []
+    sources.discard(None)
+    return sorted(map(str, sources))
+
+def _is_identifier_lookup(lex, query: str) -> bool:
+    from .lexical_index import identifier_terms, tokenize
+
+    idents = [t for t in identifier_terms(query) if lex.doc_freq(t) > 0]
+    if not idents:
+        return False
+    other = [t for t in tokenize(query) if t not in idents and not any(t in i for i in idents)]
+    return len(other) <= LEXICAL_FAST_MAX_WORDS
+
+def _lexical_hits(collection_name: str, lex, query: str, k: int, filters=None):
+    """[(chunk id, document, metadata)] best first from BM25, filtered like the vector side."""
+    with timed("rag_stage_seconds", stage="lexical_query", dataset=collection_name):
+        # BM25 has no metadata; over-fetch when filtering, then check each hit
+        hits = lex.search(query, k * 5 if filters else k)
+        found = _fetch_chunks(collection_name, [i for i, _s in hits])
+    out = [(i, *found[i]) for i, _s in hits if i in found]
+    if filters:
+        out = [h for h in out if _matches(h[2], filters)]
+    return out[:k]
+
+def similarity_search(collection_name: str, query: str, k: int = 6, deadline=None, filters=None):
+    return similarity_search_many(collection_name, [query], k, deadline, filters)[0]
+
+def similarity_search_many(collection_name: str, queries, k: int = 6, deadline=None, filters=None):
+    """
+    similarity_search for a list of queries: [[(document, metadata)], ...]
+    in query order. Queries that need embeddings are embedded as one batch
+    and looked up with one multi-query vector search.
+    """
+    filters = normalize_filters(filters)
+    lex = get_lexical_index(collection_name) if HYBRID_SEARCH else None
+    if lex is not None and not len(lex):
+        lex = None
+
+    results = [None] * len(queries)
+    if lex is not None and LEXICAL_FAST_PATH:
+        for i, query in enumerate(queries):
+            if _is_identifier_lookup(lex, query):
+                hits = _lexical_hits(collection_name, lex, query, k, filters)
+                if hits:
+                    inc("retrieval_path_total", path="lexical")
+                    results[i] = [(doc, meta) for _id, doc, meta in hits]
+    todo = [i for i, r in enumerate(results) if r is None]
+    if not todo:
+        return results
+
+    if deadline is not None:
+        deadline.check("embed_query")
+    q_embs = _embed([queries[i] for i in todo], "embed_query", collection_name, lane="interactive")
+    if deadline is not None:
+        deadline.check("vector_query")
+
+    if lex is None:
+        for i, hits in zip(todo, _vector_hits(collection_name, q_embs, k, filters)):
+            inc("retrieval_path_total", path="vector")
+            results[i] = [(doc, meta) for _id, doc, meta in hits]
+        return results
+
+    # Hybrid: fuse a deeper candidate list from each side by reciprocal rank
+    depth = max(k * 3, 20)
+    for i, vec in zip(todo, _vector_hits(collection_name, q_embs, depth, filters)):
+        lexical = _lexical_hits(collection_name, lex, queries[i], depth, filters)
+        fused = {}
+        for ranking in ([h[0] for h in vec], [h[0] for h in lexical]):
+            for rank, id_ in enumerate(ranking):
+                fused[id_] = fused.get(id_, 0.0) + 1.0 / (RRF_K + rank + 1)
+        top = sorted(fused, key=fused.get, reverse=True)[:k]
+
+        chunks = {c: (d, m) for c, d, m in lexical + vec}
+        inc("retrieval_path_total", path="hybrid")
+        results[i] = [chunks[c] for c in top]
+    return results
+
+def migrate_collection(name: str, to: str) -> int:
+    """Copy a collection (embeddings included) into the other backend, then drop the source."""
+    if to not in ("flat", "chroma"):
+        raise ValueError(f"unknown backend: {to}")
+    src = backend_for(name)
+    if src == to:
+        return 0
+    moved = 0
+    idx = get_flat_index(name)
+    # Holding the flat index's lock keeps other workers' writes out until the
+    # move is done (see _upsert_vectors)
+    with timed("vector_store_maintenance_seconds", op="migrate"), idx.write_lock():
+        if src == "flat":
+            col = get_collection(name)
+            for ids, emb, docs, metas in idx.export(MIGRATE_BATCH):
+                col.upsert(ids=ids, embeddings=emb.tolist(), documents=docs,
+                           metadatas=list(metas))
+                moved += len(ids)
+            idx.destroy()
+        else:
+            col = get_collection(name)
+            total = col.count()
+            for offset in range(0, total, MIGRATE_BATCH):
+                got = col.get(limit=MIGRATE_BATCH, offset=offset,
+                              include=["embeddings", "documents", "metadatas"])
+                idx.upsert(got["ids"], got["embeddings"], got["documents"],
+                           [m or {} for m in got["metadatas"]])
+                moved += len(got["ids"])
+            get_client().delete_collection(name)
+    _forget(name)
+    if to == "chroma":
+        with _flat_lock:
+            _chroma_known.add(name)
+    return moved
+
+
+# ─────────────────────────────
+# Lifecycle: delete, list, compact
+# ─────────────────────────────
+def delete_collection(name: str) -> bool:
+    """Drop a collection from whichever backend holds it. False if it didn't exist."""
+    found = False
+    if _flat_exists(name):
+        get_flat_index(name).destroy()
+        found = True
+    if name in _chroma_names():
+        get_client().delete_collection(name)
+        found = True
+    get_lexical_index(name).destroy()
+    with _flat_lock:
+        _lexical_indexes.pop(name, None)
+    _forget(name)
+    if EMBED_CACHE:
+        get_embedding_cache(VECTOR_STORE_DIR).release_collection(name)
+    return found
+
+def _flat_names():
+    root = os.path.join(VECTOR_STORE_DIR, "flat")
+    if not os.path.isdir(root):
+        return []
+    return [n for n in os.listdir(root) if os.path.exists(os.path.join(root, n, "meta.json"))]
+
+def list_collection_names():
+    return sorted(set(_chroma_names()) | set(_flat_names()))
+
+def store_size_bytes(path: str = None) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path or VECTOR_STORE_DIR):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+def _orphan_segment_dirs(db_path: str):
+    """HNSW segment folders (named by segment UUID) with no row in `segments`."""
+    # Directories first, then the table: a collection created in between has
+    # its row by the time we read `segments`, so it can't look orphaned.
+    # Recently touched folders are left alone as well (upload in flight).
+    cutoff = time.time() - ORPHAN_MIN_AGE_SEC
+    candidates = []
+    for name in os.listdir(VECTOR_STORE_DIR):
+        full = os.path.join(VECTOR_STORE_DIR, name)
+        if not os.path.isdir(full):
+            continue
+        try:
+            uuid.UUID(name)
+        except ValueError:
+            continue
+        candidates.append((name, full))
+
+    con = sqlite3.connect(db_path)
+    try:
+        live = {row[0] for row in con.execute("SELECT id FROM segments")}
+    finally:
+        con.close()
+    out = []
+    for name, full in candidates:
+        if name in live:
+            continue
+        try:
+            if os.path.getmtime(full) > cutoff:
+                continue
+        except OSError:
+            continue
+        out.append(full)
+    return out
+
+_maintenance_lock = threading.Lock()
+
+def compact() -> dict:
+    """
+    Reclaim disk after deletions: remove segment folders Chroma left behind
+    and VACUUM chroma.sqlite3 (deleted rows only become free pages until then);
+    drop superseded records from flat indexes' chunk files.
+    Returns {"bytes_before", "bytes_after", "bytes_freed", "segments_removed"}.
+    """
+    db_path = os.path.join(VECTOR_STORE_DIR, "chroma.sqlite3")
+    before = store_size_bytes()
+    removed = 0
+    for name in _flat_names():
+        get_flat_index(name).compact()
+    lexical_root = os.path.join(VECTOR_STORE_DIR, "lexical")
+    if os.path.isdir(lexical_root):
+        for name in os.listdir(lexical_root):
+            if os.path.isdir(os.path.join(lexical_root, name)):   # skip <name>.lock files
+                get_lexical_index(name).compact()
+    if EMBED_CACHE:
+        with _maintenance_lock, timed("vector_store_maintenance_seconds", op="embedding_cache_vacuum"):
+            get_embedding_cache(VECTOR_STORE_DIR).vacuum()
+    if os.path.exists(db_path):
+        with _maintenance_lock, timed("vector_store_maintenance_seconds", op="compact"):
+            for d in _orphan_segment_dirs(db_path):
+                shutil.rmtree(d, ignore_errors=True)
+                removed += 1
+            con = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+            try:
+                con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                con.execute("VACUUM")
+            finally:
+                con.close()
+    after = store_size_bytes()
+    return {
+        "bytes_before": before,
+        "bytes_after": after,
+        "bytes_freed": max(0, before - after),
+        "segments_removed": removed,
+    }
+
+
+def reindex_lexical(name: str) -> int:
+    """Rebuild the BM25 index of `name` from the chunks already in its vector backend."""
+    lex = get_lexical_index(name)
+    lex.destroy()
+    n = 0
+    if backend_for(name) == "flat":
+        idx = get_flat_index(name)
+        for ids, _emb, docs, _metas in idx.export(MIGRATE_BATCH):
+            lex.add(ids, docs)
+            n += len(ids)
+    else:
+        col = get_collection(name)
+        for offset in range(0, col.count(), MIGRATE_BATCH):
+            got = col.get(limit=MIGRATE_BATCH, offset=offset, include=["documents"])
+            lex.add(got["ids"], got["documents"])
+            n += len(got["ids"])
+    lex.compact()
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Vector store maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("migrate", help="move a collection to another backend")
+    m.add_argument("collection")
+    m.add_argument("backend", choices=("flat", "chroma"))
+    r = sub.add_parser("reindex-lexical", help="rebuild a collection's BM25 index from stored chunks")
+    r.add_argument("collection")
+    sub.add_parser("list", help="collections and their backends")
+    sub.add_parser("cache-stats", help="embedding cache: distinct chunks vs references")
+    args = ap.parse_args()
+
+    if args.cmd == "migrate":
+        print(f"moved {migrate_collection(args.collection, args.backend)} chunks")
+    elif args.cmd == "reindex-lexical":
+        print(f"indexed {reindex_lexical(args.collection)} chunks")
+    elif args.cmd == "cache-stats":
+        for k, v in get_embedding_cache(VECTOR_STORE_DIR).stats().items():
+            print(f"{k:14} {v}")
+    else:
+        for name in list_collection_names():
+            print(f"{backend_for(name):7} {name}")
+
+
+if __name__ == "__main__":
+    main()
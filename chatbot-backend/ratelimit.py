@@ -0,0 +1,247 @@
+# ratelimit.py
+"""
+Admission control for the RAG endpoints (/ext/ask, /ext/ask-batch, /chat/ask).
+
+Two layers:
+  1) Token buckets per API key and per user. Over-limit callers get 429
+     with a Retry-After telling them when a token will be available.
+  2) A global concurrency cap on in-flight RAG work with a bounded wait
+     queue. When the queue is full, or a request waits too long, it gets
+     429 instead of piling onto the CPU embedder and Gemini quota.
+
+Env:
+  RATE_LIMIT_KEY_RPS / RATE_LIMIT_KEY_BURST     per API key (default 2 / 10)
+  RATE_LIMIT_USER_RPS / RATE_LIMIT_USER_BURST   per user (default 5 / 20)
+  RATE_LIMIT_STORE    "memory" (default, per process) or a SQLite file path
+                      shared by all workers on the host, e.g. /tmp/ratelimit.db
+  RAG_MAX_CONCURRENCY in-flight RAG requests per process (default 8)
+  RAG_MAX_QUEUE       requests allowed to wait for a slot (default 32)
+  RAG_QUEUE_TIMEOUT   max seconds to wait for a slot (default 10)
+"""
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import inc, set_gauge
+
+RATE_LIMIT_KEY_RPS = float(os.getenv("RATE_LIMIT_KEY_RPS", "2"))
+RATE_LIMIT_KEY_BURST = float(os.getenv("RATE_LIMIT_KEY_BURST", "10"))
+RATE_LIMIT_USER_RPS = float(os.getenv("RATE_LIMIT_USER_RPS", "5"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "20"))
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory").strip()
+
+RAG_MAX_CONCURRENCY = int(os.getenv("RAG_MAX_CONCURRENCY", "8"))
+RAG_MAX_QUEUE = int(os.getenv("RAG_MAX_QUEUE", "32"))
+RAG_QUEUE_TIMEOUT = float(os.getenv("RAG_QUEUE_TIMEOUT", "10"))
+
+
+def _too_many(detail: str, retry_after: float, scope: str) -> HTTPException:
+    inc("rate_limited_total", scope=scope)
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+# ─────────────────────────────
+# Token bucket stores
+# ─────────────────────────────
+class MemoryBucketStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # name -> (tokens, updated_at)
+
+    def take(self, name: str, rate: float, burst: float, now: float) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        with self._lock:
+            tokens, ts = self._buckets.get(name, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            if tokens >= 1:
+                self._buckets[name] = (tokens - 1, now)
+                return 0.0
+            self._buckets[name] = (tokens, now)
+            return (1 - tokens) / rate if rate > 0 else 60.0
+
+    def refund(self, name: str, burst: float):
+        """Give back a token taken by a request that was rejected on another bucket."""
+        with self._lock:
+            if name in self._buckets:
+                tokens, ts = self._buckets[name]
+                self._buckets[name] = (min(burst, tokens + 1), ts)
+
+
+class SqliteBucketStore:
+    """Same buckets in a local SQLite file, so all workers on a host share them."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as c:
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, name: str, rate: float, burst: float, now: float) -> float:
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            row = c.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+            tokens, ts = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - ts) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate if rate > 0 else 60.0
+            c.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, tokens, now),
+            )
+            c.execute("COMMIT")
+            return wait
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+
+    def refund(self, name: str, burst: float):
+        self._conn().execute(
+            "UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE name = ?", (burst, name)
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            if RATE_LIMIT_STORE in ("", "memory"):
+                _store = MemoryBucketStore()
+            else:
+                _store = SqliteBucketStore(RATE_LIMIT_STORE)
+        return _store
+
+
+def check_rate_limits(api_key_id: Optional[str] = None, user_email: Optional[str] = None):
+    """
+    Take a token from each applicable bucket; raise 429 if any is empty.
+    Call once per request, after the caller's identity is known.
+    """
+    store = get_store()
+    now = time.time()  # wall clock: buckets may be shared across processes
+    key_bucket = f"key:{api_key_id}" if api_key_id is not None else None
+    if key_bucket:
+        wait = store.take(key_bucket, RATE_LIMIT_KEY_RPS, RATE_LIMIT_KEY_BURST, now)
+        if wait > 0:
+            raise _too_many("Rate limit exceeded for this API key.", wait, "api_key")
+    if user_email:
+        wait = store.take(f"user:{user_email.lower()}", RATE_LIMIT_USER_RPS, RATE_LIMIT_USER_BURST, now)
+        if wait > 0:
+            if key_bucket:
+                # the request never ran: don't charge the key for it
+                store.refund(key_bucket, RATE_LIMIT_KEY_BURST)
+            raise _too_many("Rate limit exceeded for this account.", wait, "user")
+
+
+async def enforce_rate_limits(api_key_id: Optional[str] = None, user_email: Optional[str] = None):
+    """Async routes: the SQLite store can block on its file lock, so run it off the loop."""
+    if isinstance(get_store(), MemoryBucketStore):
+        check_rate_limits(api_key_id, user_email)
+    else:
+        await run_in_threadpool(check_rate_limits, api_key_id, user_email)
+
+
+# ─────────────────────────────
+# Global concurrency cap
+# ─────────────────────────────
+class AdmissionGate:
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def _publish(self):
+        set_gauge("rag_inflight", self.active)
+        set_gauge("rag_queue_depth", self.waiting)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            raise _too_many("Server is busy, please retry shortly.", 1, "queue_full")
+
+        self.waiting += 1
+        self._publish()
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise _too_many("Server is busy, please retry shortly.", self.timeout / 2, "queue_timeout")
+        finally:
+            self.waiting -= 1
+            self._publish()
+
+        self.active += 1
+        self._publish()
+        held = _Slot()
+        try:
+            yield held
+        finally:
+            work = held.work
+            if work is not None and not work.done():
+                # the request gave up, but its thread is still encoding /
+                # searching / calling the LLM: keep counting it until it stops
+                work.add_done_callback(lambda _f: self._release())
+            else:
+                self._release()
+
+    def _release(self):
+        self.active -= 1
+        self._sem.release()
+        self._publish()
+
+
+class _Slot:
+    """What `async with rag_slot() as slot` yields; see hold_until."""
+
+    def __init__(self):
+        self.work = None
+
+    def hold_until(self, work):
+        """Keep the slot taken after the request exits, until `work` (an asyncio future) is done."""
+        self.work = work
+
+
+_gate = AdmissionGate(RAG_MAX_CONCURRENCY, RAG_MAX_QUEUE, RAG_QUEUE_TIMEOUT)
+
+
+def rag_slot():
+    """
+    `async with rag_slot() as slot:` around the retrieval + LLM part of a
+    request; pass `slot` to run_cancellable so an abandoned request keeps
+    its slot until the worker thread is done.
+    """
+    return _gate.slot()
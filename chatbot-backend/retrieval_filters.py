@@ -0,0 +1,42 @@
+# retrieval_filters.py
+"""
+Request-level retrieval filters for /chat/ask and /ext/ask(-batch).
+
+Clients may narrow retrieval to some documents of the dataset with
+`sources` (upload file names or scraped URLs, i.e. chunk metadata
+"source") and/or `doc_ids`. An API key with ApiKeyScope rows is limited to
+those sources: by default it searches all of them, and asking for anything
+outside them is a 403.
+"""
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from models import ApiKeyScope
+
+
+async def key_scope(db, api_key_id: int) -> List[str]:
+    """Sources an API key is restricted to ([] = whole dataset)."""
+    return list(await db.scalars(select(ApiKeyScope.source).filter(ApiKeyScope.api_key_id == api_key_id)))
+
+
+def resolve_filters(
+    sources: Optional[List[str]] = None,
+    doc_ids: Optional[List[str]] = None,
+    scope: Optional[List[str]] = None,
+) -> Optional[dict]:
+    """Filters for rag.pipeline.ask, or None to search the whole collection."""
+    if scope:
+        if sources:
+            outside = set(sources) - set(scope)
+            if outside:
+                raise HTTPException(status_code=403, detail="This API key cannot access the requested sources")
+        else:
+            sources = scope
+    filters = {}
+    if sources:
+        filters["source"] = list(sources)
+    if doc_ids:
+        filters["doc_id"] = list(doc_ids)
+    return filters or None
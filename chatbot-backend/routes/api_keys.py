@@ -1,10 +1,13 @@
 # routes/api_keys.py
 import secrets, hashlib
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from database import get_db
-from models import ApiKey, Dataset, Chat
+from models import ApiKey, ApiKeyScope, Dataset, Chat
+from rag.pipeline import get_collection_name_for_dataset
+from rag.vector_store import list_sources
+from security import current_user_email, get_token_claims, resolve_user_email
 
 router = APIRouter(prefix="/api-keys", tags=["api-keys"])
 
@@ -18,18 +21,23 @@ def _prefix(tok: str) -> str:
     return tok[:8]
 
 class CreateKey(BaseModel):
-    user_email: str
+    user_email: str | None = None   # taken from the session token when present
     dataset_id: str
     chat_id: str | None = None
+    sources: list[str] | None = None  # restrict the key to these files / URLs
 
 @router.get("")
-def list_keys(user_email: str = Query(...), db: Session = Depends(get_db)):
+def list_keys(user_email: str = Depends(current_user_email), db: Session = Depends(get_db)):
     rows = db.query(ApiKey).filter(ApiKey.user_email == user_email, ApiKey.is_active == True).all()
     ds_ids = {r.dataset_id for r in rows}
     ds_map = {}
     if ds_ids:
         for d in db.query(Dataset).filter(Dataset.id.in_(ds_ids)).all():
             ds_map[d.id] = d.name
+    scopes = {}
+    if rows:
+        for s in db.query(ApiKeyScope).filter(ApiKeyScope.api_key_id.in_([r.id for r in rows])).all():
+            scopes.setdefault(s.api_key_id, []).append(s.source)
     return {
         "api_keys": [
             {
@@ -42,13 +50,15 @@ def list_keys(user_email: str = Query(...), db: Session = Depends(get_db)):
                 "created_at": r.created_at,
                 "last_used": r.last_used,
                 "is_active": r.is_active,
+                "sources": scopes.get(r.id, []),
             }
             for r in rows
         ]
     }
 
 @router.post("")
-def create_key(p: CreateKey, db: Session = Depends(get_db)):
+def create_key(p: CreateKey, claims: dict | None = Depends(get_token_claims), db: Session = Depends(get_db)):
+    p.user_email = resolve_user_email(claims, p.user_email)
     ds = db.query(Dataset).filter(Dataset.id == p.dataset_id, Dataset.user_email == p.user_email).first()
     if not ds:
         raise HTTPException(404, "Dataset not found")
@@ -60,6 +70,12 @@ def create_key(p: CreateKey, db: Session = Depends(get_db)):
         ).first()
         if not ch:
             raise HTTPException(404, "Chat not found")
+    if p.sources:
+        # a typo would otherwise make a key that silently answers from nothing
+        known = set(list_sources(get_collection_name_for_dataset(ds)))
+        unknown = [s for s in dict.fromkeys(p.sources) if s not in known]
+        if unknown:
+            raise HTTPException(400, f"Unknown sources for this dataset: {', '.join(unknown)}")
 
     q = db.query(ApiKey).filter(ApiKey.user_email == p.user_email, ApiKey.dataset_id == p.dataset_id)
     if p.chat_id is not None:
@@ -76,15 +92,19 @@ def create_key(p: CreateKey, db: Session = Depends(get_db)):
         is_active=True,
     )
     db.add(rec)
+    db.flush()
+    for source in dict.fromkeys(p.sources or []):
+        db.add(ApiKeyScope(api_key_id=rec.id, source=source))
     db.commit()
     db.refresh(rec)
     return {"api_key": token, "id": rec.id}
 
 @router.delete("/{key_id}")
-def delete_key(key_id: int, user_email: str = Query(...), db: Session = Depends(get_db)):
+def delete_key(key_id: int, user_email: str = Depends(current_user_email), db: Session = Depends(get_db)):
     rec = db.query(ApiKey).filter(ApiKey.id == key_id, ApiKey.user_email == user_email).first()
     if not rec:
         raise HTTPException(404, "API key not found")
+    db.query(ApiKeyScope).filter(ApiKeyScope.api_key_id == rec.id).delete(synchronize_session=False)
     db.delete(rec)
     db.commit()
     return {"ok": True}
@@ -1,9 +1,15 @@
 # routes/chat.py
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from deadlines import Deadline, request_deadline, run_cancellable
+from message_log import log_messages
 from models import Chat, Dataset, Message, ApiKey
+from ratelimit import enforce_rate_limits, rag_slot
+from retrieval_filters import key_scope, resolve_filters
+from security import get_token_claims, resolve_user_email
 from rag.pipeline import ask
 import uuid
 import hashlib
@@ -31,16 +37,32 @@ class AskPayload(BaseModel):
     user_email: str | None = None
     chat_id: str | None = None
     question: str
+    sources: list[str] | None = None   # limit retrieval to these files / URLs
+    doc_ids: list[str] | None = None
+
+
+def _session_claims(
+    authorization: str | None = Header(None),
+    x_api_key: str | None = Header(None),
+):
+    """Session token claims, unless the call authenticates with an API key
+    (integrators often send the key as a Bearer token as well)."""
+    if x_api_key:
+        return None
+    return get_token_claims(authorization)
 
 
 # -----------------------------------------
 # Chat ASK endpoint (internal + external)
 # -----------------------------------------
 @router.post("/ask")
-def chat_ask(
+async def chat_ask(
     payload: AskPayload,
+    request: Request,
+    deadline: Deadline = Depends(request_deadline),
     x_api_key: str = Header(None),
-    db: Session = Depends(get_db)
+    claims: dict | None = Depends(_session_claims),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Handles:
@@ -51,10 +73,11 @@ def chat_ask(
     # ---------------------------------------------------------
     # 1) EXTERNAL CALL USING API KEY
     # ---------------------------------------------------------
+    api = None
     if x_api_key:
         hashed = _hash(x_api_key)
 
-        api = db.query(ApiKey).filter(ApiKey.key_hash == hashed).first()
+        api = await db.scalar(select(ApiKey).filter(ApiKey.key_hash == hashed))
 
         if not api or not api.is_active:
             raise HTTPException(status_code=403, detail="Invalid API key")
@@ -62,6 +85,9 @@ def chat_ask(
         # Override payload info for external users
         payload.user_email = api.user_email
         payload.chat_id = api.chat_id
+    else:
+        # Session token identity wins over a client-supplied user_email
+        payload.user_email = resolve_user_email(claims, payload.user_email)
 
     # ---------------------------------------------------------
     # 2) INTERNAL CALL VALIDATION
@@ -72,33 +98,43 @@ def chat_ask(
             detail="Missing user_email, chat_id, or question"
         )
 
-    chat = (
-        db.query(Chat)
+    await enforce_rate_limits(
+        api_key_id=str(api.id) if api else None,
+        user_email=payload.user_email,
+    )
+    filters = resolve_filters(
+        payload.sources, payload.doc_ids, await key_scope(db, api.id) if api else None
+    )
+
+    chat = await db.scalar(
+        select(Chat)
         .filter(Chat.id == payload.chat_id, Chat.user_email == payload.user_email)
-        .first()
     )
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    ds = db.query(Dataset).filter(Dataset.id == chat.dataset_id).first()
+    ds = await db.scalar(select(Dataset).filter(Dataset.id == chat.dataset_id))
     if not ds:
         raise HTTPException(status_code=404, detail="Dataset missing")
 
     # ---------------------------------------------------------
-    # 3) Store user message
+    # 3) Store user message (write-behind, see message_log.py)
     # ---------------------------------------------------------
-    db.add(Message(id=_mid(), chat_id=chat.id, role="user", text=payload.question))
-    db.commit()
+    await log_messages(db, [Message(id=_mid(), chat_id=chat.id, role="user", text=payload.question)])
 
     # ---------------------------------------------------------
-    # 4) Run RAG over dataset
+    # 4) Run RAG over dataset (CPU + network bound → threadpool).
+    #    Abandoned or overdue requests stop here (499 / 504) and the
+    #    assistant message is never written.
     # ---------------------------------------------------------
-    answer = ask(ds.collection, payload.question)
+    async with rag_slot() as slot:
+        answer = await run_cancellable(
+            request, deadline, ask, ds.collection, payload.question, filters=filters, slot=slot
+        )
 
     # ---------------------------------------------------------
     # 5) Store assistant message
     # ---------------------------------------------------------
-    db.add(Message(id=_mid(), chat_id=chat.id, role="assistant", text=answer))
-    db.commit()
+    await log_messages(db, [Message(id=_mid(), chat_id=chat.id, role="assistant", text=answer)])
 
     return {"answer": answer}
@@ -1,8 +1,13 @@
 # routes/chats.py
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, Query, Body
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_async_db
 from models import Dataset, Chat, Message
+from security import current_user_email
+from pagination import MAX_PAGE_SIZE, apply_keyset, fetch_page_async, next_cursor
 import uuid
 
 router = APIRouter(prefix="/chats", tags=["chats"])
@@ -20,20 +25,28 @@ def _suggest_title_from_text(text: str) -> str:
     return title or "New Chat"
 
 @router.get("")
-def list_chats(user_email: str = Query(...), dataset_id: str = Query(...), db: Session = Depends(get_db)):
-    ds = db.query(Dataset).filter(Dataset.id == dataset_id, Dataset.user_email == user_email).first()
+async def list_chats(
+    user_email: str = Depends(current_user_email),
+    dataset_id: str = Query(...),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    ds = await db.scalar(
+        select(Dataset.id).filter(Dataset.id == dataset_id, Dataset.user_email == user_email)
+    )
     if not ds:
         raise HTTPException(404, "Dataset not found")
-    rows = (
-        db.query(Chat)
-        .filter(Chat.dataset_id == dataset_id, Chat.user_email == user_email)
-        .order_by(Chat.created_at.desc())
-        .all()
-    )
-    return {"chats": [{"id": c.id, "title": c.title} for c in rows]}
+    q = select(Chat).filter(Chat.dataset_id == dataset_id, Chat.user_email == user_email)
+    q = apply_keyset(q, Chat.created_at, Chat.id, cursor, descending=True)
+    rows, has_more = await fetch_page_async(db, q, limit)
+    return {
+        "chats": [{"id": c.id, "title": c.title} for c in rows],
+        "next_cursor": next_cursor(rows, has_more),
+    }
 
 @router.post("")
-def create_chat(user_email: str = Query(...), dataset_id: str = Query(...), db: Session = Depends(get_db)):
+def create_chat(user_email: str = Depends(current_user_email), dataset_id: str = Query(...), db: Session = Depends(get_db)):
     ds = db.query(Dataset).filter(Dataset.id == dataset_id, Dataset.user_email == user_email).first()
     if not ds:
         raise HTTPException(404, "Dataset not found")
@@ -43,20 +56,28 @@ def create_chat(user_email: str = Query(...), dataset_id: str = Query(...), db:
     return {"ok": True, "chat_id": chat.id, "title": chat.title}
 
 @router.get("/{chat_id}/messages")
-def list_messages(chat_id: str, user_email: str = Query(...), db: Session = Depends(get_db)):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_email == user_email).first()
+async def list_messages(
+    chat_id: str,
+    user_email: str = Depends(current_user_email),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    chat = await db.scalar(
+        select(Chat.id).filter(Chat.id == chat_id, Chat.user_email == user_email)
+    )
     if not chat:
         raise HTTPException(404, "Chat not found")
-    msgs = (
-        db.query(Message)
-        .filter(Message.chat_id == chat_id)
-        .order_by(Message.created_at.asc())
-        .all()
-    )
-    return {"messages": [{"role": m.role, "text": m.text} for m in msgs]}
+    q = select(Message).filter(Message.chat_id == chat_id)
+    q = apply_keyset(q, Message.created_at, Message.id, cursor, descending=False)
+    msgs, has_more = await fetch_page_async(db, q, limit)
+    return {
+        "messages": [{"role": m.role, "text": m.text} for m in msgs],
+        "next_cursor": next_cursor(msgs, has_more),
+    }
 
 @router.patch("/{chat_id}/title")
-def rename_chat(chat_id: str, new_title: str = Body(..., embed=True), user_email: str = Query(...), db: Session = Depends(get_db)):
+def rename_chat(chat_id: str, new_title: str = Body(..., embed=True), user_email: str = Depends(current_user_email), db: Session = Depends(get_db)):
     chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_email == user_email).first()
     if not chat:
         raise HTTPException(404, "Chat not found")
@@ -65,7 +86,7 @@ def rename_chat(chat_id: str, new_title: str = Body(..., embed=True), user_email
     return {"ok": True, "title": chat.title}
 
 @router.delete("/{chat_id}")
-def delete_chat(chat_id: str, user_email: str = Query(...), db: Session = Depends(get_db)):
+def delete_chat(chat_id: str, user_email: str = Depends(current_user_email), db: Session = Depends(get_db)):
     """
     Deletes a chat and all its messages (relationship has cascade='all, delete-orphan').
     """
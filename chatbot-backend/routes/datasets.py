@@ -1,17 +1,17 @@
 # routes/datasets.py
 import os
-from typing import List
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Query, Depends
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import get_db
-from models import Dataset, Chat, Message, ApiKey  # include ApiKey
-
-# Optional: try to import a helper to drop the Chroma collection.
-try:
-    from rag.vector_store import delete_collection as drop_vector_collection
-except Exception:
-    drop_vector_collection = None
+from database import get_db, get_async_db
+from models import Dataset, Chat, Message, ApiKey, ApiKeyScope  # include ApiKey
+from security import current_user_email
+from pagination import MAX_PAGE_SIZE, apply_keyset, fetch_page_async, next_cursor
+from rag.pipeline import get_collection_name_for_dataset
+from rag.vector_store import delete_collection as drop_vector_collection, list_sources
 
 router = APIRouter(prefix="/datasets", tags=["datasets"])
 
@@ -19,37 +19,65 @@ UPLOAD_DIR = "storage"
 
 
 @router.get("")
-def list_datasets(user_email: str = Query(...), db: Session = Depends(get_db)):
-    rows: List[Dataset] = (
-        db.query(Dataset)
+async def list_datasets(
+    user_email: str = Depends(current_user_email),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Chat counts come from one grouped subquery instead of a COUNT per dataset
+    counts = (
+        select(Chat.dataset_id.label("dataset_id"), func.count(Chat.id).label("n"))
+        .filter(Chat.user_email == user_email)
+        .group_by(Chat.dataset_id)
+        .subquery()
+    )
+    q = (
+        select(Dataset, func.coalesce(counts.c.n, 0))
+        .outerjoin(counts, counts.c.dataset_id == Dataset.id)
         .filter(Dataset.user_email == user_email)
-        .order_by(Dataset.created_at.desc())
-        .all()
     )
-    out = []
-    for d in rows:
-        chat_count = db.query(Chat).filter(Chat.dataset_id == d.id).count()
-        out.append(
-            {
-                "id": d.id,
-                "name": d.name,
-                "collection": d.collection,
-                "created_at": d.created_at,
-                "chat_count": chat_count,
-            }
-        )
-    return {"datasets": out}
+    q = apply_keyset(q, Dataset.created_at, Dataset.id, cursor, descending=True)
+    rows, has_more = await fetch_page_async(db, q, limit, scalars=False)
+
+    out = [
+        {
+            "id": d.id,
+            "name": d.name,
+            "collection": d.collection,
+            "created_at": d.created_at,
+            "chat_count": int(chat_count),
+        }
+        for d, chat_count in rows
+    ]
+    return {
+        "datasets": out,
+        "next_cursor": next_cursor([d for d, _ in rows], has_more),
+    }
+
+
+@router.get("/{dataset_id}/sources")
+def dataset_sources(dataset_id: str, user_email: str = Depends(current_user_email), db: Session = Depends(get_db)):
+    """The file names / URLs in a dataset: what API key `sources` scopes and filters can name."""
+    ds = (
+        db.query(Dataset)
+        .filter(Dataset.id == dataset_id, Dataset.user_email == user_email)
+        .first()
+    )
+    if not ds:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return {"dataset_id": ds.id, "sources": list_sources(get_collection_name_for_dataset(ds))}
 
 
 @router.delete("/{dataset_id}")
-def delete_dataset(dataset_id: str, user_email: str = Query(...), db: Session = Depends(get_db)):
+def delete_dataset(dataset_id: str, user_email: str = Depends(current_user_email), db: Session = Depends(get_db)):
     """
     Delete a dataset completely:
       - delete API keys tied to its chats / dataset
       - delete messages in its chats
       - delete chats
       - delete the dataset row
-      - try to drop the Chroma collection
+      - drop the Chroma collection (vector_gc.py catches any that fail here)
       - delete uploaded file(s) on disk for this dataset
     """
     ds = (
@@ -63,7 +91,13 @@ def delete_dataset(dataset_id: str, user_email: str = Query(...), db: Session =
     # Get all chat IDs belonging to this dataset
     chat_ids = [c.id for c in db.query(Chat).filter(Chat.dataset_id == ds.id).all()]
 
-    # ---- 1) Delete API keys FIRST (prevents FK error) ----
+    # ---- 1) Delete API keys (and their scopes) FIRST (prevents FK error) ----
+    key_filter = ApiKey.dataset_id == ds.id
+    if chat_ids:
+        key_filter = key_filter | ApiKey.chat_id.in_(chat_ids)
+    key_ids = [k for (k,) in db.query(ApiKey.id).filter(key_filter).all()]
+    if key_ids:
+        db.query(ApiKeyScope).filter(ApiKeyScope.api_key_id.in_(key_ids)).delete(synchronize_session=False)
     # delete keys bound to any chat in this dataset
     if chat_ids:
         db.query(ApiKey).filter(ApiKey.chat_id.in_(chat_ids)).delete(synchronize_session=False)
@@ -79,12 +113,12 @@ def delete_dataset(dataset_id: str, user_email: str = Query(...), db: Session =
     db.delete(ds)
     db.commit()
 
-    # ---- 4) Try to drop the vector collection (ignore errors) ----
+    # ---- 4) Drop the vector collection (the row is gone, so GC retries on failure) ----
     try:
-        if drop_vector_collection:
+        if ds.collection:
             drop_vector_collection(ds.collection)
-    except Exception:
-        pass
+    except Exception as e:
+        print(f"[WARN] could not drop collection {ds.collection}: {e!r}")
 
     # ---- 5) Remove uploaded file(s) from disk ----
     try:
@@ -1,15 +1,29 @@
 # routes/external.py
-import hashlib, datetime
-from fastapi import APIRouter, HTTPException, Depends, Header
+import asyncio, hashlib, datetime, json, os
+from contextlib import AsyncExitStack
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
 
-from database import get_db
+from database import get_async_db
+from deadlines import Deadline, DeadlineExceeded, request_deadline, run_cancellable
+from metrics import inc
 from models import ApiKey, Dataset
-from rag.pipeline import ask  # your RAG function
+from ratelimit import enforce_rate_limits, rag_slot
+from retrieval_filters import key_scope, resolve_filters
+from rag.llm_client import LLMError
+from rag.pipeline import answer_retrieved, ask, retrieve_many  # your RAG function
 
 router = APIRouter(prefix="/ext", tags=["external"])
 
+# /ext/ask-batch: questions per call, and Gemini calls in flight per batch
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "100"))
+ASK_BATCH_LLM_CONCURRENCY = int(os.getenv("ASK_BATCH_LLM_CONCURRENCY", "4"))
+
 def _sha256(s: str) -> str:
     import hashlib
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
@@ -23,32 +37,140 @@ def _get_key_from_header(authorization: str | None, x_api_key: str | None) -> st
 
 class ExtAsk(BaseModel):
     question: str
+    sources: list[str] | None = None   # limit retrieval to these files / URLs
+    doc_ids: list[str] | None = None
 
-@router.post("/ask")
-def ext_ask(
-    body: ExtAsk,
-    authorization: str | None = Header(default=None),
-    x_api_key: str | None = Header(default=None, convert_underscores=False),
-    db: Session = Depends(get_db),
-):
+async def _key_and_dataset(db: AsyncSession, authorization: str | None, x_api_key: str | None):
     token = _get_key_from_header(authorization, x_api_key)
     if not token:
         raise HTTPException(status_code=401, detail="Missing API key")
 
     h = _sha256(token)
-    row = db.query(ApiKey).filter(ApiKey.key_hash == h, ApiKey.is_active == True).first()
+    row = await db.scalar(
+        select(ApiKey).filter(ApiKey.key_hash == h, ApiKey.is_active == True)
+    )
     if not row:
         raise HTTPException(status_code=401, detail="Invalid or revoked API key")
 
-    ds = db.query(Dataset).filter(Dataset.id == row.dataset_id).first()
+    ds = await db.scalar(select(Dataset).filter(Dataset.id == row.dataset_id))
     if not ds:
         raise HTTPException(status_code=404, detail="Dataset not found")
+    return row, ds
+
+@router.post("/ask")
+async def ext_ask(
+    body: ExtAsk,
+    request: Request,
+    deadline: Deadline = Depends(request_deadline),
+    authorization: str | None = Header(default=None),
+    x_api_key: str | None = Header(default=None, convert_underscores=False),
+    db: AsyncSession = Depends(get_async_db),
+):
+    row, ds = await _key_and_dataset(db, authorization, x_api_key)
+
+    await enforce_rate_limits(api_key_id=str(row.id), user_email=row.user_email)
+    filters = resolve_filters(body.sources, body.doc_ids, await key_scope(db, row.id))
 
     # RAG — scoped strictly to this dataset’s collection
-    answer = ask(ds.collection, body.question)
+    async with rag_slot() as slot:
+        answer = await run_cancellable(
+            request, deadline, ask, ds.collection, body.question, filters=filters, slot=slot
+        )
 
     # last_used stamp
     row.last_used = datetime.datetime.utcnow()
-    db.commit()
+    await db.commit()
 
     return {"answer": answer}
+
+
+class ExtAskBatch(BaseModel):
+    questions: list[str]
+    sources: list[str] | None = None
+    doc_ids: list[str] | None = None
+
+@router.post("/ask-batch")
+async def ext_ask_batch(
+    body: ExtAskBatch,
+    request: Request,
+    deadline: Deadline = Depends(request_deadline),
+    authorization: str | None = Header(default=None),
+    x_api_key: str | None = Header(default=None, convert_underscores=False),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Many questions against one dataset. Retrieval for all of them is one
+    embedding batch + one vector query; answers then stream back as NDJSON,
+    one line per question in completion order:
+      {"index": 3, "question": "...", "answer": "..."}
+      {"index": 7, "question": "...", "error": "deadline exceeded"}
+    (errors: "deadline exceeded", or the LLM failure for that question).
+    The whole batch counts as one request for rate limiting and admission:
+    one slot is held from retrieval until the last answer is streamed.
+    """
+    if not body.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(body.questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {ASK_BATCH_MAX_QUESTIONS} questions per batch"
+        )
+
+    row, ds = await _key_and_dataset(db, authorization, x_api_key)
+
+    await enforce_rate_limits(api_key_id=str(row.id), user_email=row.user_email)
+    filters = resolve_filters(body.sources, body.doc_ids, await key_scope(db, row.id))
+
+    # The slot outlives this function: the stream releases it when it ends,
+    # and the background task covers a response that never starts streaming
+    # (closing an already-closed stack is a no-op).
+    admission = AsyncExitStack()
+    slot = await admission.enter_async_context(rag_slot())
+    try:
+        hits = await run_cancellable(
+            request, deadline, retrieve_many, ds.collection, body.questions, filters=filters,
+            slot=slot,
+        )
+
+        # the DB session closes before the body streams, so stamp it now
+        row.last_used = datetime.datetime.utcnow()
+        await db.commit()
+    except BaseException:
+        await admission.aclose()
+        raise
+
+    return StreamingResponse(
+        _stream_answers(deadline, body.questions, hits, admission),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(admission.aclose),
+    )
+
+async def _stream_answers(deadline: Deadline, questions: list[str], hits: list,
+                          admission: AsyncExitStack):
+    sem = asyncio.Semaphore(ASK_BATCH_LLM_CONCURRENCY)
+
+    async def one(i: int) -> dict:
+        out = {"index": i, "question": questions[i]}
+        async with sem:
+            try:
+                deadline.check("llm")
+                out["answer"] = await run_in_threadpool(
+                    answer_retrieved, questions[i], hits[i], deadline=deadline
+                )
+            except DeadlineExceeded:
+                out["error"] = "deadline exceeded"
+            except LLMError as e:
+                out["error"] = str(e)
+        inc("ask_batch_questions_total", outcome="error" if "error" in out else "ok")
+        return out
+
+    tasks = []
+    try:
+        tasks = [asyncio.ensure_future(one(i)) for i in range(len(questions))]
+        for fut in asyncio.as_completed(tasks):
+            yield json.dumps(await fut, ensure_ascii=False) + "\n"
+    finally:
+        # client went away (the generator is closed) or we're done: stop the rest
+        deadline.cancel()
+        for t in tasks:
+            t.cancel()
+        await admission.aclose()   # the batch's admission slot
@@ -1,16 +1,24 @@
 # routes/ingest.py
+import json
 import os
 import uuid
+from typing import List
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import SessionLocal, get_db, get_async_db
 from models import User, Dataset, Chat
 from rag.pipeline import (
     ingest_document,
     ingest_text_docs_to_dataset,
     get_collection_name_for_dataset,
 )
+from rag.bulk_ingest import archive_kind, bulk_ingest, extract_uploads, is_accepted
+from rag.vector_store import delete_collection
 from rag.web_scrape import crawl_site
 from schemas import ScrapeCreateRequest, ScrapeAddRequest
 
@@ -32,20 +40,21 @@ def _sid(n: int = 12) -> str:
 async def upload_and_ingest(
     file: UploadFile = File(...),
     user_email: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
   """
-  Upload a file, build embeddings first; only then create the dataset/chat.
+  Upload a file into a new dataset. The dataset/chat rows are committed
+  before anything is embedded, so vector GC never sees the collection of
+  an upload in progress as an orphan; if ingestion fails they are removed.
   Prevent duplicate filenames per user.
   """
   ext = os.path.splitext(file.filename)[-1].lower()
   if ext not in {".pdf", ".docx", ".pptx", ".csv", ".xlsx", ".txt"}:
       raise HTTPException(status_code=400, detail="Unsupported file type")
 
-  exists = (
-      db.query(Dataset)
+  exists = await db.scalar(
+      select(Dataset.id)
       .filter(Dataset.user_email == user_email, Dataset.name == file.filename)
-      .first()
   )
   if exists:
       raise HTTPException(
@@ -62,42 +71,41 @@ async def upload_and_ingest(
   except Exception as e:
       raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
 
-  try:
-      chunks = ingest_document(collection, save_path, doc_id=ds_id)
-      if not chunks:
-          try:
-              os.remove(save_path)
-          except Exception:
-              pass
-          raise HTTPException(
-              status_code=400, detail="No readable text found in file."
-          )
-  except Exception as e:
-      try:
-          os.remove(save_path)
-      except Exception:
-          pass
-      raise HTTPException(status_code=500, detail=f"Ingestion failed: {e}")
-
   ds = Dataset(
       id=ds_id,
       user_email=user_email,
       name=file.filename,
       collection=collection,
   )
-  db.add(ds)
-  db.commit()
-  db.refresh(ds)
-
   chat = Chat(
       id=_sid(16),
       user_email=user_email,
       dataset_id=ds_id,
       title="Chat 1",
   )
+  db.add(ds)
+  await db.flush()  # dataset row must exist before the chat's FK
   db.add(chat)
-  db.commit()
-  db.refresh(chat)
+  await db.commit()
+
+  try:
+      chunks = await run_in_threadpool(
+          ingest_document, collection, save_path, doc_id=ds_id,
+          source=file.filename,
+      )
+      if not chunks:
+          raise HTTPException(
+              status_code=400, detail="No readable text found in file."
+          )
+  except Exception as e:
+      await run_in_threadpool(_drop_empty_dataset, ds_id, collection)
+      try:
+          os.remove(save_path)
+      except Exception:
+          pass
+      if isinstance(e, HTTPException):
+          raise
+      raise HTTPException(status_code=500, detail=f"Ingestion failed: {e}")
 
   return {
       "ok": True,
@@ -116,12 +124,11 @@ async def add_to_dataset(
     file: UploadFile = File(...),
     user_email: str = Form(...),
     dataset_id: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-  ds = (
-      db.query(Dataset)
+  ds = await db.scalar(
+      select(Dataset)
       .filter(Dataset.id == dataset_id, Dataset.user_email == user_email)
-      .first()
   )
   if not ds:
       raise HTTPException(status_code=404, detail="Dataset not found")
@@ -139,13 +146,139 @@ async def add_to_dataset(
       raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
 
   try:
-      added = ingest_document(ds.collection, save_path, doc_id=unique[:10])
+      added = await run_in_threadpool(
+          ingest_document, ds.collection, save_path, doc_id=unique[:10],
+          source=file.filename,
+      )
   except Exception as e:
       raise HTTPException(status_code=500, detail=f"Ingestion failed: {e}")
 
   return {"ok": True, "added_chunks": added}
 
 
+# ────────────────────────────────────────────────────────────
+# Bulk upload: many files and/or zip/tar archives, streamed progress
+# ────────────────────────────────────────────────────────────
+async def _save_upload(file: UploadFile, path: str):
+  """Copy an upload to disk in 1 MiB pieces (archives can be large), off the event loop."""
+  f = await run_in_threadpool(open, path, "wb")
+  try:
+      while True:
+          buf = await file.read(1 << 20)
+          if not buf:
+              break
+          await run_in_threadpool(f.write, buf)
+  finally:
+      await run_in_threadpool(f.close)
+
+
+def _drop_empty_dataset(ds_id: str, collection: str):
+  """An upload that created a dataset but indexed nothing leaves no trace."""
+  db = SessionLocal()
+  try:
+      db.query(Chat).filter(Chat.dataset_id == ds_id).delete(synchronize_session=False)
+      db.query(Dataset).filter(Dataset.id == ds_id).delete(synchronize_session=False)
+      db.commit()
+  finally:
+      db.close()
+  try:
+      delete_collection(collection)
+  except Exception as e:
+      print(f"[WARN] Failed to delete collection {collection}: {e}")
+
+
+def _bulk_events(head: dict, collection: str, uploads, workdir: str, created: bool):
+  """NDJSON lines: the dataset ids first, then bulk_ingest progress (runs in the threadpool)."""
+  yield json.dumps(head) + "\n"
+  chunks = 0  # counted per indexed file: the "done" line never comes if the client leaves
+  try:
+      for event in bulk_ingest(collection, extract_uploads(uploads, workdir)):
+          if event.get("status") == "indexed":
+              chunks += event["chunks"]
+          yield json.dumps(event, ensure_ascii=False) + "\n"
+  finally:
+      for name, path in uploads:
+          if archive_kind(name):
+              try:
+                  os.remove(path)  # members were extracted; keep only the documents
+              except OSError:
+                  pass
+      if created and not chunks:
+          _drop_empty_dataset(head["dataset_id"], collection)
+
+
+@router.post("/bulk")
+async def bulk_upload(
+    files: List[UploadFile] = File(...),
+    user_email: str = Form(...),
+    dataset_id: str | None = Form(None),
+    dataset_name: str | None = Form(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+  """
+  Ingest many files (and/or .zip / .tar[.gz|.bz2|.xz] archives) in one call,
+  into a new dataset or, with dataset_id, an existing one.
+  Responds with NDJSON: {"status": "started", "dataset_id", "chat_id"},
+  then one line per file and stage (see rag.bulk_ingest.bulk_ingest),
+  then {"status": "done", ...}. A new dataset that ends up with no
+  chunks is removed again.
+  """
+  accepted = [f for f in files if f.filename and is_accepted(f.filename)]
+  if not accepted:
+      raise HTTPException(status_code=400, detail="Unsupported file type")
+
+  created = dataset_id is None
+  if created:
+      name = (dataset_name or accepted[0].filename).strip()
+      exists = await db.scalar(
+          select(Dataset.id)
+          .filter(Dataset.user_email == user_email, Dataset.name == name)
+      )
+      if exists:
+          raise HTTPException(
+              status_code=409,
+              detail="A dataset with this name already exists for this account.",
+          )
+      ds_id = _sid(12)
+      ds = Dataset(id=ds_id, user_email=user_email, name=name, collection=f"ds_{ds_id}")
+      # Rows first: a long ingest must not look like an orphan to vector_gc
+      chat = Chat(id=_sid(16), user_email=user_email, dataset_id=ds_id, title="Chat 1")
+      db.add(ds)
+      await db.flush()  # dataset row must exist before the chat's FK
+      db.add(chat)
+      await db.commit()
+      chat_id = chat.id
+  else:
+      ds = await db.scalar(
+          select(Dataset)
+          .filter(Dataset.id == dataset_id, Dataset.user_email == user_email)
+      )
+      if not ds:
+          raise HTTPException(status_code=404, detail="Dataset not found")
+      chat_id = None
+  collection = ds.collection or f"ds_{ds.id}"
+
+  workdir = os.path.join(UPLOAD_DIR, f"{ds.id}_bulk_{_sid(8)}")
+  os.makedirs(workdir, exist_ok=True)
+  uploads = []
+  try:
+      for f in accepted:
+          path = os.path.join(workdir, f"upload_{_sid(16)}{os.path.splitext(f.filename)[-1].lower()}")
+          await _save_upload(f, path)
+          uploads.append((os.path.basename(f.filename), path))
+  except Exception as e:
+      if created:
+          await run_in_threadpool(_drop_empty_dataset, ds.id, collection)
+      raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+
+  head = {"status": "started", "dataset_id": ds.id, "chat_id": chat_id,
+          "rejected": [f.filename for f in files if f not in accepted]}
+  return StreamingResponse(
+      _bulk_events(head, collection, uploads, workdir, created),
+      media_type="application/x-ndjson",
+  )
+
+
 # ────────────────────────────────────────────────────────────
 # Scrape → create NEW dataset (URL only)
 # ────────────────────────────────────────────────────────────
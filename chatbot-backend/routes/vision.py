@@ -2,18 +2,22 @@
 import os
 import uuid
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_async_db
+from message_log import log_messages
 from models import Chat, Dataset, Message
+from rag.llm_client import LLMError
 from rag.pipeline import caption_image
 
 # Optional helpers (we'll use them if present)
 try:
-    # Typical helper in your codebase; returns a Chroma collection handle
-    from rag.vector_store import get_collection as _get_collection
+    # Backend-aware retrieval (Chroma or flat index)
+    from rag.vector_store import similarity_search as _similarity_search
 except Exception:
-    _get_collection = None
+    _similarity_search = None
 
 # Optional LLM helpers (use whatever exists)
 _llm_funcs = []
@@ -52,17 +56,14 @@ def _save_image(file: UploadFile) -> str:
 
 def _retrieve_context(collection_name: str, query: str, k: int = 4) -> str:
     """
-    Query Chroma for top-k docs and return a single context string.
+    Query the vector store for top-k docs and return a single context string.
     Falls back to empty context if the helper isn't available.
     """
-    if not _get_collection:
+    if not _similarity_search:
         return ""
     try:
-        coll = _get_collection(collection_name)
-        res = coll.query(query_texts=[query], n_results=k, include=["documents"])
-        docs = (res or {}).get("documents", [[]])
-        docs0 = docs[0] if docs else []
-        return "\n\n".join(docs0 or [])
+        hits = _similarity_search(collection_name, query, k=k)
+        return "\n\n".join(doc for doc, _meta in hits)
     except Exception:
         return ""
 
@@ -74,6 +75,8 @@ def _llm_grounded_answer(question: str, context: str) -> str:
     for fn in _llm_funcs:
         try:
             return fn(question, context)
+        except LLMError:
+            raise  # Gemini is wired but failing: 503, not a fallback answer
         except Exception:
             continue
     # Fallback (no LLM wired)
@@ -95,7 +98,7 @@ async def caption(file: UploadFile = File(...)):
     try:
         with open(path, "wb") as f:
             f.write(await file.read())
-        cap = caption_image(path)
+        cap = await run_in_threadpool(caption_image, path)
         return {"caption": cap}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,7 +110,7 @@ async def ask_with_image(
     user_email: str = Form(...),
     chat_id: str = Form(...),
     question: str = Form(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Multimodal ask:
@@ -118,15 +121,14 @@ async def ask_with_image(
       5) Persist user & assistant messages like the text chat.
     """
     # --- Validate chat & dataset ownership ---
-    chat = (
-        db.query(Chat)
+    chat = await db.scalar(
+        select(Chat)
         .filter(Chat.id == chat_id, Chat.user_email == user_email)
-        .first()
     )
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    ds = db.query(Dataset).filter(Dataset.id == chat.dataset_id).first()
+    ds = await db.scalar(select(Dataset).filter(Dataset.id == chat.dataset_id))
     if not ds:
         raise HTTPException(status_code=404, detail="Dataset not found for this chat")
 
@@ -141,7 +143,7 @@ async def ask_with_image(
         f.write(await file.read())
 
     try:
-        caption = caption_image(path)
+        caption = await run_in_threadpool(caption_image, path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Captioning failed: {e}")
 
@@ -150,8 +152,8 @@ async def ask_with_image(
     combined = q_text + (" " if q_text else "") + f"[Image: {caption}]"
 
     # --- Retrieve context & answer ---
-    context = _retrieve_context(ds.collection, combined, k=4)
-    answer = _llm_grounded_answer(combined, context)
+    context = await run_in_threadpool(_retrieve_context, ds.collection, combined, 4)
+    answer = await run_in_threadpool(_llm_grounded_answer, combined, context)
 
     # --- Persist messages (user → assistant), mirroring text chat behavior ---
     try:
@@ -167,11 +169,9 @@ async def ask_with_image(
             role="assistant",
             text=answer,
         )
-        db.add(umsg)
-        db.add(amsg)
-        db.commit()
+        await log_messages(db, [umsg, amsg])
     except Exception:
-        db.rollback()  # don't fail the request if logging the messages fails
+        await db.rollback()  # don't fail the request if logging the messages fails
 
     return {
         "answer": answer,
@@ -188,7 +188,7 @@ async def ask_image_alias(
     user_email: str = Form(...),
     chat_id: str = Form(...),
     question: str = Form(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     # Reuse the same implementation
     return await ask_with_image(file=file, user_email=user_email, chat_id=chat_id, question=question, db=db)
@@ -2,12 +2,11 @@
 import os
 import uuid
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from faster_whisper import WhisperModel
+from fastapi.concurrency import run_in_threadpool
 
-router = APIRouter(prefix="/voice", tags=["voice"])
+from rag.speech import transcribe as _transcribe
 
-# load small/base model for CPU
-_whisper = WhisperModel("base", device="cpu", compute_type="int8")
+router = APIRouter(prefix="/voice", tags=["voice"])
 
 AUDIO_DIR = "storage/audio"
 os.makedirs(AUDIO_DIR, exist_ok=True)
@@ -22,8 +21,8 @@ async def transcribe(file: UploadFile = File(...)):
         f.write(await file.read())
 
     try:
-        segments, info = _whisper.transcribe(path, beam_size=1)
-        text = " ".join(seg.text for seg in segments).strip()
+        # Whisper is CPU-bound (and loads the model on first call): keep it off the loop
+        text = await run_in_threadpool(_transcribe, path)
         return {"text": text}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
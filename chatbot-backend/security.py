@@ -1,7 +1,39 @@
 # security.py
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import Depends, Header, HTTPException, Query
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt work factor. Pinning min/max to the same value makes passlib flag
+# any hash with a different cost as needing an update, so changing
+# BCRYPT_ROUNDS transparently re-hashes passwords on the next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Dedicated process pool for bcrypt so a login burst can't eat the
+# request threadpool (or the GIL) that other endpoints depend on.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 4)))
+
+pwd_context = CryptContext(
+  schemes=["bcrypt"],
+  deprecated="auto",
+  bcrypt__default_rounds=BCRYPT_ROUNDS,
+  bcrypt__min_rounds=BCRYPT_ROUNDS,
+  bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
 
 
 def hash_password(password: str) -> str:
@@ -10,3 +42,151 @@ def hash_password(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
   return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+  """
+  Returns (ok, new_hash). new_hash is set when the password is correct
+  but the stored hash uses an outdated work factor.
+  """
+  return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# ============================================================
+# Async wrappers (run in the bounded process pool)
+# ============================================================
+
+def _get_pool() -> ProcessPoolExecutor:
+  global _pool
+  if _pool is None:
+    _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+  return _pool
+
+
+async def _run(fn, *args):
+  global _slots
+  if _slots is None:
+    _slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+  async with _slots:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), fn, *args)
+
+
+async def hash_password_async(password: str) -> str:
+  return await _run(hash_password, password)
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+  return await _run(verify_and_update, plain_password, hashed_password)
+
+
+def shutdown_pool():
+  global _pool
+  if _pool is not None:
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+# ============================================================
+# Signed session tokens (HS256 JWT, verified locally — no DB hit)
+# ============================================================
+#
+# SESSION_SECRET must be shared by all workers; without it each process
+# signs with its own random key and tokens only work on that process.
+# AUTH_REQUIRE_TOKEN=1 rejects requests without a token; otherwise routes
+# fall back to the legacy user_email parameter so older clients keep working.
+#
+# With AUTH_REQUIRE_TOKEN=0 (the default, until every client sends tokens)
+# ownership is NOT enforced for token-less requests: whoever sends a
+# user_email acts as that user. Cut-over:
+#   1. set SESSION_SECRET on every worker;
+#   2. have the frontend send "Authorization: Bearer <access_token>" from
+#      the login response on every call;
+#   3. set AUTH_REQUIRE_TOKEN=1 once token-less requests have stopped
+#      (the startup warning in main.py repeats this while it is off).
+
+SESSION_SECRET = os.getenv("SESSION_SECRET") or secrets.token_urlsafe(48)
+ACCESS_TOKEN_TTL_MIN = int(os.getenv("ACCESS_TOKEN_TTL_MIN", "60"))
+AUTH_REQUIRE_TOKEN = os.getenv("AUTH_REQUIRE_TOKEN", "0") == "1"
+
+
+def _b64e(raw: bytes) -> str:
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64d(s: str) -> bytes:
+  return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def _sign(signing_input: bytes) -> str:
+  return _b64e(hmac.new(SESSION_SECRET.encode(), signing_input, hashlib.sha256).digest())
+
+
+def create_access_token(email: str, first_name: Optional[str] = None) -> str:
+  now = int(time.time())
+  header = _b64e(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+  claims = {"sub": email, "iat": now, "exp": now + ACCESS_TOKEN_TTL_MIN * 60}
+  if first_name:
+    claims["fn"] = first_name
+  payload = _b64e(json.dumps(claims, separators=(",", ":")).encode())
+  return f"{header}.{payload}.{_sign(f'{header}.{payload}'.encode())}"
+
+
+@lru_cache(maxsize=4096)
+def _verified_claims(token: str) -> dict:
+  """Signature check + parse, cached per token (invalid tokens raise and are not cached)."""
+  header, payload, sig = token.split(".")
+  if not hmac.compare_digest(sig, _sign(f"{header}.{payload}".encode())):
+    raise ValueError("bad signature")
+  claims = json.loads(_b64d(payload))
+  if not claims.get("sub"):
+    raise ValueError("missing subject")
+  return claims
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+  try:
+    claims = _verified_claims(token)
+  except Exception:
+    return None
+  if claims.get("exp", 0) < time.time():
+    return None
+  return claims
+
+
+# ============================================================
+# FastAPI dependencies
+# ============================================================
+
+def get_token_claims(authorization: Optional[str] = Header(default=None)) -> Optional[dict]:
+  """Claims of a valid Bearer session token, or None if no token was sent."""
+  if not authorization or not authorization.lower().startswith("bearer "):
+    return None
+  claims = decode_access_token(authorization[7:].strip())
+  if claims is None:
+    raise HTTPException(status_code=401, detail="Invalid or expired session token")
+  return claims
+
+
+def resolve_user_email(claims: Optional[dict], claimed_email: Optional[str]) -> str:
+  """
+  Pick the caller's email: the token subject when a token is present (and
+  reject a mismatching user_email), else the legacy claimed_email.
+  """
+  if claims is not None:
+    if claimed_email and claimed_email.lower() != claims["sub"].lower():
+      raise HTTPException(status_code=403, detail="Not allowed for this account")
+    return claims["sub"]
+  if AUTH_REQUIRE_TOKEN:
+    raise HTTPException(status_code=401, detail="Missing session token")
+  if not claimed_email:
+    raise HTTPException(status_code=400, detail="Missing user_email")
+  return claimed_email
+
+
+def current_user_email(
+  user_email: Optional[str] = Query(default=None),
+  claims: Optional[dict] = Depends(get_token_claims),
+) -> str:
+  """Dependency for routes that take user_email as a query parameter."""
+  return resolve_user_email(claims, user_email)
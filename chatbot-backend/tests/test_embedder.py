@@ -0,0 +1,66 @@
+# tests/test_embedder.py
+"""
+EMBED_RUNTIME=int8 parity: the check itself, the fp32 fallback, and (with
+torch + sentence-transformers and the model in the local HF cache) the
+real quantized MiniLM against fp32.
+"""
+import copy
+
+import numpy as np
+import pytest
+
+from rag import embedder
+
+
+class FixedEncoder:
+    """Stands in for a SentenceTransformer: returns preset embeddings."""
+
+    def __init__(self, rows):
+        self.rows = np.asarray(rows, dtype=np.float32)
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False):
+        out = self.rows[:len(texts)]
+        if normalize_embeddings:
+            out = out / np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+
+def test_parity_check_reports_min_and_mean_cosine():
+    ref = FixedEncoder([[1, 0], [0, 1]])
+    cand = FixedEncoder([[1, 0], [1, 1]])
+    parity = embedder.parity_check(ref, cand, texts=["a", "b"])
+    assert parity["min_cos"] == pytest.approx(2 ** -0.5, abs=1e-6)
+    assert parity["mean_cos"] == pytest.approx((1 + 2 ** -0.5) / 2, abs=1e-6)
+
+
+@pytest.mark.parametrize("min_cos, expected", [(0.999, "int8"), (0.5, "fp32")])
+def test_int8_falls_back_to_fp32_below_parity(monkeypatch, min_cos, expected):
+    ref = FixedEncoder([[1, 0]])
+    quant = FixedEncoder([[1, 0]])
+    monkeypatch.setattr(embedder, "load_model", lambda runtime="fp32": ref)
+    monkeypatch.setattr(embedder, "quantize_model", lambda model: quant)
+    monkeypatch.setattr(embedder, "parity_check", lambda a, b: {"min_cos": min_cos, "mean_cos": min_cos})
+
+    model, runtime = embedder._load_checked("int8")
+    assert runtime == expected
+    assert model is (quant if expected == "int8" else ref)
+
+
+def test_unknown_runtime_is_rejected():
+    with pytest.raises(ValueError):
+        embedder._load_checked("fp8")
+
+
+def test_int8_minilm_matches_fp32():
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    from benchmarks.common import offline_env
+
+    offline_env()
+    try:
+        fp32 = embedder.load_model("fp32")
+    except OSError as e:   # model not in the local HF cache
+        pytest.skip(f"MiniLM not available offline: {e}")
+    int8 = embedder.quantize_model(copy.deepcopy(fp32))
+    parity = embedder.parity_check(fp32, int8)
+    assert parity["min_cos"] >= embedder.EMBED_PARITY_MIN_COS
@@ -0,0 +1,177 @@
+# tests/test_llm_client.py
+"""
+rag.llm_client against benchmarks.fake_gemini (a real local HTTP server):
+retries, circuit breaker transitions, hedging and the hedge budget.
+"""
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")   # rag.llm_client -> deadlines
+
+from benchmarks.bench_llm import _counter, _HttpModel
+from benchmarks.fake_gemini import Faults, start
+from rag import llm_client
+from rag.llm_client import HedgeBudget, LLMClient, LLMError, LLMUnavailable
+
+
+@pytest.fixture
+def fake():
+    faults = Faults(latency_ms=5)
+    server = start(faults)
+    yield faults, "http://%s:%d" % server.server_address[:2]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_client(fake, monkeypatch):
+    """LLMClient on the fake server; settings are the module's env knobs."""
+    _faults, endpoint = fake
+
+    def make(model=None, **env):
+        settings = {"LLM_HEDGE": False, "LLM_RETRY_BASE_MS": 1, "LLM_RETRY_MAX_MS": 5,
+                    "LLM_BREAKER_FAILURES": 0, **env}
+        for name, value in settings.items():
+            monkeypatch.setattr(llm_client, name, value)
+        model = model or _HttpModel(endpoint)
+        return LLMClient(lambda: model, name="fake")
+
+    return make
+
+
+class _Delta:
+    """Counter increase since construction, e.g. _Delta("llm_retries_total")()."""
+
+    def __init__(self, name, **labels):
+        self.name, self.labels = name, labels
+        self.start = _counter(name, **labels)
+
+    def __call__(self):
+        return _counter(self.name, **self.labels) - self.start
+
+
+# ── retries ───────────────────────────────────
+def test_transient_errors_retry_up_to_max_attempts(fake, make_client):
+    faults, _ = fake
+    faults.down = True
+    client = make_client(LLM_MAX_ATTEMPTS=3)
+    retries = _Delta("llm_retries_total", feature="t_retry")
+
+    with pytest.raises(LLMUnavailable):
+        client.generate("q", feature="t_retry")
+    assert faults.requests == 3
+    assert retries() == 2
+
+
+def test_success_is_not_retried(fake, make_client):
+    faults, _ = fake
+    client = make_client(LLM_MAX_ATTEMPTS=3)
+
+    assert client.generate("q").text.startswith("fake answer")
+    assert faults.requests == 1
+
+
+def test_non_transient_error_is_not_retried(fake, make_client):
+    faults, endpoint = fake
+    model = _HttpModel(endpoint)
+    model.url = f"{endpoint}/v1beta/models/fake:unknownMethod"   # 404
+    client = make_client(model, LLM_MAX_ATTEMPTS=3)
+
+    with pytest.raises(LLMError) as exc:
+        client.generate("q")
+    assert not isinstance(exc.value, LLMUnavailable)
+    assert faults.requests == 1
+
+
+# ── circuit breaker ───────────────────────────
+def test_breaker_opens_then_half_open_probe_closes_it(fake, make_client):
+    faults, _ = fake
+    faults.down = True
+    client = make_client(LLM_MAX_ATTEMPTS=1, LLM_BREAKER_FAILURES=2, LLM_BREAKER_RESET_SEC=0.2)
+    half_open = _Delta("llm_circuit_transitions_total", upstream="fake", to="half_open")
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            client.generate("q")
+    assert client.breaker.state == "open"
+
+    with pytest.raises(LLMUnavailable, match="circuit open"):
+        client.generate("q")
+    assert faults.requests == 2               # failed fast, nothing sent
+
+    time.sleep(0.25)
+    faults.down = False
+    assert client.generate("q").text.startswith("fake answer")
+    assert half_open() == 1
+    assert client.breaker.state == "closed"
+    assert faults.requests == 3
+
+
+def test_failed_half_open_probe_reopens_breaker(fake, make_client):
+    faults, _ = fake
+    faults.down = True
+    client = make_client(LLM_MAX_ATTEMPTS=1, LLM_BREAKER_FAILURES=1, LLM_BREAKER_RESET_SEC=0.2)
+
+    with pytest.raises(LLMUnavailable):
+        client.generate("q")
+    assert client.breaker.state == "open"
+
+    time.sleep(0.25)
+    with pytest.raises(LLMUnavailable):
+        client.generate("q")                  # the probe goes out and fails
+    assert faults.requests == 2
+    assert client.breaker.state == "open"
+    with pytest.raises(LLMUnavailable, match="circuit open"):
+        client.generate("q")
+    assert faults.requests == 2
+
+
+# ── hedging ───────────────────────────────────
+def _hedging_client(make_client, monkeypatch, budget: float):
+    client = make_client(LLM_MAX_ATTEMPTS=1, LLM_HEDGE=True, LLM_HEDGE_MIN_DELAY_MS=20)
+    client.hedge_budget = HedgeBudget(budget)
+    # hedge after a fixed 20 ms instead of the p95 of recent calls
+    monkeypatch.setattr(client.latency, "quantile", lambda q, min_samples: 0.02)
+    return client
+
+
+def test_hedge_wins_when_primary_is_slow(fake, make_client, monkeypatch):
+    faults, _ = fake
+    faults.slow_first, faults.slow_ms = 1, 2000
+    client = _hedging_client(make_client, monkeypatch, budget=1.0)
+    won = _Delta("llm_hedges_total", feature="t_win", outcome="won")
+
+    t0 = time.perf_counter()
+    assert client.generate("q", feature="t_win").text.startswith("fake answer")
+    assert time.perf_counter() - t0 < 1.0
+    assert won() == 1
+    assert faults.requests == 2
+
+
+def test_hedge_skipped_without_budget(fake, make_client, monkeypatch):
+    faults, _ = fake
+    faults.slow_first, faults.slow_ms = 1, 200
+    client = _hedging_client(make_client, monkeypatch, budget=0.1)
+    sent = _Delta("llm_hedges_total", feature="t_skip", outcome="sent")
+    skipped = _Delta("llm_hedges_total", feature="t_skip", outcome="skipped")
+
+    t0 = time.perf_counter()
+    assert client.generate("q", feature="t_skip").text.startswith("fake answer")
+    assert time.perf_counter() - t0 >= 0.2        # waited for the slow primary
+    assert (sent(), skipped()) == (0, 1)
+    assert faults.requests == 1
+
+
+def test_hedges_stay_within_budget(fake, make_client, monkeypatch):
+    faults, _ = fake
+    faults.latency_ms = 40                     # every call outlives the hedge delay
+    client = _hedging_client(make_client, monkeypatch, budget=0.1)
+    sent = _Delta("llm_hedges_total", feature="t_budget", outcome="sent")
+    skipped = _Delta("llm_hedges_total", feature="t_budget", outcome="skipped")
+
+    calls = 30
+    for _ in range(calls):
+        client.generate("q", feature="t_budget")
+    assert sent() == int(calls * 0.1)
+    assert sent() + skipped() == calls
@@ -0,0 +1,130 @@
+# vector_gc.py
+"""
+Garbage collection for Chroma collections that no Dataset row points at
+(datasets deleted before delete_collection existed, failed uploads, ...),
+followed by compaction so the freed space is actually returned to disk.
+
+Every ingest route commits the Dataset row before it writes vectors, so a
+collection without a row is never an upload in progress. The grace period
+(a collection must still be orphaned `grace` seconds after it was first
+seen orphaned) only covers a dataset deleted while a write to it was
+finishing.
+
+Run once from the backend root:
+  python -m vector_gc               # grace 120 s, then drop + compact
+  python -m vector_gc --dry-run     # just list orphans and store size
+
+Or in the API process, every VECTOR_GC_INTERVAL_SEC (0 = off, the default);
+there the previous pass's orphans act as the grace window.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional, Set
+
+from sqlalchemy import select
+
+from database import SessionLocal
+from metrics import inc
+from models import Dataset
+
+log = logging.getLogger("vector_gc")
+
+VECTOR_GC_INTERVAL_SEC = float(os.getenv("VECTOR_GC_INTERVAL_SEC", "0"))
+
+
+def find_orphans() -> Set[str]:
+    from rag.vector_store import list_collection_names
+
+    names = set(list_collection_names())
+    if not names:
+        return set()
+    with SessionLocal() as db:
+        live = set(db.scalars(select(Dataset.collection).filter(Dataset.collection.isnot(None))))
+    return names - live
+
+
+def drop_and_compact(orphans: Set[str]) -> dict:
+    from rag.vector_store import compact, delete_collection
+
+    dropped = [name for name in sorted(orphans) if delete_collection(name)]
+    inc("vector_gc_collections_dropped_total", len(dropped))
+    report = compact()
+    report["dropped"] = dropped
+    log.info("vector GC dropped %d collection(s), freed %d bytes", len(dropped), report["bytes_freed"])
+    return report
+
+
+def collect_garbage(grace: float = 120.0) -> dict:
+    """One full pass: find orphans, wait `grace`, drop the ones still orphaned, compact."""
+    first = find_orphans()
+    if first and grace > 0:
+        time.sleep(grace)
+    return drop_and_compact(first & find_orphans())
+
+
+class VectorGC:
+    """Periodic in-process GC; orphans must survive two consecutive passes."""
+
+    def __init__(self, interval: float = VECTOR_GC_INTERVAL_SEC):
+        self.interval = interval
+        self._suspects: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.interval > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="vector-gc", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self) -> dict:
+        orphans = find_orphans()
+        confirmed = orphans & self._suspects
+        self._suspects = orphans - confirmed
+        return drop_and_compact(confirmed)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                log.warning("vector GC pass failed: %r", e)
+
+
+_gc: Optional[VectorGC] = None
+
+
+def get_gc() -> VectorGC:
+    global _gc
+    if _gc is None:
+        _gc = VectorGC()
+    return _gc
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Drop orphaned Chroma collections and compact the store")
+    ap.add_argument("--grace", type=float, default=120.0, help="seconds an orphan must stay orphaned")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.dry_run:
+        from rag.vector_store import store_size_bytes
+
+        print(json.dumps({"orphans": sorted(find_orphans()), "store_bytes": store_size_bytes()}, indent=2))
+        return
+    print(json.dumps(collect_garbage(args.grace), indent=2))
+
+
+if __name__ == "__main__":
+    main()
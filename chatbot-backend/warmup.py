@@ -0,0 +1,123 @@
+# warmup.py
+"""
+Model readiness tracking + background warm-up.
+
+Every heavy subsystem is loaded lazily by its own getter (vector store
+client, embedder, BLIP, Whisper, Gemini client). Those getters wrap the load
+in `loading(name)`, so /ready reports the same state whether a model was
+warmed up at startup or pulled in by the first request that needed it.
+
+WARMUP_MODELS picks what the startup task preloads, in a background thread,
+so /health answers immediately (default "vector_store,embedder"; "none" to
+skip; "all" for everything). /ready returns 503 until those are loaded.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+KNOWN = ("vector_store", "embedder", "blip", "whisper", "gemini")
+
+_lock = threading.Lock()
+_status: Dict[str, dict] = {name: {"state": "lazy"} for name in KNOWN}
+
+
+def _set(name: str, **fields):
+    with _lock:
+        _status[name] = fields
+
+
+@contextmanager
+def loading(name: str):
+    """Wrap a model load so its state and load time show up on /ready."""
+    _set(name, state="loading")
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        _set(name, state="error", error=repr(e)[:300])
+        raise
+    _set(name, state="ready", load_seconds=round(time.perf_counter() - t0, 3))
+
+
+def _loaders():
+    # Imported here so importing warmup stays cheap
+    from rag import inference_client
+
+    def remote(name):
+        # With the inference sidecar, "loading" a model means reaching the sidecar
+        def load():
+            with loading(name):
+                inference_client.ping()
+        return load
+
+    def vector_store():
+        from rag.vector_store import get_client
+        get_client()
+
+    def embedder():
+        from rag.embedder import get_embedder
+        get_embedder()
+
+    def blip():
+        from rag.pipeline import _get_blip
+        _get_blip()
+
+    def whisper():
+        from rag.speech import _get_whisper
+        _get_whisper()
+
+    def gemini():
+        from rag.pipeline import _get_gemini
+        _get_gemini()
+
+    loaders = {
+        "vector_store": vector_store,
+        "embedder": embedder,
+        "blip": blip,
+        "whisper": whisper,
+        "gemini": gemini,
+    }
+    if inference_client.enabled():
+        for name in ("embedder", "blip", "whisper"):
+            loaders[name] = remote(name)
+    return loaders
+
+
+def warmup_targets() -> List[str]:
+    raw = os.getenv("WARMUP_MODELS", "vector_store,embedder").strip().lower()
+    if raw in ("", "none"):
+        return []
+    if raw == "all":
+        return list(KNOWN)
+    return [n.strip() for n in raw.split(",") if n.strip() in KNOWN]
+
+
+def _run(names: List[str]):
+    loaders = _loaders()
+    for name in names:
+        try:
+            loaders[name]()
+        except Exception as e:
+            _set(name, state="error", error=repr(e)[:300])
+            print(f"[WARN] warm-up of {name} failed: {e!r}")
+
+
+def start_warmup() -> threading.Thread:
+    names = warmup_targets()
+    for n in names:
+        with _lock:
+            if _status[n]["state"] == "lazy":
+                _status[n] = {"state": "pending"}
+    t = threading.Thread(target=_run, args=(names,), name="model-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def readiness() -> dict:
+    with _lock:
+        models = {k: dict(v) for k, v in _status.items()}
+    required = warmup_targets()
+    ready = all(models[n]["state"] == "ready" for n in required)
+    return {"ready": ready, "required": required, "models": models}